@@ -1,6 +1,11 @@
 import json
+import os
+import sys
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from MachineManage.slots import parse_machine_name
+
 
 def accountGet_ip(target_ip, api_url="http://192.168.223.144:9000/xhs/update_account_headers"):
     """
@@ -24,12 +29,12 @@ def accountGet_ip(target_ip, api_url="http://192.168.223.144:9000/xhs/update_acc
             if (account.get("ip") == target_ip and 
                 account.get("state") == "-100 账号退出登录,请删除或者重新登陆"):
                 name_field = account.get("name", "")
-                if "-" in name_field:
-                    parts = name_field.split("-")
-                    index_str = parts[0].replace("T", "")
-                    account_number = parts[1]
-                    index = index_str[-1] if index_str.isdigit() else "0"
+                parsed = parse_machine_name(name_field)
+                if parsed:
+                    index, account_number = parsed
                     logout_accounts.append([account_number, index, "", ""])
+                else:
+                    print(f"Skipping account with unexpected name: {name_field}")
         
         return logout_accounts
     
@@ -3,8 +3,12 @@ import json
 
 import json
 import os
+import sys
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from MachineManage.slots import machine_name
+
 def change_proxy_by_name(device_name):
     url = 'http://192.168.223.144:9000/android/change_proxy_by_name'
     headers = {'Content-Type': 'application/json'}
@@ -23,7 +27,7 @@ if __name__ == "__main__":
     for item in info_list:
         phone_number = item[0]
         index = item[1]
-        device_name = f"T100{index}-{phone_number}"
+        device_name = machine_name(index, phone_number)
         print(f"Processing device: {device_name}")
         result = change_proxy_by_name(device_name)
         print(f"Status Code: {result.status_code}")
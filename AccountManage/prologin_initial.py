@@ -6,6 +6,7 @@ import sys
 # Add parent directory to path to import MachineManage
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from MachineManage.tools import change_login_state,TransName
+from MachineManage.slots import machine_name
 
 def start_lamda(index:int,phone:str):
     url = f"{domain}/rpc/startLamda/"
@@ -13,10 +14,10 @@ def start_lamda(index:int,phone:str):
         "host": host_local,
         "ip": ip,
         "index": index,
-        "name": f"T100{index}-{phone}",
+        "name": machine_name(index, phone),
     }
     response = requests.post(url, json=data)
-    print(f"start_lamda T100{index}-{phone} >>>>{response.text}")
+    print(f"start_lamda {machine_name(index, phone)} >>>>{response.text}")
 
 def batch_changeLogin_state(ip: str, host_local: str, device_info_list: list):
     """
@@ -29,7 +30,7 @@ def batch_changeLogin_state(ip: str, host_local: str, device_info_list: list):
     """
     for phone, index, _, _ in device_info_list:
         #start_lamda(index, phone) AVOID START LAMDAT IF IN RELOGIN TASK
-        device_name = f"T100{index}-{phone}"
+        device_name = machine_name(index, phone)
         change_login_state([device_name])
 
 if __name__ == "__main__":
@@ -9,6 +9,7 @@ import redis
 from multiprocessing import Pool
 from functools import partial
 from MachineManage.tools import change_login_state,TransName
+from MachineManage.slots import machine_name
 import json
 #from xhs_crawler.XhsInterfaceService import XhsInterfaceService
 import requests
@@ -36,7 +37,7 @@ info_list = []  # TODO: Specify which info_list to use
 async def initial_test(number: str, index: str):
     """测试账号是否可用"""
     await XhsInterfaceService.init(redis_url)
-    resp = await XhsInterfaceService.user_feed(user_profile_id="67853ac9000000000801b179", account_id=f"T100{index}-{number}")
+    resp = await XhsInterfaceService.user_feed(user_profile_id="67853ac9000000000801b179", account_id=machine_name(index, number))
     #pprint.pprint(resp)
     await XhsInterfaceService.close()
     return resp
@@ -48,10 +49,10 @@ def start_lamda(index: int, phone: str):
         "host": host_local,
         "ip": ip,
         "index": index,
-        "name": f"T100{index}-{phone}",
+        "name": machine_name(index, phone),
     }
     response = requests.post(url, json=data)
-    print(f"start_lamda T100{index}-{phone} >>>>{response.text}")
+    print(f"start_lamda {machine_name(index, phone)} >>>>{response.text}")
 
 def update_accountlist(ip: str, host_rpc: str, device_info_list: list, update_account_url: str) -> list:
     """
@@ -87,7 +88,7 @@ def update_accountlist(ip: str, host_rpc: str, device_info_list: list, update_ac
             
             # 打印所有设备状态并收集需要重新登录的设备
             for phone, index, _, _ in device_info_list:
-                device_name = f"T100{index}-{phone}"
+                device_name = machine_name(index, phone)
                 status = device_statuses.get(device_name, "未找到")
                 print(f"{device_name}: {status}")
                 
@@ -135,7 +136,7 @@ def check_accountlist_hook(ip: str, host_rpc: str, device_info_list: list, updat
             
             # 打印所有设备状态并收集需要重新登录的设备
             for phone, index, _, _ in device_info_list:
-                device_name = f"T100{index}-{phone}"
+                device_name = machine_name(index, phone)
                 status = device_statuses.get(device_name, "未找到")
                 print(f"{device_name}: {status}")
                 
@@ -15,9 +15,29 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from setting import load_config, get_ip_config, get_all_ips
 from AutoTasks.ip_processor import process_ip_batches
+from MachineManage.lock_machine import acquire_many, release_many
 
 
-def process_sequential(ips: list, config: dict, global_config: dict) -> dict:
+def _lock_kwargs(fences: dict, ip: str) -> dict:
+    """Pass the fencing token of a lock taken by the orchestrator, if any"""
+    return {"fence": fences[ip]} if fences else {}
+
+
+def _record_result(results: dict, ip: str, result: dict) -> None:
+    """Count a worker result; one carrying an error (lock taken or lost) counts as failed"""
+    results["results"][ip] = result
+    if result.get("error"):
+        print(f"Failed IP {ip}: {result['error']}")
+        results["failed_ips"] += 1
+        return
+    results["completed_ips"] += 1
+    
+    print(f"\nCompleted IP {ip}:")
+    print(f"  Success: {result['success_count']}")
+    print(f"  Failures: {result['failure_count']}")
+
+
+def process_sequential(ips: list, config: dict, global_config: dict, fences: dict = None) -> dict:
     """
     Process IPs one at a time in sequential order.
     
@@ -29,12 +49,15 @@ def process_sequential(ips: list, config: dict, global_config: dict) -> dict:
         ips: List of IP addresses to process
         config: Complete configuration dict with "global" and "ips" sections
         global_config: Global configuration dict
+        fences: Optional {ip: fencing token} of IP locks already held by the caller;
+            without them each IP is locked just before it is processed and
+            released right after
     
     Returns:
         dict: Orchestrator results with keys:
             - total_ips: Total number of IPs to process
             - completed_ips: Number of IPs that completed successfully
-            - failed_ips: Number of IPs that failed
+            - failed_ips: Number of IPs that failed (including IPs whose lock was taken)
             - results: Dict mapping IP addresses to their results
     
     Requirements: 5.1, 5.4, 5.5
@@ -53,14 +76,9 @@ def process_sequential(ips: list, config: dict, global_config: dict) -> dict:
             print(f"{'='*60}\n")
             
             ip_config = get_ip_config(ip)
-            result = process_ip_batches(ip, ip_config, global_config)
+            result = process_ip_batches(ip, ip_config, global_config, **_lock_kwargs(fences, ip))
             
-            results["results"][ip] = result
-            results["completed_ips"] += 1
-            
-            print(f"\nCompleted IP {ip}:")
-            print(f"  Success: {result['success_count']}")
-            print(f"  Failures: {result['failure_count']}")
+            _record_result(results, ip, result)
             
         except Exception as e:
             print(f"Error processing IP {ip}: {e}")
@@ -70,7 +88,8 @@ def process_sequential(ips: list, config: dict, global_config: dict) -> dict:
     return results
 
 
-def process_parallel(ips: list, config: dict, global_config: dict, max_parallel: int) -> dict:
+def process_parallel(ips: list, config: dict, global_config: dict, max_parallel: int,
+                     fences: dict = None) -> dict:
     """
     Process multiple IPs concurrently with a concurrency limit.
     
@@ -83,12 +102,13 @@ def process_parallel(ips: list, config: dict, global_config: dict, max_parallel:
         config: Complete configuration dict with "global" and "ips" sections
         global_config: Global configuration dict
         max_parallel: Maximum number of IPs to process concurrently
+        fences: Optional {ip: fencing token} of IP locks already held by the caller
     
     Returns:
         dict: Orchestrator results with keys:
             - total_ips: Total number of IPs to process
             - completed_ips: Number of IPs that completed successfully
-            - failed_ips: Number of IPs that failed
+            - failed_ips: Number of IPs that failed (including results carrying an error)
             - results: Dict mapping IP addresses to their results
     
     Requirements: 5.2, 5.3, 5.4, 5.5
@@ -103,7 +123,8 @@ def process_parallel(ips: list, config: dict, global_config: dict, max_parallel:
     with ProcessPoolExecutor(max_workers=max_parallel) as executor:
         # Submit all IP processing tasks
         future_to_ip = {
-            executor.submit(process_ip_batches, ip, get_ip_config(ip), global_config): ip
+            executor.submit(process_ip_batches, ip, get_ip_config(ip), global_config,
+                            **_lock_kwargs(fences, ip)): ip
             for ip in ips
         }
         
@@ -112,12 +133,7 @@ def process_parallel(ips: list, config: dict, global_config: dict, max_parallel:
             ip = future_to_ip[future]
             try:
                 result = future.result()
-                results["results"][ip] = result
-                results["completed_ips"] += 1
-                
-                print(f"\nCompleted IP {ip}:")
-                print(f"  Success: {result['success_count']}")
-                print(f"  Failures: {result['failure_count']}")
+                _record_result(results, ip, result)
                 
             except Exception as e:
                 print(f"Error processing IP {ip}: {e}")
@@ -176,8 +192,31 @@ def process_all_ips(mode: str = "sequential", max_parallel: int = 3, selected_ip
         print(f"* Max Parallel: {max_parallel}")
     print(f"{'*'*60}\n")
     
+    # In parallel mode every IP is locked up front in one Redis round trip and
+    # workers only verify their fencing token. Sequential mode leaves locking to
+    # process_ip_batches, so each IP is held only while it is being processed;
+    # slot mode always leaves locking to the workers.
+    fences = None
+    denied = []
+    if mode == "parallel" and global_config.get("lock_mode") != "slot":
+        locks = acquire_many(ips)
+        fences = {ip: lease.fence for ip, lease in locks["granted"].items()}
+        denied = locks["denied"]
+        ips = [ip for ip in ips if ip in fences]
+    
     # Route to appropriate processing function
-    if mode == "sequential":
-        return process_sequential(ips, config, global_config)
-    else:  # mode == "parallel"
-        return process_parallel(ips, config, global_config, max_parallel)
+    try:
+        if mode == "sequential":
+            results = process_sequential(ips, config, global_config, fences)
+        else:  # mode == "parallel"
+            results = process_parallel(ips, config, global_config, max_parallel, fences)
+    finally:
+        if fences:
+            release_many(list(fences))
+    
+    for ip in denied:
+        print(f"Skipped IP {ip}: already being processed")
+        results["total_ips"] += 1
+        results["failed_ips"] += 1
+        results["results"][ip] = {"error": "Failed to acquire IP lock"}
+    return results
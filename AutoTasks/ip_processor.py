@@ -17,15 +17,20 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from MachineManage.stop_machine import stop_batch, stop_machines_all, get_machine_namelist
 from MachineManage.start_machine import start_batch
-from MachineManage.lock_machine import lock_machine, release_machine_lock
+from MachineManage.lock_machine import (lock_machine, release_machine_lock, validate_fence,
+                                        lock_ip_shared, release_ip_shared)
+from MachineManage.slot_queue import seed_slot_work, pending_slots, claim_batch, release_slot_work
 from setting import write_ip_config, append_ip_config, group_pools, batch_slice
 from AccountManage.prologin_initial import batch_changeLogin_state
 from AccountManage.account_requests import accountGet_ip
 from SMSLogin.SmsRelogin import relogin_process, check_loginstate_batch
 from AccountManage.test_account import update_accountlist
 from MachineManage.start_machine import wait_machines_ready
+from MachineManage.warm_pool import create_warm_pool
+from Autolization.registry import prepare_worker
 
-def process_single_batch(ip: str, ip_config: dict, global_config: dict, batch: list) -> dict:
+def process_single_batch(ip: str, ip_config: dict, global_config: dict, batch: list, warm_pool=None,
+                         slot_mode: bool = False) -> dict:
 
     print(f"\n{'='*60}")
     print(f"Processing batch for IP {ip}: {len(batch)} devices")
@@ -36,22 +41,30 @@ def process_single_batch(ip: str, ip_config: dict, global_config: dict, batch: l
     host_rpc = global_config["host_rpc"]
     update_account_url = global_config["update_account_url"]
     
-    # 1. Write batch to IP's info_list
-    write_ip_config(ip, "info_list", batch)
+    # 1. Write batch to IP's info_list (in slot mode it is kept per slot in Redis by claim_batch)
+    if not slot_mode:
+        write_ip_config(ip, "info_list", batch)
     
-    # 2. Stop and start machines
-    print(f"Stopping batch machines for IP {ip}...")
-    stop_batch(ip, host_local, batch)
-    
-    print(f"Starting batch machines for IP {ip}...")
-    start_batch(ip, host_local, batch)
-    
-    wait_machines_ready(ip, host_local, batch)
+    # 2. Stop and start machines (or take them already booted from the warm pool)
+    if warm_pool is None:
+        print(f"Stopping batch machines for IP {ip}...")
+        stop_batch(ip, host_local, batch)
+        
+        print(f"Starting batch machines for IP {ip}...")
+        start_batch(ip, host_local, batch)
+        
+        wait_machines_ready(ip, host_local, batch)
+    else:
+        print(f"Acquiring warm machines for IP {ip}...")
+        not_ready = warm_pool.acquire_batch(batch)
+        if not_ready:
+            print(f"Warning: {len(not_ready)} machines not booted for IP {ip}: {not_ready}")
     time.sleep(5)
 
     # 3. Execute relogin with multiprocessing
     print(f"Executing SMS relogin for {len(batch)} devices...")
-    with ProcessPoolExecutor(max_workers=4) as executor:
+    # Workers decode every template once up front instead of on each match
+    with ProcessPoolExecutor(max_workers=4, initializer=prepare_worker) as executor:
         relogin_func = partial(relogin_process, ip, host_local)
         executor.map(relogin_func, batch)
     
@@ -78,7 +91,10 @@ def process_single_batch(ip: str, ip_config: dict, global_config: dict, batch: l
     
     # 8. Stop batch machines
     print(f"Stopping batch machines...")
-    stop_batch(ip, host_local, batch)
+    if warm_pool is None:
+        stop_batch(ip, host_local, batch)
+    else:
+        warm_pool.release_batch(batch)
     
     # Calculate results (no failures tracked when update_accountlist is commented out)
     failure_devices = []
@@ -97,7 +113,75 @@ def process_single_batch(ip: str, ip_config: dict, global_config: dict, batch: l
 
 
 
-def process_ip_batches(ip: str, ip_config: dict, global_config: dict) -> dict:
+def process_slot_queue(ip: str, ip_config: dict, global_config: dict, lease, batch_size: int = 4) -> dict:
+    """
+    Slot-mode body of process_ip_batches: claim work slot by slot from the
+    IP's shared Redis queue (see MachineManage.slot_queue).
+    
+    The first worker on the IP seeds the queue from the account API; every
+    worker then locks free slots with pending accounts and takes one account
+    from each, until nothing is left that it can claim. The IP-wide
+    info_pool/info_list in config.json are never rewritten, so several
+    workers can share the host.
+    
+    Args:
+        ip: IP address to process
+        ip_config: Configuration specific to this IP
+        global_config: Global configuration (domain, redis_url, etc.)
+        lease: Shared IP lease held by the caller (see lock_ip_shared)
+        batch_size: Maximum slots claimed per batch
+    
+    Returns:
+        dict: IP processing results, same keys as process_ip_batches
+    """
+    print(f"Seeding slot queue for IP {ip}...")
+    seed_slot_work(ip, lambda: accountGet_ip(ip))
+    if not pending_slots(ip):
+        print(f"IP {ip} has no pending accounts. Skipping this IP.")
+        return {
+            "ip": ip,
+            "success_count": 0,
+            "failure_count": 0,
+            "processed_batches": 0,
+            "skipped": True,
+            "reason": "No logout accounts found"
+        }
+    
+    results = {
+        "ip": ip,
+        "success_count": 0,
+        "failure_count": 0,
+        "processed_batches": 0,
+        "failures": []
+    }
+    
+    while True:
+        if not lease.held:
+            print(f"Shared lock for IP {ip} was lost, stopping")
+            results["error"] = "IP lock lost"
+            break
+        
+        batch, slot_leases = claim_batch(ip, batch_size)
+        if not batch:
+            # Slots still pending are being worked by other workers
+            print(f"No claimable slots left on IP {ip}")
+            break
+        
+        print(f"\n--- Processing claimed slots {sorted(slot_leases, key=str)} for IP {ip} ---")
+        try:
+            batch_result = process_single_batch(ip, ip_config, global_config, batch, slot_mode=True)
+        finally:
+            release_slot_work(ip, slot_leases)
+        
+        results["processed_batches"] += 1
+        results["success_count"] += batch_result["success_count"]
+        results["failure_count"] += batch_result["failure_count"]
+        results["failures"].extend(batch_result["failures"])
+    
+    return results
+
+
+def process_ip_batches(ip: str, ip_config: dict, global_config: dict, fence: int = None) -> dict:
     """
     Process all batches for a single IP.
     
@@ -105,7 +189,12 @@ def process_ip_batches(ip: str, ip_config: dict, global_config: dict) -> dict:
     1. Loads IP-specific data from ip_config
     2. Creates batches using group_pools() and batch_slice()
     3. Stops all machines for the IP
-    4. Processes each batch using process_single_batch()
+    4. Processes each batch using process_single_batch(), taking booted
+       machines from a warm pool when "warm_pool" is enabled in global config.
+       With "lock_mode": "slot" the IP is only locked shared and batches are
+       claimed slot by slot from a shared Redis queue (process_slot_queue),
+       so several workers can share one host; machines are then not stopped
+       host-wide and the warm pool is not used.
     5. Aggregates results across all batches
     6. Returns IP processing results
     
@@ -113,6 +202,9 @@ def process_ip_batches(ip: str, ip_config: dict, global_config: dict) -> dict:
         ip: IP address to process
         ip_config: Configuration specific to this IP
         global_config: Global configuration (domain, redis_url, etc.)
+        fence: Fencing token of an exclusive IP lock the caller already holds
+            (see lock_machine.acquire_many); the lock is then neither taken
+            nor released here
     
     Returns:
         dict: IP processing results with keys:
@@ -129,25 +221,46 @@ def process_ip_batches(ip: str, ip_config: dict, global_config: dict) -> dict:
     print(f"{'#'*60}\n")
     
     # 1. Lock the IP to prevent concurrent processing
-    print(f"Acquiring lock for IP {ip}...")
-    if not lock_machine(ip):
-        print(f"Failed to acquire lock for IP {ip}. IP is already being processed.")
-        return {
-            "ip": ip,
-            "success_count": 0,
-            "failure_count": 0,
-            "processed_batches": 0,
-            "failures": [],
-            "error": "Failed to acquire IP lock"
-        }
+    slot_mode = fence is None and global_config.get("lock_mode") == "slot"
+    lease = None
+    if fence is not None:
+        print(f"Using lock held by caller for IP {ip} (fence {fence})")
+    else:
+        print(f"Acquiring {'shared' if slot_mode else 'exclusive'} lock for IP {ip}...")
+        lease = lock_ip_shared(ip) if slot_mode else lock_machine(ip)
+        if not lease:
+            print(f"Failed to acquire lock for IP {ip}. IP is already being processed.")
+            return {
+                "ip": ip,
+                "success_count": 0,
+                "failure_count": 0,
+                "processed_batches": 0,
+                "failures": [],
+                "error": "Failed to acquire IP lock"
+            }
+        fence = lease.fence
     
+    def lock_valid():
+        return validate_fence(ip, fence)
+
+    warm_pool = None
     try:
+        if slot_mode:
+            results = process_slot_queue(ip, ip_config, global_config, lease)
+            print(f"\n{'#'*60}")
+            print(f"# Completed IP Processing: {ip}")
+            print(f"# Batches Processed: {results['processed_batches']}")
+            print(f"{'#'*60}\n")
+            return results
+        
         # 2. Auto-fill info_pool from account API
         print(f"Fetching logout accounts for IP {ip}...")
         logout_accounts = accountGet_ip(ip)
         
         if logout_accounts:
             print(f"IP {ip} has {len(logout_accounts)} logout accounts. Writing to info_pool...")
+            if not lock_valid():
+                raise RuntimeError(f"Lock for IP {ip} was lost before writing info_pool")
             # Write logout accounts directly to info_pool in config.json
             write_ip_config(ip, "info_pool", logout_accounts)
             print(f"Successfully updated info_pool for IP {ip}")
@@ -183,7 +296,16 @@ def process_ip_batches(ip: str, ip_config: dict, global_config: dict) -> dict:
         stop_machines_all(ip, host_local, names)
         time.sleep(10)
         
-        # 6. Process each batch
+        # 6. Optionally keep upcoming devices booted ahead of demand
+        warm_pool = create_warm_pool(
+            ip, global_config, batch_size=max((len(batch) for batch in batch_queue), default=4))
+        if warm_pool:
+            for batch in batch_queue:
+                warm_pool.enqueue(batch)
+            warm_pool.start()
+            print(f"Warm pool enabled for IP {ip} (budget: {warm_pool.budget})")
+        
+        # 7. Process each batch
         results = {
             "ip": ip,
             "success_count": 0,
@@ -194,8 +316,13 @@ def process_ip_batches(ip: str, ip_config: dict, global_config: dict) -> dict:
         
         for batch_idx, batch in enumerate(batch_queue, 1):
             print(f"\n--- Processing batch {batch_idx}/{len(batch_queue)} for IP {ip} ---")
+            # Another worker may own the IP now if our lease expired; stop before touching its devices
+            if not lock_valid():
+                print(f"Lock for IP {ip} was lost (fence {fence}), stopping remaining batches")
+                results["error"] = "IP lock lost"
+                break
             
-            batch_result = process_single_batch(ip, ip_config, global_config, batch)
+            batch_result = process_single_batch(ip, ip_config, global_config, batch, warm_pool)
             
             results["processed_batches"] += 1
             results["success_count"] += batch_result["success_count"]
@@ -218,9 +345,15 @@ def process_ip_batches(ip: str, ip_config: dict, global_config: dict) -> dict:
         print(f"\n[!] Error processing IP {ip}: {e}")
         raise
     finally:
-        # 7. Release the IP lock after processing completes (always executes)
-        print(f"Releasing lock for IP {ip}...")
-        release_machine_lock(ip)
+        if warm_pool:
+            warm_pool.close()
+        # 8. Release the IP lock after processing completes (always executes)
+        if lease:
+            print(f"Releasing lock for IP {ip}...")
+            if slot_mode:
+                release_ip_shared(lease)
+            else:
+                release_machine_lock(ip)
 
 if __name__ == "__main__":
     from setting import load_config
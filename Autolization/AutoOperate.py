@@ -11,11 +11,16 @@ import time
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from Autolization.ImgHandle import ImgHandle
+from Autolization.capture import FramePrefetcher, ScreenStream
+from Autolization.forensics import FrameRecorder
+from Autolization.ui_hierarchy import UiLocator
+from Autolization.input_script import InputScript
 from Autolization.SovleCaptch import *
 
 
 class AutoPhone:
-    def __init__(self, ip: str, port: str, host: str = "", name: str = "", auto_connect: bool = True):
+    def __init__(self, ip: str, port: str, host: str = "", name: str = "", auto_connect: bool = True,
+                 poll_tier: str = "full", tiers: dict = None, forensics_frames: int = 0):
         """
         Initialize AutoPhone with device IP and port
         
@@ -25,6 +30,10 @@ class AutoPhone:
             host: Host for API calls (e.g., "192.168.124.5:5000")
             name: Device name for API calls
             auto_connect: Whether to automatically connect on initialization
+            poll_tier: Screenshot tier for presence checks, a key of ImgHandle.tiers
+            tiers: Extra screenshot tiers for ImgHandle, e.g. {"poll": {"level": ..., "reduce": 2}}
+            forensics_frames: Recent frames kept in memory for dump_forensics; off (0) by
+                default, since recording resizes and JPEG-encodes every polled frame
         """
         self.ip = ip
         self.port = port
@@ -34,7 +43,10 @@ class AutoPhone:
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         
         # Initialize image handler
-        self.img_handler = ImgHandle(host=host, ip=ip, name=name)
+        self.img_handler = ImgHandle(host=host, ip=ip, name=name, poll_tier=poll_tier, tiers=tiers)
+        if forensics_frames:
+            self.img_handler.attach_recorder(FrameRecorder(max_frames=forensics_frames))
+        self.ui = UiLocator(self.api_adb_shell)
         
 
 
@@ -113,6 +125,11 @@ class AutoPhone:
         except Exception as e:
             print(e)
             return {"code": -1, "msg": str(e)}
+        finally:
+            if cmd_str.startswith("input ") or "; input " in cmd_str:
+                # Frames and view dumps from before a tap/swipe no longer describe the screen
+                self.img_handler.mark_action()
+                self.ui.invalidate()
     
     def get_screenshot_base64(self):
         """Get screenshot from device via API - delegates to ImgHandle"""
@@ -139,12 +156,8 @@ class AutoPhone:
             min_delay: Minimum delay between characters (seconds)
             max_delay: Maximum delay between characters (seconds)
         """
-        for char in text:
-            # Type single character
-            self.api_adb_shell(f"input text '{char}'")
-            # Random delay between characters to simulate human typing
-            delay = random.uniform(min_delay, max_delay)
-            time.sleep(delay)
+        # One request for the whole text; the random per-character delays run on the device
+        InputScript().type_text(text, min_delay, max_delay).run(self)
         
         print(f"Typed '{text}' with human-like timing")
 
@@ -158,6 +171,11 @@ class AutoPhone:
         img_dir = os.path.join(self.script_dir, "img")
         return self.img_handler.wait_imageDisappear(img_name, timeout, threshold, interval, img_dir)
 
+    def wait_for_any(self, img_names, timeout=50, threshold=0.7):
+        """Wait for the first of several images to appear - delegates to ImgHandle"""
+        img_dir = os.path.join(self.script_dir, "img")
+        return self.img_handler.wait_for_any(img_names, timeout, threshold, img_dir)
+
     def wait_and_click(self, img_name, timeout=50, threshold=0.7, interval=1):
         """
         Wait for an image to appear and then click on it
@@ -183,10 +201,92 @@ class AutoPhone:
         """Click at specific coordinates using ADB"""
         return self.api_adb_shell(f"input tap {x} {y}")
 
-    def element_exists(self, img_name, threshold=0.7):
+    def find_view(self, text=None, resource_id=None, content_desc=None, contains=False, class_name=None):
+        """
+        Find a native view in the UI hierarchy (one uiautomator dump, reused until the next input)
+        
+        Returns:
+            UiNode or None
+        """
+        return self.ui.find(text=text, resource_id=resource_id, content_desc=content_desc, class_name=class_name,
+                            contains=contains)
+
+    def tap_view(self, text=None, resource_id=None, content_desc=None, contains=False, class_name=None,
+                 img_name=None, threshold=0.7):
+        """
+        Tap a view located through the UI hierarchy, falling back to image
+        matching with img_name for widgets the dump does not expose
+        
+        Returns:
+            bool: True if something was tapped
+        """
+        node = self.find_view(text, resource_id, content_desc, contains, class_name)
+        if node:
+            x, y = node.center
+            self.pos_click(x, y)
+            print(f"Clicked view {node} at ({x}, {y})")
+            return True
+        if img_name:
+            match_result = self.element_exists(img_name, threshold)
+            if match_result:
+                x, y = match_result['result']
+                self.pos_click(x, y)
+                print(f"Clicked on {img_name}")
+                return True
+        return False
+
+    def element_exists(self, img_name, threshold=0.7, max_age=None):
         """Check if an element exists on screen - delegates to ImgHandle"""
         img_dir = os.path.join(self.script_dir, "img")
-        return self.img_handler.element_exists(img_name, threshold, img_dir)
+        return self.img_handler.element_exists(img_name, threshold, img_dir, max_age)
+
+    def start_stream(self, max_age=0.5, delay=0.0):
+        """
+        Keep a streaming screencap session open over ADB so image checks read
+        the latest frame instead of requesting a screenshot each time
+        
+        Args:
+            max_age: Oldest frame (seconds) image checks accept before falling back to HTTP
+            delay: Seconds the device sleeps between captures
+        """
+        stream = ScreenStream(self.device_addr, delay=delay).start()
+        self.img_handler.attach_source(stream, max_age=max_age)
+        return stream
+
+    def start_prefetch(self, max_age=0.5, interval=0.3, wait=1.0):
+        """
+        Fetch screenshots in a background thread so back-to-back checks share
+        a recent frame instead of each waiting for a new screenshot
+        
+        Args:
+            max_age: Oldest frame (seconds) image checks accept
+            interval: Seconds between background captures
+            wait: Seconds a check waits for a fresh capture before fetching one itself
+        """
+        level = self.img_handler.tiers["full"].get("level", 3)
+        prefetcher = FramePrefetcher(lambda: self.img_handler.capture_encoded(level), interval=interval,
+                                     name=f"frame-prefetch-{self.device_addr}").start()
+        self.img_handler.attach_source(prefetcher, max_age=max_age, wait=wait)
+        return prefetcher
+
+    def stop_stream(self):
+        """Stop the background capture started by start_stream or start_prefetch"""
+        stream = self.img_handler.detach_source()
+        if stream:
+            stream.stop()
+
+    def dump_forensics(self, reason="failure"):
+        """Save the recent frames and match decisions after a failure - delegates to ImgHandle"""
+        try:
+            return self.img_handler.dump_frames(reason)
+        except Exception as e:
+            print(f"Error saving forensics for {self.device_addr}: {e}")
+            return None
+
+    def scan_screen(self, img_names, threshold=0.7):
+        """Match several templates against a single screenshot - delegates to ImgHandle"""
+        img_dir = os.path.join(self.script_dir, "img")
+        return self.img_handler.scan_screen(img_names, threshold, img_dir)
 
     def random_sleep(self):
         time.sleep(random.randint(1, 3))
@@ -198,28 +298,20 @@ class AutoPhone:
 
     def set_fingerprint(self):
         """打开安全设置页面"""
+        script = InputScript()
         # Open Security settings
-        self.api_adb_shell("am start -a android.settings.SECURITY_SETTINGS")
-        time.sleep(1.5)
-        self.api_adb_shell("input tap 370 830")
-        time.sleep(1)
-        self.api_adb_shell("input text 1234")
-        time.sleep(1)
-        self.api_adb_shell("input keyevent KEYCODE_ENTER")
-        time.sleep(1)
+        script.raw("am start -a android.settings.SECURITY_SETTINGS").sleep(1.5)
+        script.tap(370, 830).sleep(1)
+        script.text("1234").sleep(1)
+        script.key("KEYCODE_ENTER").sleep(1)
         # Scroll down multiple times
-        self.api_adb_shell("input swipe 285 800 285 300 300")
-        time.sleep(0.3)
-        self.api_adb_shell("input swipe 285 800 285 300 300")
-        time.sleep(0.3)
-        self.api_adb_shell("input swipe 285 800 285 300 300")
-        self.api_adb_shell("input tap 595 1200")
-        time.sleep(1)
-        self.api_adb_shell("input tap 124 1211")
-        time.sleep(1)
-        
-        return self.api_adb_shell("input keyevent KEYCODE_HOME")
-        time.sleep(2)
+        script.swipe(285, 800, 285, 300, 300).sleep(0.3)
+        script.swipe(285, 800, 285, 300, 300).sleep(0.3)
+        script.swipe(285, 800, 285, 300, 300)
+        script.tap(595, 1200).sleep(1)
+        script.tap(124, 1211).sleep(1)
+        script.key("KEYCODE_HOME")
+        return script.run(self)
 
     def clear_app_cache(self, package_name: str = None):
         """Clear all cache for all apps or specific package"""
@@ -8,16 +8,17 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from Autolization.AutoOperate import AutoPhone
 from Autolization.xhs_exceptEvents import ExceptionHandler
+from Autolization.registry import get_registry
 
 class XhsAutomation:
     """Xiaohongshu (XHS) app-specific automation methods"""
     
-    # Image constants
-    START_ICON_IMG = "tpl1766629844196.png"
-    LOGIN_ELEMENT_IMG = "tpl1766630010007.png"
-    SECOND_CIRCLE_IMG = "tpl1766627868831.png"
-    COUNTRY_CODE_86_IMG = "tpl1766643959547.png"
-    COUNTRY_CODE_1_IMG = "tpl1766649447388.png"
+    # Image constants, declared in templates.json
+    START_ICON_IMG = get_registry().file("start_icon")
+    LOGIN_ELEMENT_IMG = get_registry().file("login_element")
+    SECOND_CIRCLE_IMG = get_registry().file("second_circle")
+    COUNTRY_CODE_86_IMG = get_registry().file("country_code_86")
+    COUNTRY_CODE_1_IMG = get_registry().file("country_code_1")
     
     def __init__(self, auto_phone):
         """
@@ -30,6 +31,22 @@ class XhsAutomation:
         
         # Initialize exception handler
         self.exception_handler = ExceptionHandler(auto_phone)
+        self.registry = get_registry()
+
+    def touch(self, name, **overrides):
+        """
+        _safe_touch a registry element with its declared threshold, fallback
+        position, clickpos and retry count; elements that declare a "view"
+        query are looked up in the UI hierarchy first, with no screenshot
+        
+        Args:
+            name: Element name in templates.json
+            **overrides: _safe_touch arguments that replace the declared ones
+        """
+        element = self.registry[name]
+        if element.view and self.auto_phone.tap_view(**element.view):
+            return True
+        return self._safe_touch(element.file, **dict(element.touch_args(), **overrides))
     
     def _safe_touch(self, img_name, record_pos=None, threshold=0.6, 
                      timeout=10, clickpos=False,looptime=5):
@@ -47,6 +64,11 @@ class XhsAutomation:
             bool: True if successful, False otherwise
         """
         
+        # Search near the fallback position first; the full screen is only scanned on a miss
+        if record_pos is not None:
+            self.auto_phone.img_handler.hint_region(img_name, self._record_pos_to_screen(record_pos),
+                                                    img_dir=os.path.join(self.auto_phone.script_dir, "img"))
+
         # Try to wait and click using image matching first
         retry_count = 0
         for _ in range(looptime):
@@ -66,30 +88,32 @@ class XhsAutomation:
 
         # If image matching fails and clickpos is True, use fallback position
         if clickpos and record_pos is not None:
-            x, y = record_pos
-            # Convert normalized coordinates to actual coordinates if needed
-            if -1 <= x <= 1 and -1 <= y <= 1:
-                # Assuming 720x1280 resolution as in original code
-                actual_x = int((x + 1) * 720 / 2)
-                actual_y = int((y + 1) * 1280 / 2)
-            else:
-                actual_x, actual_y = x, y
-                
+            actual_x, actual_y = self._record_pos_to_screen(record_pos)
             self.auto_phone.pos_click(actual_x, actual_y)
             print(f"Clicked at fallback position ({actual_x}, {actual_y}) for {img_name}")
             return True
         
         error_msg = f"Failed to click {img_name} and clickpos is False"
         print(f"\033[91m\033[1m{'=' * 80}\n{error_msg.center(80)}\n{'=' * 80}\033[0m")
+        self.auto_phone.dump_forensics(f"touch_{img_name}")
         raise RuntimeError(error_msg)
     
+    @staticmethod
+    def _record_pos_to_screen(record_pos):
+        """Convert normalized record_pos coordinates to screen pixels if needed"""
+        x, y = record_pos
+        if -1 <= x <= 1 and -1 <= y <= 1:
+            # Assuming 720x1280 resolution as in original code
+            return int((x + 1) * 720 / 2), int((y + 1) * 1280 / 2)
+        return x, y
+    
     def switch_country(self):
         """Switch country code from +86 to +1"""
-        self._safe_touch(self.SECOND_CIRCLE_IMG, (-0.324, -0.013), clickpos=True)  # click second little circle
+        self.touch("second_circle")  # click second little circle
         self.auto_phone.random_sleep()
-        self._safe_touch("downarrow.png", (-0.29, -0.438), clickpos=True)  # click +86 to switch country
+        self.touch("downarrow")  # click +86 to switch country
         self.auto_phone.random_sleep()
-        self._safe_touch(self.COUNTRY_CODE_1_IMG, (0.357, -0.426), clickpos=True,looptime=5)  # click +1
+        self.touch("country_code_1")  # click +1
         self.auto_phone.random_sleep()
     
     def into_loginface(self):
@@ -104,18 +128,18 @@ class XhsAutomation:
         self.auto_phone.wait_and_click(self.START_ICON_IMG, timeout=10, threshold=0.7)  # Wait and click start icon
         self.auto_phone.random_sleep()
 
-        self._safe_touch("tpl1766629849292.png", record_pos=(0.018, 0.418))  # Agree Icon
+        self.touch("agree_icon")  # Agree Icon
 
         # Wait for homepage
-        self.auto_phone.wait_for_image("tpl1766713067778.png", timeout=50)
+        self.auto_phone.wait_for_image(self.registry.file("homepage"), timeout=50)
 
         self.auto_phone.random_sleep()
-        self._safe_touch("MeAlpha.png", (0.399, 0.844), clickpos=True,looptime=1)  # click me to login
+        self.touch("me_tab")  # click me to login
         self.auto_phone.random_sleep()
         time.sleep(2)
         
         self.auto_phone.random_sleep()
-        self._safe_touch(self.LOGIN_ELEMENT_IMG, (-0.062, 0.06))  # click homepage login
+        self.touch("login_element")  # click homepage login
         self.auto_phone.random_sleep()
         return True
     
@@ -132,18 +156,17 @@ class XhsAutomation:
         self.auto_phone.wait_and_click(self.START_ICON_IMG, timeout=10, threshold=0.7)  # Wait and click start icon
     
 
-        time.sleep(10)
-        if self.auto_phone.element_exists("tpl1768207957769.png"):
+        # Either the login-again dialog or the login element shows up first
+        dialog_img = self.registry.file("login_again_dialog")
+        hit = self.auto_phone.wait_for_any([dialog_img, self.LOGIN_ELEMENT_IMG], timeout=40)
+        if hit and hit[0] == dialog_img:
             print("from exist ")
-            self._safe_touch("tpl1768207957769.png", record_pos=(0, 0), clickpos=True, looptime=1)
-        # else:
-        #     self.auto_phone.wait_for_image(self.LOGIN_ELEMENT_IMG, timeout=30)  # wait for login element
-        
-        self.auto_phone.wait_for_image(self.LOGIN_ELEMENT_IMG, timeout=30)  # wait for login element
+            self.touch("login_again_dialog")
+            self.auto_phone.wait_for_image(self.LOGIN_ELEMENT_IMG, timeout=30)  # wait for login element
 
         #self._safe_touch("homepagecircle.png", (-0.374, 0.229), threshold=0.7,clickpos=True)  # click little circle
         self.auto_phone.random_sleep()
-        self._safe_touch(self.LOGIN_ELEMENT_IMG, (-0.062, 0.06))  # click homepage login
+        self.touch("login_element")  # click homepage login
         
         self.auto_phone.random_sleep()
 
@@ -160,28 +183,28 @@ class XhsAutomation:
         self.auto_phone.random_sleep()
         time.sleep(3)
         
-        self._safe_touch("tpl1766629849292.png", record_pos=(0.018, 0.418))  # Agree Icon
+        self.touch("agree_icon")  # Agree Icon
 
         
 
     def send_sms(self, phone_number: str):
         
         # Input phone number
-        self._safe_touch("PhoneInput.png", record_pos=(0.051, -0.375), clickpos=True)  # click "phone Number"
+        self.touch("phone_input")  # click "phone Number"
         self.auto_phone.random_sleep()
         self.auto_phone.human_type_text(phone_number)
         self.auto_phone.random_sleep()
         
         # Check for second little circle
-        if self.auto_phone.element_exists("tpl1766627868831.png", threshold=0.7):
+        if self.auto_phone.element_exists(self.SECOND_CIRCLE_IMG, threshold=0.7):
             pass  # Element exists but not clicked
             
         self.auto_phone.random_sleep()
-        self._safe_touch("FirstLogin.png", record_pos=(-0.019, -0.122), clickpos=True,looptime=1)  # click "login"
+        self.touch("first_login")  # click "login"
         
         time.sleep(3)
         for _ in range(15):
-            if self.auto_phone.element_exists("downarrow.png"):
+            if self.auto_phone.element_exists(self.registry.file("downarrow")):
                 break        
             else:
                 self.exceptions_click()  
@@ -214,7 +237,7 @@ class XhsAutomation:
             bool: True if successful
         """
         # Input SMS content
-        self._safe_touch("EnterCode.png", record_pos=(-0.264, -0.231))  # click "Enter code"
+        self.touch("enter_code")  # click "Enter code"
 
         self.auto_phone.human_type_text(sms_code)
         time.sleep(3.0)  # Wait 3 seconds
@@ -236,7 +259,7 @@ class XhsAutomation:
         
         #handle the exception after input smscode
         for _ in range(10):
-            if not self.auto_phone.element_exists("X.png"):
+            if not self.auto_phone.element_exists(self.registry.file("close_x")):
                 break
             self.exceptions_click()
             time.sleep(3)
@@ -266,13 +289,9 @@ class XhsAutomation:
     
     def check_login(self):
         """Check if user is logged in. Returns False if X.png or loggedOut.png found, True otherwise"""
-        if self.auto_phone.element_exists("X.png"):
-            return False
-        elif self.auto_phone.element_exists(self.LOGIN_ELEMENT_IMG):
-            return False
-        elif self.auto_phone.element_exists("loginAgain.png"):
-            return False
-        return True
+        # One screenshot for all three logged-out markers
+        return not self.auto_phone.scan_screen([self.registry.file("close_x"), self.LOGIN_ELEMENT_IMG,
+                                                self.registry.file("login_again")])
 
     def snap_capcha(self, output_path="captcha_template.png"):
         """Capture captcha area from screen"""
@@ -2,17 +2,243 @@
 """Image handling utilities for screenshot capture, template matching, and visualization"""
 
 import os
+import io
 import base64
+import hashlib
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import cv2
+import numpy as np
 import aircv as ac
 from PIL import Image, ImageDraw, ImageFont
 
+from Autolization.capture import DECODE_FLAGS
+from Autolization.forensics import FORENSICS_DIR
+from Autolization.templates import (get_template, template_region, learn_region, declare_region,
+                                    template_options, set_template_options)
+
+PYRAMID_SCALE = 0.5
+PYRAMID_MIN_SIZE = 8  # smallest template side, in pixels, still searched at reduced scale
+PYRAMID_SLACK = 0.15  # coarse scores run lower than full-resolution ones
+
+
+FINGERPRINT_SIZE = (90, 160)  # 1/8 of a 720x1280 screen
+
+
+def frame_fingerprint(frame):
+    """
+    Cheap fingerprint of a frame: hash of a coarsely quantized 1/8-scale
+    grayscale copy, equal for screens that have not visibly changed
+    """
+    small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA)
+    return hashlib.blake2b((small >> 2).tobytes(), digest_size=16).hexdigest()
+
+
+class MatchCache:
+    """LRU of match results keyed by (frame fingerprint, template, threshold)"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns (found, match_result); match_result may be a cached None (no match)"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                result = self._entries[key]
+                return True, dict(result) if result else None
+            self.misses += 1
+            return False, None
+
+    def put(self, key, match_result):
+        with self._lock:
+            self._entries[key] = dict(match_result) if match_result else None
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+MATCH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class MatchExecutor:
+    """
+    Thread pool for template matching
+
+    cv2.matchTemplate releases the GIL, so templates (or frames of different
+    devices) matched on separate threads use separate cores.
+    """
+
+    def __init__(self, max_workers=MATCH_WORKERS):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _pool_executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="match",
+                                                initializer=self._mark_worker)
+            return self._pool
+
+    def _mark_worker(self):
+        self._local.worker = True
+
+    def run(self, func, items):
+        """
+        Apply func to every item, split into one batch per worker
+
+        Items are dealt round-robin so expensive and cheap templates spread
+        evenly. Calls from inside a worker run serially instead of waiting on
+        the pool they occupy.
+
+        Returns:
+            list: Results in items order
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1 or getattr(self._local, "worker", False):
+            return [func(item) for item in items]
+        batch_count = min(self.max_workers, len(items))
+        pool = self._pool_executor()
+        futures = [pool.submit(lambda batch=items[i::batch_count]: [func(item) for item in batch])
+                   for i in range(batch_count)]
+        results = [None] * len(items)
+        for i, future in enumerate(futures):
+            results[i::batch_count] = future.result()
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def match_executor():
+    """Process-wide MatchExecutor, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = MatchExecutor()
+        return _executor
+
+
+def match_frames(jobs, threshold=0.7, executor=None):
+    """
+    Match templates against frames from any number of devices in one parallel batch
+    
+    Args:
+        jobs: (img_handle, frame, img_names, img_dir) per device; img_dir may be None
+        threshold: Matching threshold (0.0-1.0)
+        executor: MatchExecutor to use; defaults to the process-wide one
+        
+    Returns:
+        list: One [(img_name, match_result), ...] per job, in img_names order
+    """
+    tasks = []
+    for index, (handler, frame, img_names, img_dir) in enumerate(jobs):
+        if handler.match_cache is not None:
+            # Fingerprint once up front rather than in every worker
+            handler.fingerprint(frame)
+        for img_name in img_names:
+            template = get_template(handler.template_path(img_name, img_dir))
+            if template is None:
+                print(f"Template image not found: {img_name}")
+                continue
+            tasks.append((index, handler, frame, img_name, template))
+
+    executor = executor or match_executor()
+    results = executor.run(lambda task: task[1].find_template(task[2], task[4], threshold), tasks)
+    hits = [[] for _ in jobs]
+    for (index, _, _, img_name, _), match_result in zip(tasks, results):
+        if match_result:
+            hits[index].append((img_name, match_result))
+    return hits
+
+
+def _gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _shrink(image, scale):
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+
+
+def scaled_template(template, scale):
+    """Template image resized for frames at scale, built once per template"""
+    return template.variant(("scale", scale), lambda image: _shrink(image, scale))
+
+
+def pyramid_template(template, scale):
+    """Grayscale template for the coarse pyramid level at scale, built once per template"""
+    return template.variant(("pyramid", scale), lambda image: _shrink(_gray(image), scale))
+
+
+def strip_data_uri(base64_data):
+    """Drop a 'data:image/...;base64,' prefix if present"""
+    if base64_data.startswith('data:image'):
+        comma_index = base64_data.find(',')
+        if comma_index != -1:
+            return base64_data[comma_index + 1:]
+    return base64_data
+
+
+SCREEN_WIDTH = 720  # width of the screens the templates in img/ were cut from
+
+# Screenshot quality tiers: "level" is the last segment of the screenshot
+# endpoint, "reduce" decodes the image at 1/2, 1/4 or 1/8 size. Only "full" is
+# built in: no endpoint level is known to return a smaller image, and decoding
+# a full payload at reduced size saves no transfer. Pass a "poll" tier through
+# ImgHandle(tiers=...) once a smaller level is confirmed on the backend.
+SCREENSHOT_TIERS = {
+    "full": {"level": 3, "reduce": 1},
+}
+
+
+def decode_base64_image(base64_data, reduce=1):
+    """
+    Decode a base64 PNG/JPEG straight into a BGR array, like ac.imread but without a file
+
+    Args:
+        base64_data: Base64 image, optionally with a data URI prefix
+        reduce: 1, 2, 4 or 8; decode at 1/reduce size, which is cheaper than decode-then-resize
+
+    Returns:
+        numpy.ndarray or None if the data is not a decodable image
+    """
+    try:
+        raw = base64.b64decode(strip_data_uri(base64_data))
+        # frombuffer wraps the decoded bytes without another copy
+        return cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), DECODE_FLAGS[reduce])
+    except Exception as e:
+        print(f"Error decoding image: {e}")
+        return None
+
 
 class ImgHandle:
     """Handles image operations including screenshot capture, template matching, and visualization"""
     
-    def __init__(self, host: str = "", ip: str = "", name: str = ""):
+    def __init__(self, host: str = "", ip: str = "", name: str = "", debug_dir: str = None,
+                 match_cache_size: int = 256, poll_tier: str = "full", tiers: dict = None,
+                 screen_width: int = SCREEN_WIDTH, executor=None):
         """
         Initialize ImgHandle
         
@@ -20,15 +246,38 @@ class ImgHandle:
             host: Host for API calls (e.g., "192.168.124.5:5000")
             ip: Device IP address
             name: Device name for API calls
+            debug_dir: If set, every captured screenshot is also written here
+            match_cache_size: Match results remembered per unchanged frame (0 disables)
+            poll_tier: Screenshot tier used by presence checks (element_exists, waits, scans)
+            tiers: Overrides for SCREENSHOT_TIERS
+            screen_width: Screen width the templates were cut at; frames of any
+                other width get templates scaled to match
+            executor: MatchExecutor for matching several templates at once;
+                defaults to the process-wide one (MatchExecutor(1) matches serially)
         """
         self.host = host
         self.ip = ip
         self.name = name
+        self.debug_dir = debug_dir
+        self.poll_tier = poll_tier
+        self.tiers = dict(SCREENSHOT_TIERS, **(tiers or {}))
+        self.screen_width = screen_width
+        self.frame_source = None
+        self.source_max_age = 0.5
+        self.source_wait = 0.0
+        self.last_action = 0.0
+        self.recorder = None
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
+        # (frame, value) pairs are swapped as a whole so matching threads never
+        # pair one frame with another frame's cached data
+        self._pyramid = (None, {})
+        self.match_cache = MatchCache(match_cache_size) if match_cache_size else None
+        self._fingerprint = (None, None)
+        self.executor = match_executor() if executor is None else executor
     
-    def get_screenshot_base64(self):
+    def get_screenshot_base64(self, level=3):
         """Get screenshot from device via API"""
-        url = f"http://{self.host}/screenshots/{self.ip}/{self.name}/3"
+        url = f"http://{self.host}/screenshots/{self.ip}/{self.name}/{level}"
         try:
             resp = requests.get(url)
             data = resp.json()
@@ -37,12 +286,93 @@ class ImgHandle:
             print(f"Error getting screenshot: {e}")
             return None
 
+    def capture_encoded(self, level=3):
+        """Raw encoded screenshot bytes from the API, None on failure (used by capture.FramePrefetcher)"""
+        screenshot_base64 = self.get_screenshot_base64(level)
+        if not screenshot_base64:
+            return None
+        try:
+            return base64.b64decode(strip_data_uri(screenshot_base64))
+        except Exception as e:
+            print(f"Error decoding screenshot: {e}")
+            return None
+
+    def attach_source(self, source, max_age=0.5, wait=0.0):
+        """
+        Read screenshots from a background capture source (e.g. capture.ScreenStream)
+        
+        Args:
+            source: Object with get(max_age, reduce, timeout, since) returning a BGR frame or None
+            max_age: Default maximum frame age in seconds; older frames fall back to HTTP
+            wait: Seconds to wait for a fresh frame before falling back
+        """
+        self.frame_source = source
+        self.source_max_age = max_age
+        self.source_wait = wait
+
+    def detach_source(self):
+        source, self.frame_source = self.frame_source, None
+        return source
+
+    def attach_recorder(self, recorder):
+        """Keep recent frames and match decisions in recorder (forensics.FrameRecorder)"""
+        self.recorder = recorder
+
+    def _record(self, frame, decisions, threshold):
+        if self.recorder is not None:
+            self.recorder.record(frame, decisions, threshold)
+
+    def dump_frames(self, reason="failure", out_dir=FORENSICS_DIR):
+        """
+        Write the recorder's recent frames, hits boxed via draw_match_result
+        
+        Returns:
+            str: Dump folder, None if there is no recorder or nothing recorded
+        """
+        if self.recorder is None:
+            return None
+        return self.recorder.flush(self.draw_match_result, reason, out_dir, self.name or self.ip, self.screen_width)
+
+    def mark_action(self):
+        """Record a tap/swipe so frames captured before it are no longer served from the source"""
+        self.last_action = time.time()
+
+    def get_screenshot(self, tier="full", max_age=None):
+        """
+        Get screenshot from device as an in-memory BGR array
+
+        Args:
+            tier: Key of self.tiers; "full" for clicking and captcha work,
+                a smaller tier for presence polling
+            max_age: Maximum age in seconds of a frame taken from the attached
+                source (defaults to the source's max_age); frames older than the
+                last mark_action() are never used
+
+        Returns:
+            numpy.ndarray or None if capture or decoding failed
+        """
+        tier_config = self.tiers[tier]
+        if self.frame_source is not None:
+            frame = self.frame_source.get(self.source_max_age if max_age is None else max_age,
+                                          tier_config.get("reduce", 1), self.source_wait, self.last_action)
+            if frame is not None:
+                return frame
+        screenshot_base64 = self.get_screenshot_base64(tier_config.get("level", 3))
+        if not screenshot_base64:
+            print("Failed to get screenshot")
+            return None
+        if self.debug_dir:
+            os.makedirs(self.debug_dir, exist_ok=True)
+            debug_path = os.path.join(self.debug_dir, f"{self.name or 'screen'}_{int(time.time() * 1000)}.png")
+            self.save_base64_as_image(screenshot_base64, debug_path)
+        frame = decode_base64_image(screenshot_base64, tier_config.get("reduce", 1))
+        if frame is None:
+            print("Failed to decode screenshot")
+        return frame
+
     def save_base64_as_image(self, base64_data, output_path):
         """Save base64 image data to file"""
-        if base64_data.startswith('data:image'):
-            comma_index = base64_data.find(',')
-            if comma_index != -1:
-                base64_data = base64_data[comma_index + 1:]
+        base64_data = strip_data_uri(base64_data)
         
         try:
             # Ensure output_path is properly encoded for Windows
@@ -57,11 +387,26 @@ class ImgHandle:
             print(f"Error saving image: {e}")
             return False
 
+    @staticmethod
+    def _as_image(img):
+        """Accept either an image path or an already decoded BGR array"""
+        return img if isinstance(img, np.ndarray) else ac.imread(img)
+
+    @staticmethod
+    def _template_image(obj_img):
+        """Template paths come from the process-wide template cache instead of disk"""
+        if isinstance(obj_img, np.ndarray):
+            return obj_img
+        template = get_template(obj_img)
+        if template is None:
+            raise RuntimeError("file: '%s' not exists" % obj_img)
+        return template.image
+
     def match_image(self, src_img_path, obj_img_path, threshold=0.7):
-        """Match template image in source image using aircv"""
+        """Match template image in source image using aircv; both may be paths or BGR arrays"""
         try:
-            src_img = ac.imread(src_img_path)
-            obj_img = ac.imread(obj_img_path)
+            src_img = self._as_image(src_img_path)
+            obj_img = self._template_image(obj_img_path)
             match_result = ac.find_template(src_img, obj_img, threshold=threshold, rgb=True, bgremove=False)
             return match_result
         except Exception as e:
@@ -73,7 +418,7 @@ class ImgHandle:
         在源图像上标记匹配区域并保存结果
         
         参数:
-        src_img_path: 源图像路径
+        src_img_path: 源图像路径或BGR图像数组
         match_result: 匹配结果字典
         output_path: 输出图像路径
         """
@@ -82,7 +427,10 @@ class ImgHandle:
             return
             
         # 打开源图像
-        img = Image.open(src_img_path)
+        if isinstance(src_img_path, np.ndarray):
+            img = Image.fromarray(cv2.cvtColor(src_img_path, cv2.COLOR_BGR2RGB))
+        else:
+            img = Image.open(src_img_path)
         draw = ImageDraw.Draw(img)
         
         # 获取匹配区域的位置和大小
@@ -127,23 +475,19 @@ class ImgHandle:
         返回:
         bool: 成功返回True，失败返回False
         """
-        import tempfile
-        
         # 获取当前屏幕截图
         screenshot_base64 = self.get_screenshot_base64()
         if not screenshot_base64:
             print("获取截图失败")
             return False
         
-        # 保存临时截图
-        temp_screenshot = os.path.join(tempfile.gettempdir(), "temp_full_screenshot.png")
-        if not self.save_base64_as_image(screenshot_base64, temp_screenshot):
-            print("保存截图失败")
+        # 直接在内存中打开截图
+        try:
+            img = Image.open(io.BytesIO(base64.b64decode(strip_data_uri(screenshot_base64))))
+        except Exception as e:
+            print(f"解析截图失败: {e}")
             return False
         
-        # 打开图像并裁剪
-        img = Image.open(temp_screenshot)
-        
         # 确保坐标顺序正确
         left = min(x1, x2)
         right = max(x1, x2)
@@ -156,12 +500,6 @@ class ImgHandle:
         # 保存裁剪后的图像
         cropped_img.save(output_path)
         
-        # 清理临时文件
-        try:
-            os.remove(temp_screenshot)
-        except:
-            pass
-        
         print(f"已截取区域 ({left},{top})-({right},{bottom}) 并保存至 {output_path}")
         return True
 
@@ -225,38 +563,269 @@ class ImgHandle:
         print(f"Timeout: {img_name} still visible after {timeout}s")
         return False
 
-    def element_exists(self, img_name, threshold=0.7, img_dir=None):
+    def wait_for_any(self, img_names, timeout=50, threshold=0.7, img_dir=None,
+                     min_interval=0.2, max_interval=2.0, backoff=1.5):
+        """
+        Wait until any of several templates appears, matching all of them per frame
+        
+        Polls every min_interval seconds at first, backing off by `backoff` up to
+        max_interval while the screen stays idle; a new action (mark_action)
+        resets polling to fast.
+        
+        Args:
+            img_names: Template filenames, in priority order
+            timeout: Maximum time to wait in seconds
+            threshold: Matching threshold (0.0-1.0)
+            img_dir: Custom image directory path (optional)
+            min_interval: Poll interval right after an action, in seconds
+            max_interval: Longest poll interval while idle, in seconds
+            backoff: Factor the interval grows by after each miss
+            
+        Returns:
+            tuple: (img_name, match_result) of the highest priority hit, None if timeout
+        """
+        start_time = time.time()
+        interval = min_interval
+        last_action = self.last_action
+        print(f"Waiting for any of {img_names} (timeout: {timeout}s, threshold: {threshold})")
 
-        if img_dir:
-            img_path = os.path.join(img_dir, img_name)
-        else:
-            img_path = os.path.join(self.script_dir, f"img/{img_name}")
+        while True:
+            frame = self.get_screenshot(self.poll_tier)
+            if frame is not None:
+                hits = self.match_frame(frame, img_names, threshold, img_dir)
+                if hits:
+                    img_name, match_result = hits[0]
+                    elapsed_time = time.time() - start_time
+                    print(f"Found {img_name} after {elapsed_time:.1f}s with confidence {match_result['confidence']:.2f}")
+                    return img_name, match_result
+
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+            if self.last_action != last_action:
+                last_action = self.last_action
+                interval = min_interval
+            else:
+                interval = min(interval * backoff, max_interval)
+
+        print(f"Timeout waiting for any of {img_names} after {timeout} seconds")
+        return None
+
+    @staticmethod
+    def _offset_result(match_result, dx, dy):
+        """Shift a match found in a cropped region back to screen coordinates"""
+        cx, cy = match_result['result']
+        match_result['result'] = (cx + dx, cy + dy)
+        match_result['rectangle'] = tuple((x + dx, y + dy) for x, y in match_result['rectangle'])
+        return match_result
+
+    def match_region(self, frame, obj_img, threshold, region):
+        """
+        Match a template only inside region (x, y, w, h) of the frame
+
+        Returns:
+            dict: Match result in full-frame coordinates, or None
+        """
+        x, y, w, h = region
+        frame_h, frame_w = frame.shape[:2]
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(frame_w, x + w), min(frame_h, y + h)
+        if right - left < obj_img.shape[1] or bottom - top < obj_img.shape[0]:
+            return None
+        match_result = self.match_image(frame[top:bottom, left:right], obj_img, threshold)
+        if match_result and match_result['confidence'] >= threshold:
+            return self._offset_result(match_result, left, top)
+        return None
+
+    def _frame_level(self, frame, scale):
+        """Grayscale frame at scale, computed once per frame and shared by all templates"""
+        cached_frame, levels = self._pyramid
+        if cached_frame is not frame:
+            levels = {}
+            self._pyramid = (frame, levels)
+        if scale not in levels:
+            levels[scale] = _shrink(_gray(frame), scale)
+        return levels[scale]
+
+    def match_pyramid(self, frame, template, threshold=0.7, scale=PYRAMID_SCALE):
+        """
+        Coarse-to-fine match: locate candidates on a downscaled grayscale
+        frame, then confirm with an RGB match at full resolution in a small
+        window around each candidate, so the result meets the same threshold
+        as a plain full-frame match
         
-        if not os.path.exists(img_path):
-            print(f"Template image not found: {img_path}")
+        Returns:
+            dict: Match result or None (callers fall back to a full-frame search)
+        """
+        width, height = template.size
+        if min(width, height) * scale < PYRAMID_MIN_SIZE:
+            return None
+        small_frame = self._frame_level(frame, scale)
+        small_template = pyramid_template(template, scale)
+        if small_frame.shape[0] < small_template.shape[0] or small_frame.shape[1] < small_template.shape[1]:
             return None
+        scores = cv2.matchTemplate(small_frame, small_template, cv2.TM_CCOEFF_NORMED)
+        pad = int(2 / scale) + 4
+        for _ in range(3):
+            _, score, _, (x, y) = cv2.minMaxLoc(scores)
+            if score < threshold - PYRAMID_SLACK:
+                break
+            region = (int(x / scale) - pad, int(y / scale) - pad, width + 2 * pad, height + 2 * pad)
+            match_result = self.match_region(frame, template.image, threshold, region)
+            if match_result:
+                return match_result
+            # Suppress this candidate and try the next best one
+            sh, sw = small_template.shape[:2]
+            scores[max(0, y - sh // 2):y + sh // 2 + 1, max(0, x - sw // 2):x + sw // 2 + 1] = -1
+        return None
+
+    def use_pyramid(self, img_name, enabled=True, scale=PYRAMID_SCALE, img_dir=None):
+        """Opt a template into coarse-to-fine grayscale matching (for high-contrast icons)"""
+        set_template_options(self.template_path(img_name, img_dir), pyramid=enabled, pyramid_scale=scale)
+
+    def fingerprint(self, frame):
+        """Fingerprint of frame, computed once per frame"""
+        cached_frame, fingerprint = self._fingerprint
+        if cached_frame is not frame:
+            fingerprint = frame_fingerprint(frame)
+            self._fingerprint = (frame, fingerprint)
+        return fingerprint
+
+    def find_template(self, frame, template, threshold=0.7):
+        """
+        Match a cached template against a frame, returning the remembered
+        result when the same template was already matched on an unchanged screen
         
-        temp_screenshot = os.path.join(self.script_dir, "temp_exists_check.png")
+        Returns:
+            dict: Match result or None
+        """
+        screen_width = template_options(template.path).get("screen_width", self.screen_width)
+        scale = round(frame.shape[1] / screen_width, 3)
+        if self.match_cache is None:
+            return self._search_at_scale(frame, template, threshold, scale)
+        key = (self.fingerprint(frame), template.path, template.mtime, threshold, scale)
+        found, match_result = self.match_cache.get(key)
+        if not found:
+            match_result = self._search_at_scale(frame, template, threshold, scale)
+            self.match_cache.put(key, match_result)
+        return match_result
+
+    @staticmethod
+    def _scale_result(match_result, factor):
+        cx, cy = match_result['result']
+        match_result['result'] = (cx * factor, cy * factor)
+        match_result['rectangle'] = tuple((x * factor, y * factor) for x, y in match_result['rectangle'])
+        return match_result
+
+    def _search_at_scale(self, frame, template, threshold, scale):
+        """
+        Search a frame captured at another resolution than the templates: the
+        template is scaled to the frame and results are mapped back to full
+        screen coordinates, so callers can tap them directly
+        """
+        if scale == 1:
+            return self._search_template(frame, template, threshold)
+        image = scaled_template(template, scale)
+        region = template_region(template.path)
+        if region:
+            match_result = self.match_region(frame, image, threshold, tuple(int(v * scale) for v in region))
+            if match_result:
+                return self._scale_result(match_result, 1 / scale)
+        match_result = self.match_image(frame, image, threshold)
+        if match_result and match_result['confidence'] >= threshold:
+            match_result = self._scale_result(match_result, 1 / scale)
+            learn_region(template.path, match_result)
+            return match_result
+        return None
+
+    def _search_template(self, frame, template, threshold=0.7):
+        """
+        Match a cached template against a frame, searching its region hint
+        first, then the coarse-to-fine pyramid if the template opted in, and
+        the full frame only on a miss; hits refresh the hint
         
-        # Get current screenshot
-        screenshot_base64 = self.get_screenshot_base64()
-        if not screenshot_base64:
-            print("Failed to get screenshot")
-            return None
+        Returns:
+            dict: Match result or None
+        """
+        region = template_region(template.path)
+        if region:
+            match_result = self.match_region(frame, template.image, threshold, region)
+            if match_result:
+                return match_result
+        options = template_options(template.path)
+        if options.get("pyramid"):
+            match_result = self.match_pyramid(frame, template, threshold,
+                                              options.get("pyramid_scale", PYRAMID_SCALE))
+            if match_result:
+                learn_region(template.path, match_result)
+                return match_result
+        match_result = self.match_image(frame, template.image, threshold)
+        if match_result and match_result['confidence'] >= threshold:
+            learn_region(template.path, match_result)
+            return match_result
+        return None
+
+    def hint_region(self, img_name, center, size=(240, 240), img_dir=None):
+        """Declare where img_name is expected on screen, e.g. from a fallback tap position"""
+        declare_region(self.template_path(img_name, img_dir), center, size)
+
+    def template_path(self, img_name, img_dir=None):
+        """Resolve a template file name against img_dir or the default img/ directory"""
+        if img_dir:
+            return os.path.join(img_dir, img_name)
+        return os.path.join(self.script_dir, f"img/{img_name}")
+
+    def match_frame(self, frame, img_names, threshold=0.7, img_dir=None):
+        """
+        Match several templates against one already captured frame
+        
+        Args:
+            frame: BGR screenshot array (see get_screenshot)
+            img_names: Template filenames, in priority order
+            threshold: Matching threshold (0.0-1.0)
+            img_dir: Custom image directory path (optional)
             
-        # Save screenshot temporarily
-        if not self.save_base64_as_image(screenshot_base64, temp_screenshot):
-            print("Failed to save screenshot")
+        Returns:
+            list: (img_name, match_result) for every template found, in img_names order
+        """
+        hits = match_frames([(self, frame, img_names, img_dir)], threshold, self.executor)[0]
+        if self.recorder is not None:
+            found = dict(hits)
+            self._record(frame, [(img_name, found.get(img_name)) for img_name in img_names], threshold)
+        return hits
+
+    def scan_screen(self, img_names, threshold=0.7, img_dir=None, max_age=None):
+        """
+        Capture one screenshot and match all templates against it
+        
+        Returns:
+            list: (img_name, match_result) hits in img_names order; empty if capture failed
+        """
+        frame = self.get_screenshot(self.poll_tier, max_age)
+        if frame is None:
+            return []
+        hits = self.match_frame(frame, img_names, threshold, img_dir)
+        for img_name, match_result in hits:
+            print(f"Element {img_name} exists with confidence {match_result['confidence']:.2f}")
+        return hits
+
+    def element_exists(self, img_name, threshold=0.7, img_dir=None, max_age=None):
+
+        img_path = self.template_path(img_name, img_dir)
+        template = get_template(img_path)
+        if template is None:
+            print(f"Template image not found: {img_path}")
             return None
         
-        # Match template
-        match_result = self.match_image(temp_screenshot, img_path, threshold)
+        # Get current screenshot, decoded in memory
+        frame = self.get_screenshot(self.poll_tier, max_age)
+        if frame is None:
+            return None
         
-        # Clean up temp file
-        try:
-            os.remove(temp_screenshot)
-        except:
-            pass
+        # Match template
+        match_result = self.find_template(frame, template, threshold)
+        self._record(frame, [(img_name, match_result)], threshold)
         
         if match_result and match_result['confidence'] >= threshold:
             print(f"Element {img_name} exists with confidence {match_result['confidence']:.2f}")
@@ -0,0 +1,282 @@
+# -*- encoding=utf8 -*-
+"""Background screen capture sources that keep the latest frame of a device in memory"""
+
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class LatestFrame:
+    """
+    Holds the newest captured screenshot and its capture time
+
+    Frames are stored as encoded PNG bytes and decoded on first read, once
+    per size, so a producer that outpaces the readers costs no decode work.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._png = None
+        self._frame = None
+        self._decoded = {}
+        self.timestamp = 0.0
+        self.seq = 0
+
+    def publish_png(self, png, timestamp=None):
+        """Store an encoded PNG (or any cv2-decodable image) as the newest frame"""
+        with self._cond:
+            self._png = png
+            self._frame = None
+            self._decoded = {}
+            self.timestamp = timestamp or time.time()
+            self.seq += 1
+            self._cond.notify_all()
+
+    def publish_frame(self, frame, timestamp=None):
+        """Store an already decoded BGR frame as the newest frame"""
+        with self._cond:
+            self._png = None
+            self._frame = frame
+            self._decoded = {1: frame}
+            self.timestamp = timestamp or time.time()
+            self.seq += 1
+            self._cond.notify_all()
+
+    def age(self):
+        """Seconds since the newest frame was captured, None if there is none"""
+        with self._cond:
+            return time.time() - self.timestamp if self.seq else None
+
+    def get(self, max_age=None, reduce=1, timeout=0.0, since=0.0):
+        """
+        Newest frame, if it is fresh enough
+
+        Args:
+            max_age: Maximum frame age in seconds (None accepts any frame)
+            reduce: 1, 2, 4 or 8 to get the frame at 1/reduce size
+            timeout: Seconds to wait for a fresh enough frame to arrive
+            since: Only accept frames captured at or after this time.time() value
+
+        Returns:
+            numpy.ndarray (the same object for repeated reads of one frame) or None
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while not self._fresh(max_age, since):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if reduce not in self._decoded:
+                self._decoded[reduce] = self._decode(reduce)
+            return self._decoded[reduce]
+
+    def _fresh(self, max_age, since):
+        if not self.seq or self.timestamp < since:
+            return False
+        return max_age is None or time.time() - self.timestamp <= max_age
+
+    def _decode(self, reduce):
+        if self._png is not None:
+            return cv2.imdecode(np.frombuffer(self._png, dtype=np.uint8), DECODE_FLAGS[reduce])
+        return cv2.resize(self._frame, None, fx=1 / reduce, fy=1 / reduce, interpolation=cv2.INTER_AREA)
+
+
+class PngStreamParser:
+    """Splits a byte stream of back-to-back PNG files into complete PNGs"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Add bytes from the stream
+
+        Returns:
+            list: Complete PNG files (bytes) found so far, oldest first
+        """
+        self._buffer.extend(data)
+        pngs = []
+        while True:
+            start = self._buffer.find(PNG_SIGNATURE)
+            if start < 0:
+                # Keep a possible partial signature at the end
+                del self._buffer[:max(0, len(self._buffer) - len(PNG_SIGNATURE) + 1)]
+                return pngs
+            if start:
+                del self._buffer[:start]
+            end = self._png_end()
+            if end is None:
+                return pngs
+            pngs.append(bytes(self._buffer[:end]))
+            del self._buffer[:end]
+
+    def _png_end(self):
+        """Offset just past the IEND chunk of the PNG at the buffer start, None if incomplete"""
+        pos = len(PNG_SIGNATURE)
+        while pos + 8 <= len(self._buffer):
+            length = int.from_bytes(self._buffer[pos:pos + 4], "big")
+            chunk_type = bytes(self._buffer[pos + 4:pos + 8])
+            pos += 12 + length
+            if pos > len(self._buffer):
+                return None
+            if chunk_type == b"IEND":
+                return pos
+        return None
+
+
+class ScreenStream:
+    """
+    Long-lived per-device capture over the existing ADB connection
+
+    Runs `screencap -p` in a loop inside a single `adb exec-out` session and
+    keeps the newest frame in a LatestFrame, so readers get a frame that is a
+    few hundred ms old without a round trip. The session is restarted if it
+    drops.
+    """
+
+    def __init__(self, device_addr, adb="adb", delay=0.0, restart_backoff=2.0):
+        """
+        Args:
+            device_addr: ADB serial, e.g. "192.168.124.15:5002"
+            adb: adb executable
+            delay: Seconds to sleep on the device between captures
+            restart_backoff: Seconds to wait before restarting a dropped session
+        """
+        self.device_addr = device_addr
+        self.adb = adb
+        self.delay = delay
+        self.restart_backoff = restart_backoff
+        self.frames = LatestFrame()
+        self.frame_count = 0
+        self._process = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def command(self):
+        loop = "while true; do screencap -p; " + (f"sleep {self.delay}; " if self.delay else "") + "done"
+        return [self.adb, "-s", self.device_addr, "exec-out", loop]
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"screen-stream-{self.device_addr}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.kill()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._process = subprocess.Popen(self.command(), stdout=subprocess.PIPE,
+                                                 stderr=subprocess.DEVNULL, bufsize=0)
+                self.consume(self._process.stdout)
+            except Exception as e:
+                print(f"Screen stream {self.device_addr} failed: {e}")
+            finally:
+                if self._process and self._process.poll() is None:
+                    self._process.kill()
+            if not self._stop.wait(self.restart_backoff):
+                print(f"Restarting screen stream for {self.device_addr}")
+
+    def consume(self, stream, chunk_size=256 * 1024):
+        """Read PNGs from a binary stream until it ends or the stream is stopped"""
+        parser = PngStreamParser()
+        while not self._stop.is_set():
+            data = stream.read(chunk_size)
+            if not data:
+                return
+            pngs = parser.feed(data)
+            if pngs:
+                # Only the newest complete frame matters
+                self.frames.publish_png(pngs[-1])
+                self.frame_count += len(pngs)
+
+    def get(self, max_age=None, reduce=1, timeout=0.0, since=0.0):
+        """Newest frame no older than max_age seconds (see LatestFrame.get)"""
+        return self.frames.get(max_age, reduce, timeout, since)
+
+
+class FramePrefetcher:
+    """
+    Background thread that keeps fetching screenshots for one device
+
+    Calls capture() every interval seconds and publishes the result into a
+    LatestFrame, so back-to-back checks share one frame and the next capture
+    overlaps with matching and taps. A reader that finds the frame too old
+    wakes the thread for an immediate capture.
+    """
+
+    def __init__(self, capture, interval=0.3, name="frame-prefetcher"):
+        """
+        Args:
+            capture: Callable returning encoded image bytes, or None on failure
+            interval: Seconds between captures while nobody asks for a fresher frame
+            name: Thread name
+        """
+        self.capture = capture
+        self.interval = interval
+        self.name = name
+        self.frames = LatestFrame()
+        self.frame_count = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                encoded = self.capture()
+            except Exception as e:
+                print(f"Frame prefetch failed: {e}")
+                encoded = None
+            if encoded:
+                self.frames.publish_png(encoded)
+                self.frame_count += 1
+            else:
+                self.failures += 1
+            self._wake.wait(self.interval)
+
+    def get(self, max_age=None, reduce=1, timeout=0.0, since=0.0):
+        """Newest frame no older than max_age seconds, waiting up to timeout for a fresh capture"""
+        frame = self.frames.get(max_age, reduce, since=since)
+        if frame is not None or not timeout:
+            return frame
+        self._wake.set()
+        return self.frames.get(max_age, reduce, timeout, since)
@@ -0,0 +1,137 @@
+# -*- encoding=utf8 -*-
+"""In-memory ring buffer of recent frames and match decisions, written to disk only on failure"""
+
+import os
+import re
+import json
+import time
+import weakref
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+FORENSICS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "forensics")
+
+
+class FrameRecorder:
+    """
+    Last max_frames screenshots of one device as JPEG bytes, each with the
+    template decisions made on it, bounded by max_bytes
+    """
+
+    def __init__(self, max_frames=20, max_bytes=8 * 1024 * 1024, scale=0.5, quality=70):
+        """
+        Args:
+            max_frames: Frames kept; older ones are dropped first
+            max_bytes: Cap on the compressed bytes kept across all frames
+            scale: Frames are shrunk by this factor before compression
+            quality: JPEG quality (0-100)
+        """
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.scale = scale
+        self.quality = quality
+        self._records = deque()
+        self._bytes = 0
+        self._last_frame = None
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._records)
+
+    def _encode(self, frame):
+        if self.scale != 1:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return jpeg.tobytes() if ok else b""
+
+    def record(self, frame, decisions=(), threshold=None):
+        """
+        Remember a frame and the decisions made on it; a frame already
+        recorded last only gets the decisions appended
+
+        Args:
+            frame: BGR screenshot array
+            decisions: (img_name, match_result or None) pairs
+            threshold: Threshold the decisions were made with
+        """
+        entries = [{"template": name, "threshold": threshold,
+                    "confidence": round(float(result["confidence"]), 3) if result else None,
+                    "position": [float(v) for v in result["result"]] if result else None,
+                    "result": result} for name, result in decisions]
+        with self._lock:
+            last = self._last_frame() if self._last_frame else None
+            if last is frame and self._records:
+                self._records[-1]["decisions"].extend(entries)
+                return
+            jpeg = self._encode(frame)
+            self._records.append({"time": time.time(), "jpeg": jpeg, "width": frame.shape[1],
+                                  "decisions": entries})
+            self._bytes += len(jpeg)
+            self._last_frame = weakref.ref(frame)
+            while self._records and (len(self._records) > self.max_frames or self._bytes > self.max_bytes):
+                self._bytes -= len(self._records.popleft()["jpeg"])
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._bytes = 0
+            self._last_frame = None
+
+    def flush(self, draw_match_result, reason="failure", out_dir=FORENSICS_DIR, name="device", screen_width=None):
+        """
+        Write the buffered frames, with every hit boxed, plus a decisions.json,
+        then empty the buffer
+
+        Args:
+            draw_match_result: ImgHandle.draw_match_result (image/array, match_result, output_path)
+            reason: Short failure description, used in the folder name
+            out_dir: Parent directory for the dump
+            name: Device name, used in the folder name
+            screen_width: Width the match coordinates refer to; frames are
+                scaled back to it before drawing
+
+        Returns:
+            str: Dump folder, None if nothing was buffered
+        """
+        with self._lock:
+            records = list(self._records)
+            self._records.clear()
+            self._bytes = 0
+            self._last_frame = None
+        if not records:
+            return None
+
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{name}_{reason}")[:80]
+        folder = os.path.join(out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{slug}")
+        os.makedirs(folder, exist_ok=True)
+        summary = {"reason": reason, "device": name, "frames": []}
+        for index, record in enumerate(records):
+            frame = cv2.imdecode(np.frombuffer(record["jpeg"], dtype=np.uint8), cv2.IMREAD_COLOR)
+            target_width = screen_width or record["width"]
+            if frame is not None and frame.shape[1] != target_width:
+                factor = target_width / frame.shape[1]
+                frame = cv2.resize(frame, None, fx=factor, fy=factor, interpolation=cv2.INTER_LINEAR)
+            path = os.path.join(folder, f"{index:02d}_{int(record['time'] * 1000)}.png")
+            if frame is not None:
+                cv2.imwrite(path, frame)
+                for decision in record["decisions"]:
+                    if decision["result"]:
+                        # Draw onto the saved file so several hits end up on one image
+                        draw_match_result(path, decision["result"], path)
+            summary["frames"].append({
+                "file": os.path.basename(path),
+                "time": record["time"],
+                "decisions": [{key: value for key, value in decision.items() if key != "result"}
+                              for decision in record["decisions"]],
+            })
+        with open(os.path.join(folder, "decisions.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"Saved {len(records)} frames for {name} to {folder}")
+        return folder
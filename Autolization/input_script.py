@@ -0,0 +1,119 @@
+# -*- encoding=utf8 -*-
+"""Compile taps, swipes, text and human-like pauses into one device shell script"""
+
+import time
+import random
+import shlex
+
+INPUT_SECONDS = 0.5  # rough on-device cost of one `input` command (it starts a JVM)
+COMMAND_SECONDS = 1.0  # rough cost of any other command, e.g. `am start`
+SAFETY_FACTOR = 4  # a loaded device can run each step this many times slower
+TIMEOUT_MARGIN = 10  # seconds for the HTTP round trip and the backend's adb call
+
+
+def quote_text(text):
+    """Quote text for `input text`: spaces become %s, the rest is shell-quoted"""
+    return shlex.quote(text.replace(" ", "%s"))
+
+
+class InputScript:
+    """
+    A sequence of input commands and pauses sent to the device as a single
+    shell command, so a whole gesture costs one HTTP round trip instead of
+    one per step. Random pauses are drawn when added, so every run keeps its
+    own jitter.
+
+        InputScript().tap(370, 830).pause(0.8, 1.2).text("1234").run(phone)
+    """
+
+    def __init__(self):
+        self.commands = []
+        self.sleep_seconds = 0.0
+        self.input_count = 0
+        self.command_count = 0
+
+    def raw(self, command):
+        """Append any shell command, e.g. 'am start -a android.settings.SECURITY_SETTINGS'"""
+        self.commands.append(command)
+        if command.startswith("input "):
+            self.input_count += 1
+        else:
+            self.command_count += 1
+        return self
+
+    def tap(self, x, y):
+        return self.raw(f"input tap {int(x)} {int(y)}")
+
+    def swipe(self, x1, y1, x2, y2, duration=300):
+        return self.raw(f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration)}")
+
+    def key(self, keycode):
+        return self.raw(f"input keyevent {keycode}")
+
+    def text(self, text):
+        return self.raw(f"input text {quote_text(text)}")
+
+    def sleep(self, seconds):
+        """Fixed pause on the device"""
+        if seconds > 0:
+            self.commands.append(f"sleep {seconds:.3f}")
+            self.sleep_seconds += seconds
+        return self
+
+    def pause(self, min_delay, max_delay):
+        """Random pause between min_delay and max_delay seconds"""
+        return self.sleep(random.uniform(min_delay, max_delay))
+
+    def type_text(self, text, min_delay=0.1, max_delay=0.3):
+        """Type text one character at a time with a random pause after each"""
+        for char in text:
+            self.text(char)
+            self.pause(min_delay, max_delay)
+        return self
+
+    def compile(self):
+        """The script as one shell command line; steps run in order even if one fails"""
+        return "; ".join(self.commands)
+
+    def step_seconds(self):
+        """Rough seconds the script's commands take, pauses excluded"""
+        return self.input_count * INPUT_SECONDS + self.command_count * COMMAND_SECONDS
+
+    def expected_duration(self):
+        """Rough seconds the script takes on the device"""
+        return self.sleep_seconds + self.step_seconds()
+
+    def timeout(self):
+        """
+        HTTP timeout for run(): pauses are fixed, but every step is allowed
+        SAFETY_FACTOR times its usual cost, so a slow device does not time out mid-script
+        """
+        return self.sleep_seconds + self.step_seconds() * SAFETY_FACTOR + TIMEOUT_MARGIN
+
+    def run(self, auto_phone, timeout=None):
+        """
+        Execute the script through auto_phone.api_adb_shell in one request
+
+        A timeout only ends the HTTP request: the device keeps running the
+        script, so part or all of the input may still arrive. Such a response
+        is marked "timed_out"; callers must check the screen instead of
+        resending the script, which would repeat the input.
+
+        Args:
+            auto_phone: AutoPhone of the target device
+            timeout: HTTP timeout; defaults to self.timeout()
+
+        Returns:
+            dict: api_adb_shell response, None for an empty script
+        """
+        if not self.commands:
+            return None
+        if timeout is None:
+            timeout = self.timeout()
+        started = time.time()
+        response = auto_phone.api_adb_shell(self.compile(), timeout=timeout)
+        if isinstance(response, dict) and response.get("code") == -1 and time.time() - started >= timeout:
+            print(f"Input script timed out after {timeout:.1f}s and may still be running on the device; "
+                  f"not resending it")
+            response = dict(response, timed_out=True)
+        return response
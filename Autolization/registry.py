@@ -0,0 +1,197 @@
+# -*- encoding=utf8 -*-
+"""Declarative registry of the UI elements the flows look for (Autolization/templates.json)"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from Autolization.ImgHandle import (SCREEN_WIDTH, SCREENSHOT_TIERS, PYRAMID_SCALE,
+                                    scaled_template, pyramid_template)
+from Autolization.templates import (IMG_DIR, get_template, preload_templates, declare_region,
+                                    set_template_options, template_cache)
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates.json")
+
+ELEMENT_FIELDS = ("file", "threshold", "region", "record_pos", "resolution", "pyramid",
+                  "pyramid_scale", "handler", "clickpos", "looptime", "view")
+
+
+class Element:
+    """One UI element: its template file plus everything the flows need to find and tap it"""
+
+    def __init__(self, name, file, threshold=0.7, region=None, record_pos=None, resolution=(SCREEN_WIDTH, 1280),
+                 pyramid=False, pyramid_scale=PYRAMID_SCALE, handler=None, clickpos=False, looptime=5,
+                 view=None, img_dir=IMG_DIR):
+        """
+        Args:
+            name: Registry key, e.g. "login_element"
+            file: Template file name in img_dir
+            threshold: Matching threshold used when touching or waiting for the element
+            region: Search region (x, y, w, h) in screen pixels, None to derive one from record_pos
+            record_pos: Fallback tap position, normalized (-1..1) like airtest or in pixels
+            resolution: (width, height) of the screen the template was cut from
+            pyramid: Use coarse-to-fine matching (high-contrast icons only)
+            pyramid_scale: Scale of the coarse pyramid level
+            handler: Name of the ExceptionHandler method run on a hit instead of a plain click
+            clickpos: Tap record_pos when the template is not found
+            looptime: Retry rounds for _safe_touch
+            view: UI hierarchy query ({"text"/"resource_id"/"content_desc"/"class_name": ...,
+                "contains": bool}) tried before image matching, for native views
+            img_dir: Directory holding the template
+        """
+        self.name = name
+        self.file = file
+        self.threshold = threshold
+        self.region = tuple(region) if region else None
+        self.record_pos = tuple(record_pos) if record_pos is not None else None
+        self.resolution = tuple(resolution)
+        self.pyramid = pyramid
+        self.pyramid_scale = pyramid_scale
+        self.handler = handler
+        self.clickpos = clickpos
+        self.looptime = looptime
+        self.view = dict(view) if view else None
+        self.path = os.path.join(img_dir, file)
+        self.template = None
+
+    @property
+    def position(self):
+        """Fallback tap position in screen pixels, None if the element has none"""
+        if self.record_pos is None:
+            return None
+        x, y = self.record_pos
+        if -1 <= x <= 1 and -1 <= y <= 1:
+            width, height = self.resolution
+            return int((x + 1) * width / 2), int((y + 1) * height / 2)
+        return int(x), int(y)
+
+    def touch_args(self):
+        """Keyword arguments for XhsAutomation._safe_touch"""
+        return {"record_pos": self.record_pos, "threshold": self.threshold,
+                "clickpos": self.clickpos, "looptime": self.looptime}
+
+    def compile(self, frame_widths=()):
+        """
+        Decode the template and register its region, matching options and
+        scaled variants with the template cache
+
+        Args:
+            frame_widths: Screenshot widths the element will be matched against;
+                a scaled template is built ahead of time for each
+
+        Returns:
+            bool: False if the template file is missing or unreadable
+        """
+        self.template = get_template(self.path)
+        if self.template is None:
+            print(f"Template image not found: {self.path}")
+            return False
+        cache = template_cache()
+        if self.region:
+            cache.set_region(self.path, self.region)
+        elif self.position:
+            declare_region(self.path, self.position)
+        screen_width = self.resolution[0]
+        if screen_width != SCREEN_WIDTH:
+            set_template_options(self.path, screen_width=screen_width)
+        if self.pyramid:
+            set_template_options(self.path, pyramid=True, pyramid_scale=self.pyramid_scale)
+            pyramid_template(self.template, self.pyramid_scale)
+        for width in frame_widths:
+            scale = round(width / screen_width, 3)
+            if scale != 1:
+                scaled_template(self.template, scale)
+        return True
+
+
+class TemplateRegistry:
+    """Named elements in file order, plus the priority order of the exception popups"""
+
+    def __init__(self, elements, exception_order=()):
+        self.elements = OrderedDict((element.name, element) for element in elements)
+        for name in exception_order:
+            if name not in self.elements:
+                raise ValueError(f"Unknown element in exception_order: {name}")
+        self.exception_order = list(exception_order)
+        self.compiled = False
+
+    def __getitem__(self, name):
+        return self.elements[name]
+
+    def __contains__(self, name):
+        return name in self.elements
+
+    def __iter__(self):
+        return iter(self.elements.values())
+
+    def file(self, name):
+        return self.elements[name].file
+
+    def exceptions(self):
+        """Exception popup elements, highest priority first"""
+        return [self.elements[name] for name in self.exception_order]
+
+    def compile(self, frame_widths=None):
+        """
+        Pre-decode and pre-scale every element; run once per worker process
+
+        Args:
+            frame_widths: Screenshot widths to pre-scale for; defaults to the
+                widths of SCREENSHOT_TIERS
+
+        Returns:
+            int: Number of elements whose template loaded
+        """
+        if frame_widths is None:
+            frame_widths = sorted({SCREEN_WIDTH // tier.get("reduce", 1) for tier in SCREENSHOT_TIERS.values()})
+        loaded = sum(1 for element in self if element.compile(frame_widths))
+        self.compiled = True
+        return loaded
+
+
+def load_registry(path=REGISTRY_PATH, img_dir=IMG_DIR):
+    """
+    Parse a registry file without decoding any templates
+
+    Raises:
+        ValueError: On unknown fields or elements without a file
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    defaults = data.get("defaults", {})
+    elements = []
+    for name, fields in data.get("elements", {}).items():
+        unknown = (set(defaults) | set(fields)) - set(ELEMENT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields for element {name}: {sorted(unknown)}")
+        if "file" not in fields:
+            raise ValueError(f"Element {name} has no file")
+        elements.append(Element(name, img_dir=img_dir, **dict(defaults, **fields)))
+    return TemplateRegistry(elements, data.get("exception_order", ()))
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide registry, loaded on first use (compiled by compile_registry)"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = load_registry()
+        return _registry
+
+
+def compile_registry(frame_widths=None):
+    """Pre-decode and pre-scale the process-wide registry"""
+    registry = get_registry()
+    registry.compile(frame_widths)
+    return registry
+
+
+def prepare_worker():
+    """ProcessPoolExecutor initializer: decode all templates and compile the registry"""
+    preload_templates()
+    compile_registry()
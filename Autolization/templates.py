@@ -0,0 +1,227 @@
+# -*- encoding=utf8 -*-
+"""Process-wide cache of decoded template images used for screen matching"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "img")
+
+
+class Template:
+    """A decoded template image plus lazily built variants (grayscale, scaled, ...)"""
+
+    def __init__(self, path, image, mtime):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.image = image
+        self.mtime = mtime
+        self.checked_at = time.time()
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """(width, height) in pixels"""
+        return self.image.shape[1], self.image.shape[0]
+
+    def variant(self, key, build):
+        """
+        Return a derived image cached on the template, building it once
+
+        Args:
+            key: Hashable variant id, e.g. ("gray",) or ("scale", 0.5)
+            build: Callable taking the BGR template image and returning the variant
+        """
+        with self._lock:
+            if key not in self._variants:
+                self._variants[key] = build(self.image)
+            return self._variants[key]
+
+
+class TemplateCache:
+    """Bounded LRU of decoded templates, reloaded when the file's mtime changes"""
+
+    def __init__(self, max_size=64, check_interval=1.0):
+        """
+        Args:
+            max_size: Maximum number of templates kept decoded
+            check_interval: Minimum seconds between mtime checks of one cached file
+        """
+        self.max_size = max_size
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._regions = {}
+        self._options = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path):
+        """
+        Get a decoded template by path
+
+        Returns:
+            Template or None if the file does not exist or cannot be decoded
+        """
+        path = os.path.abspath(path)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and now - entry.checked_at < self.check_interval:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry.mtime == mtime:
+                entry.checked_at = now
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+        image = cv2.imread(path)
+        if image is None:
+            return None
+        entry = Template(path, image, mtime)
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def preload(self, img_dir=IMG_DIR, names=None):
+        """
+        Decode templates ahead of use, e.g. at worker start
+
+        Args:
+            img_dir: Directory holding the templates
+            names: File names to load; defaults to every .png in img_dir
+
+        Returns:
+            int: Number of templates loaded
+        """
+        if names is None:
+            names = sorted(name for name in os.listdir(img_dir) if name.lower().endswith(".png"))
+        loaded = 0
+        for name in names[:self.max_size]:
+            if self.get(os.path.join(img_dir, name)) is not None:
+                loaded += 1
+        return loaded
+
+    def region(self, path):
+        """Search region hint (x, y, w, h) for a template, None if unknown"""
+        with self._lock:
+            hint = self._regions.get(os.path.abspath(path))
+            return hint["box"] if hint else None
+
+    def set_region(self, path, box, learned=False):
+        """
+        Store a search region hint for a template
+
+        A declared hint never replaces one learned from an actual hit;
+        learned hints always replace.
+
+        Args:
+            path: Template path
+            box: (x, y, w, h) in screen pixels
+            learned: True when the box comes from a match on screen
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            current = self._regions.get(path)
+            if current and not learned and current["learned"]:
+                return
+            self._regions[path] = {"box": tuple(int(v) for v in box), "learned": learned}
+
+    def options(self, path):
+        """Per-template matching options, e.g. {"pyramid": True, "pyramid_scale": 0.5}"""
+        with self._lock:
+            return dict(self._options.get(os.path.abspath(path), {}))
+
+    def set_options(self, path, **options):
+        with self._lock:
+            self._options.setdefault(os.path.abspath(path), {}).update(options)
+
+    def forget_region(self, path):
+        with self._lock:
+            self._regions.pop(os.path.abspath(path), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._regions.clear()
+            self._options.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+_cache = TemplateCache()
+
+
+def get_template(path):
+    """Decoded template from the process-wide cache, None if missing"""
+    return _cache.get(path)
+
+
+def preload_templates(img_dir=IMG_DIR, names=None):
+    """Fill the process-wide cache; usable as a ProcessPoolExecutor initializer"""
+    return _cache.preload(img_dir, names)
+
+
+def template_cache():
+    return _cache
+
+
+def region_around(center, size, margin):
+    """(x, y, w, h) box of size (w, h) centred on center and padded by margin on every side"""
+    width, height = size
+    return (int(center[0] - width / 2 - margin), int(center[1] - height / 2 - margin),
+            int(width + 2 * margin), int(height + 2 * margin))
+
+
+def learn_region(path, match_result, margin=None):
+    """Remember where a template was last found, padded so small shifts still hit"""
+    points = match_result['rectangle']
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    width, height = max(xs) - min(xs), max(ys) - min(ys)
+    if margin is None:
+        margin = max(width, height, 40)
+    _cache.set_region(path, region_around(match_result['result'], (width, height), margin), learned=True)
+
+
+def declare_region(path, center, size=(240, 240)):
+    """Declare where a template is expected, e.g. from a known fallback tap position"""
+    _cache.set_region(path, region_around(center, size, 0))
+
+
+def template_region(path):
+    return _cache.region(path)
+
+
+def template_options(path):
+    return _cache.options(path)
+
+
+def set_template_options(path, **options):
+    """Opt a template into matching modes, e.g. set_template_options(path, pyramid=True)"""
+    _cache.set_options(path, **options)
@@ -0,0 +1,152 @@
+# -*- encoding=utf8 -*-
+"""Locate native Android views from a `uiautomator dump` instead of matching screenshots"""
+
+import re
+import time
+import threading
+import xml.etree.ElementTree as ET
+
+DUMP_PATH = "/sdcard/window_dump.xml"
+BOUNDS_PATTERN = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+
+def parse_bounds(bounds):
+    """'[l,t][r,b]' -> (left, top, right, bottom), None if malformed"""
+    match = BOUNDS_PATTERN.fullmatch(bounds or "")
+    return tuple(int(value) for value in match.groups()) if match else None
+
+
+def response_output(response):
+    """
+    Command output from an AutoPhone.api_adb_shell response, which carries it in "msg"
+
+    Returns:
+        str or None if the call failed or the response has no output
+    """
+    if not isinstance(response, dict) or response.get("code") == -1 or not isinstance(response.get("msg"), str):
+        return None
+    return response["msg"]
+
+
+class UiNode:
+    """One view from the hierarchy dump"""
+
+    def __init__(self, attrib):
+        self.text = attrib.get("text", "")
+        self.resource_id = attrib.get("resource-id", "")
+        self.content_desc = attrib.get("content-desc", "")
+        self.class_name = attrib.get("class", "")
+        self.package = attrib.get("package", "")
+        self.clickable = attrib.get("clickable") == "true"
+        self.enabled = attrib.get("enabled", "true") == "true"
+        self.bounds = parse_bounds(attrib.get("bounds"))
+
+    @property
+    def center(self):
+        left, top, right, bottom = self.bounds
+        return (left + right) // 2, (top + bottom) // 2
+
+    def matches(self, text=None, resource_id=None, content_desc=None, class_name=None, contains=False):
+        """
+        True if every given field matches; resource_id also matches on the
+        part after ':id/', so "phone_input" finds "com.xingin.xhs:id/phone_input"
+        """
+        def same(value, wanted):
+            return wanted in value if contains else value == wanted
+
+        if self.bounds is None:
+            return False
+        if text is not None and not same(self.text, text):
+            return False
+        if content_desc is not None and not same(self.content_desc, content_desc):
+            return False
+        if class_name is not None and self.class_name != class_name:
+            return False
+        if resource_id is not None and self.resource_id != resource_id \
+                and self.resource_id.split(":id/")[-1] != resource_id:
+            return False
+        return True
+
+    def __repr__(self):
+        return (f"UiNode(text={self.text!r}, resource_id={self.resource_id!r}, "
+                f"content_desc={self.content_desc!r}, bounds={self.bounds})")
+
+
+def parse_hierarchy(xml_text):
+    """
+    Parse `uiautomator dump` output into nodes in document order
+
+    Returns:
+        list: UiNode for every <node>; empty if the dump is missing or broken
+    """
+    start = xml_text.find("<hierarchy")
+    end = xml_text.rfind("</hierarchy>")
+    if start < 0 or end < 0:
+        return []
+    try:
+        root = ET.fromstring(xml_text[start:end + len("</hierarchy>")])
+    except ET.ParseError as e:
+        print(f"Error parsing UI hierarchy: {e}")
+        return []
+    return [UiNode(node.attrib) for node in root.iter("node")]
+
+
+class UiLocator:
+    """
+    Finds views by text, resource-id or content-desc from one hierarchy dump,
+    reused until it is older than max_age or invalidate() is called after an input
+    """
+
+    def __init__(self, shell, max_age=2.0, dump_path=DUMP_PATH, output=response_output):
+        """
+        Args:
+            shell: Callable running a device shell command, e.g. AutoPhone.api_adb_shell
+            max_age: Seconds a dump is reused for
+            dump_path: Device path uiautomator writes the dump to
+            output: Extracts the command output from a shell response, None on failure
+        """
+        self.shell = shell
+        self.output = output
+        self.max_age = max_age
+        self.dump_path = dump_path
+        self._nodes = None
+        self._dumped_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._nodes = None
+
+    def nodes(self, refresh=False):
+        """Parsed hierarchy, dumped again only when stale; empty (and not cached) if the dump call failed"""
+        with self._lock:
+            if not refresh and self._nodes is not None and time.time() - self._dumped_at < self.max_age:
+                return self._nodes
+        # One shell call: dump to a file and print it
+        response = self.shell(f"uiautomator dump {self.dump_path} >/dev/null && cat {self.dump_path}", timeout=10)
+        xml_text = self.output(response)
+        if xml_text is None:
+            print(f"Error dumping UI hierarchy: {response}")
+            return []
+        nodes = parse_hierarchy(xml_text)
+        with self._lock:
+            self._nodes = nodes
+            self._dumped_at = time.time()
+        return nodes
+
+    def find_all(self, text=None, resource_id=None, content_desc=None, class_name=None, contains=False,
+                 refresh=False):
+        """All views matching the query, in document order"""
+        return [node for node in self.nodes(refresh)
+                if node.matches(text, resource_id, content_desc, class_name, contains)]
+
+    def find(self, text=None, resource_id=None, content_desc=None, class_name=None, contains=False,
+             refresh=False):
+        """
+        First view matching the query
+
+        Returns:
+            UiNode or None
+        """
+        found = self.find_all(text, resource_id, content_desc, class_name, contains, refresh)
+        return found[0] if found else None
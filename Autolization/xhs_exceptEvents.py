@@ -8,6 +8,7 @@ from tkinter import messagebox
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Autolization.registry import get_registry
 
 
 class ExceptionHandler:
@@ -21,26 +22,13 @@ class ExceptionHandler:
             auto_phone: AutoPhone instance to use for image detection and clicking
         """
         self.auto_phone = auto_phone
+        # Popups in priority order, declared in templates.json "exception_order";
+        # elements without a handler are just clicked
         self.exception_images = {
-            "tpl1766712390329.png": None,  # Gift close icon
-            "tpl1766733358148.png": None,  # Later button
-            "tpl1766718656239.png": None,  # Biometric authentication
-            "tpl1768207957769.png": None,  # login in again exception
-            "tpl1768442685927.png": None,  # click me 
-            "MeAlpha.png": None,  # click me 
-            "tryAgian.png": None,
-            "tpl1768207957769.png": None, #login Agian
-            "waitapp.png": None,
-            "agreeCountinue.png": None,
-            "SmsLogin.png": None,
-            "tpl1766968639367.png": None,
-            "tpl1766728475804.png": None, 
-            #"tpl1766630010007.png": None,  # homepage Login
-            # "tpl1766643959547.png": None,  # +86
-            "tpl1766649447388.png": None,  # +1
-            "myt_arrow.png": self.handle_captcha_arrow
-            #Todo Add 
+            element.file: getattr(self, element.handler) if element.handler else None
+            for element in get_registry().exceptions()
         }
+        self.last_hits = []
     
     def click(self, match_result):
         x, y = match_result['result']
@@ -86,18 +74,23 @@ class ExceptionHandler:
         
         return
 
+    def scan_exceptions(self, threshold=0.7):
+        """Match every exception template against one screenshot; returns [(img, match_result)]"""
+        self.last_hits = self.auto_phone.scan_screen(list(self.exception_images), threshold=threshold)
+        return self.last_hits
+
     def handle_exceptions(self, threshold=0.7):
         try:
-            for img, handler in self.exception_images.items():
-                match_result = self.auto_phone.element_exists(img, threshold=threshold)
-                if match_result:
-                    print(f"\033[92mFound image match: {img}\033[0m")
-                    if handler:
-                        # Execute custom handler
-                        return handler(match_result)
-                    else:
-                        # Default: just click
-                        return self.click(match_result)
+            # One capture for the whole sweep; the first hit in priority order is handled
+            for img, match_result in self.scan_exceptions(threshold):
+                print(f"\033[92mFound image match: {img}\033[0m")
+                handler = self.exception_images[img]
+                if handler:
+                    # Execute custom handler
+                    return handler(match_result)
+                else:
+                    # Default: just click
+                    return self.click(match_result)
             return False
         except Exception as e:
             if "Verification image detected" in str(e) or "unexpected img" in str(e):
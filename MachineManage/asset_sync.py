@@ -0,0 +1,204 @@
+"""
+Asset Sync Module
+
+Keeps device-side files (lamda tarball, busybox, spawn yaml) in line with a
+manifest of expected files and their hashes. Each device is checked with a
+single batched md5sum shell call, and only missing or changed files are
+pushed, so re-provisioning a fleet costs bandwidth only for what changed.
+"""
+
+import sys
+import os
+import hashlib
+import subprocess
+import threading
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from MachineManage.tools import api_adb_shell, shell_output, config, SPAWN_YAML_NAME
+from MachineManage.slots import parse_machine_name, machine_port
+from MachineManage.fleet import list_running_devices, run_per_host, summarize
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources")
+
+# (local file in resources/, remote path, chmod mode or None). The lamda
+# tarball is not checked in: place the release build in resources/ before
+# syncing, otherwise every sync fails.
+DEFAULT_ASSETS = [
+    ("lamda-server-arm64-v8a.tar.gz", "/data/local/tmp/lamda-server-arm64-v8a.tar.gz", None),
+    ("busybox-arm64-v8a", "/data/local/tmp/busybox-arm64-v8a", "755"),
+    ("xhs9.15.0.spawn.yaml", f"/data/local/tmp/{SPAWN_YAML_NAME}", None),
+]
+
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
+
+def file_md5(path: str) -> str:
+    """md5 of a local file, cached on (path, size, mtime) so big tarballs are hashed once"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if key in _hash_cache:
+            return _hash_cache[key]
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _hash_lock:
+        _hash_cache[key] = value
+    return value
+
+
+def build_manifest(assets: list = None, resources_dir: str = RESOURCES_DIR) -> list:
+    """
+    Build the manifest of files that should exist on every device
+
+    Args:
+        assets: (local name, remote path, mode) tuples; defaults to DEFAULT_ASSETS
+        resources_dir: Directory that holds the local files
+
+    Returns:
+        list: Entries {"local", "remote", "mode", "md5"}; md5 is None for a
+            missing local file, which makes sync_device fail
+    """
+    manifest = []
+    for local_name, remote, mode in (assets if assets is not None else DEFAULT_ASSETS):
+        local = local_name if os.path.isabs(local_name) else os.path.join(resources_dir, local_name)
+        if not os.path.exists(local):
+            logger.error(f"Asset not found locally: {local}")
+            manifest.append({"local": local, "remote": remote, "mode": mode, "md5": None})
+            continue
+        manifest.append({"local": local, "remote": remote, "mode": mode, "md5": file_md5(local)})
+    return manifest
+
+
+def remote_hashes(dip: str, dname: str, remote_paths: list) -> dict:
+    """
+    Hash every remote path with one shell call
+
+    Returns:
+        dict: {remote path: md5} for files that exist on the device
+
+    Raises:
+        ShellOutputError: If the hash call got no answer, rather than treating every file as missing
+    """
+    if not remote_paths:
+        return {}
+    cmd = "md5sum " + " ".join(f"'{path}'" for path in remote_paths) + " 2>/dev/null"
+    output = shell_output(api_adb_shell(dip, dname, cmd, timeout=30))
+    hashes = {}
+    for line in output.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2 and len(parts[0]) == 32:
+            hashes[parts[1].strip()] = parts[0].lower()
+    return hashes
+
+
+def device_addr(dip: str, dname: str) -> str:
+    """ADB address of a container, derived from its slot"""
+    parsed = parse_machine_name(dname)
+    if not parsed:
+        raise ValueError(f"Cannot derive ADB port from device name {dname}")
+    return f"{dip}:{machine_port(parsed[0])}"
+
+
+def push_file(dip: str, dname: str, local: str, remote: str, timeout: int = 600) -> bool:
+    """Push one file to a device over ADB"""
+    addr = device_addr(dip, dname)
+    subprocess.run(f"adb connect {addr}", shell=True, capture_output=True, text=True, timeout=10)
+    result = subprocess.run(
+        f'adb -s {addr} push "{local}" "{remote}"',
+        shell=True,
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        logger.error(f"push {local} -> {dip} {dname}:{remote} failed: {result.stderr.strip()}")
+        return False
+    return True
+
+
+def sync_device(dip: str, dname: str, manifest: list = None) -> dict:
+    """
+    Push only the manifest files that are missing or differ on one device
+
+    Args:
+        dip: Device IP
+        dname: Device name
+        manifest: Entries from build_manifest (built with defaults if None)
+
+    Returns:
+        dict: {"ok": bool, "pushed": [remote paths], "unchanged": [remote paths], "failed": [remote paths]};
+            ok is False if any file could not be pushed or is missing locally
+    """
+    if manifest is None:
+        manifest = build_manifest()
+    existing = remote_hashes(dip, dname, [entry["remote"] for entry in manifest if entry["md5"]])
+
+    report = {"ok": True, "pushed": [], "unchanged": [], "failed": []}
+    chmods = []
+    for entry in manifest:
+        if entry["md5"] is None:
+            logger.error(f"{dip} {dname}: cannot sync {entry['remote']}, {entry['local']} is missing")
+            report["failed"].append(entry["remote"])
+            report["ok"] = False
+            continue
+        if existing.get(entry["remote"]) == entry["md5"]:
+            report["unchanged"].append(entry["remote"])
+            continue
+        if push_file(dip, dname, entry["local"], entry["remote"]):
+            report["pushed"].append(entry["remote"])
+            if entry["mode"]:
+                chmods.append(f"chmod {entry['mode']} '{entry['remote']}'")
+        else:
+            report["failed"].append(entry["remote"])
+            report["ok"] = False
+
+    if chmods:
+        api_adb_shell(dip, dname, " && ".join(chmods), timeout=10)
+
+    logger.info(f"asset sync {dip} {dname}: pushed {len(report['pushed'])}, "
+                f"unchanged {len(report['unchanged'])}, failed {len(report['failed'])}")
+    return report
+
+
+def sync_fleet(ips: list = None, targets: list = None, manifest: list = None,
+               per_host_limit: int = 2, max_workers: int = 16) -> dict:
+    """
+    Sync assets to every running device concurrently
+
+    Args:
+        ips: IP addresses to cover (defaults to every IP in ip_dict)
+        targets: Explicit (ip, name) tuples; overrides ips
+        manifest: Entries from build_manifest (built with defaults if None)
+        per_host_limit: Maximum concurrent pushes per host
+        max_workers: Maximum concurrent devices overall
+
+    Returns:
+        dict: Summary from fleet.summarize plus "pushed_files", the total number of files pushed
+    """
+    if manifest is None:
+        manifest = build_manifest()
+    if targets is None:
+        if ips is None:
+            ips = list(config.get("global", {}).get("ip_dict", {}).keys())
+        targets = list_running_devices(ips)
+
+    def sync(ip, name):
+        report = sync_device(ip, name, manifest)
+        return report if report["ok"] else None
+
+    outcomes = run_per_host(targets, sync, per_host_limit, max_workers)
+    summary = summarize(outcomes)
+    summary["pushed_files"] = sum(len(outcome["result"]["pushed"])
+                                  for outcome in outcomes.values() if outcome["result"])
+    return summary
+
+
+if __name__ == '__main__':
+    print(sync_fleet())
@@ -7,9 +7,9 @@ import asyncio
 import pprint
 import redis
 import requests
-from multiprocessing import Pool
-from functools import partial
 from MachineManage.tools import change_login_state,TransName
+from MachineManage.pipeline import Stage, StagedPipeline
+from MachineManage.slots import machine_name, machine_port, slot_label, SlotAllocator
 from Autolization.AutoOperate import AutoPhone
 import json
 
@@ -39,7 +39,7 @@ if ip not in config["ips"]:
 ip_config = config["ips"][ip]
 info_list = ip_config["info_list"]
 
-gateway_route = "http://36.133.80.179:7152/"+ip_dict[ip]+"-T100{index}" # 远程RPC地址 
+gateway_route = "http://36.133.80.179:7152/"+ip_dict[ip]+"-{label}" # 远程RPC地址 
 
 def reupload_cert(index, phone):
     """Re-upload certificate"""
@@ -47,10 +47,10 @@ def reupload_cert(index, phone):
     data = {
         "host": host_rpc,
         "ip": ip,
-        "name": f"T100{index}-{phone}",
+        "name": machine_name(index, phone),
     }
     response = requests.post(url, json=data)
-    print(f"reupload_cert T100{index}-{phone} >>>>{response.text}")
+    print(f"reupload_cert {machine_name(index, phone)} >>>>{response.text}")
     
     try:
         result = response.json()
@@ -61,37 +61,22 @@ def reupload_cert(index, phone):
         print(f"Error parsing response: {e}")
         return False
 
-def random_device(index, phone):
-        """Randomize device information"""
-        url = f"{domain}/android/refreshDevice/"
-        data = {
-            "host": host_local,
-            "ip": ip,
-            "index": index,
-            "name": f"T100{index}-{phone}",
-        }
-        response = requests.post(url, json=data)
-        print(f"random_device T100{index}-{phone} >>>>{response.text}")
-        result = response.json()
-        
-        if not result.get("data", {}).get("upload_cert_success", False):
-            for attempt in range(3):  # Try up to 3 times
-                if reupload_cert(index, phone):
-                    break
-                time.sleep(1)
-            else:
-                # Loop completed without break - all retries failed
-                print(f"Failed to upload cert after 3 attempts for T100{index}-{phone}")
-                return False
-
-        msg = result.get("msg", "")
-        if "随机设备信息失败" in msg or "设置代理失败" in msg:
-            return False
-
-        
-        return True
+def refresh_device(index, phone):
+    """Randomize device information and return the parsed backend response"""
+    url = f"{domain}/android/refreshDevice/"
+    data = {
+        "host": host_local,
+        "ip": ip,
+        "index": index,
+        "name": machine_name(index, phone),
+    }
+    response = requests.post(url, json=data)
+    print(f"random_device {machine_name(index, phone)} >>>>{response.text}")
+    return response.json()
+
 
 def create_docker(phone: str, index: int,sendCodeUrl,verifyCodeUrl):
+    """Create the android container and return the parsed backend response"""
 
     url = f"{domain}/android/create/?apk_name=xhs9.15.0.apk&yaml_name=xhs.9.15.0.spawn.resp.yaml"
     data = {
@@ -101,7 +86,7 @@ def create_docker(phone: str, index: int,sendCodeUrl,verifyCodeUrl):
         "send_code_url": sendCodeUrl,
         "expire_time": "2026-01-27",
         "proxy": "",
-        "gateway_route": gateway_route.format(index=index),
+        "gateway_route": gateway_route.format(label=slot_label(index)),
         "sid": "",
         "device_id": "",
         "is_login": 0,
@@ -110,21 +95,33 @@ def create_docker(phone: str, index: int,sendCodeUrl,verifyCodeUrl):
             "host": host_rpc,
             "ip": ip,
             "index": index,
-            "name": f"T100{index}-{phone}",
+            "name": machine_name(index, phone),
             "image": image,
         }
     }
 
     response = requests.post(url, json=data)
-    print(f"create_docker T100{index}-{phone} >>>>{response.text}")
-    return response.text
+    print(f"create_docker {machine_name(index, phone)} >>>>{response.text}")
+    try:
+        return response.json()
+    except ValueError:
+        return {"code": -1, "msg": response.text}
+
+
+def create_succeeded(result) -> bool:
+    """True unless the create response carries an error code or a failure message"""
+    if not isinstance(result, dict):
+        return False
+    if "code" in result and result["code"] not in (0, 200):
+        return False
+    return "失败" not in str(result.get("msg", ""))
 
 
 def delete_docker(index: int, phone: str):
-    name = f"T100{index}-{phone}"
+    name = machine_name(index, phone)
     url = f"http://{host_local}/dc_api/v1/remove/{ip}/{name}"
     response=requests.get(url)
-    print(f"delete_docker T100{index}-{phone} >>>>{response.text}")
+    print(f"delete_docker {machine_name(index, phone)} >>>>{response.text}")
 
 
 def sid_login(index:int, phone:str):
@@ -133,66 +130,95 @@ def sid_login(index:int, phone:str):
         "host": host_local,
         "ip": ip,
         "index": index,
-        "name": f"T100{index}-{phone}",
+        "name": machine_name(index, phone),
     }
     response = requests.post(url, json=data)
-    print(f"sid_login T100{index}-{phone} >>>>{response.text}")
+    print(f"sid_login {machine_name(index, phone)} >>>>{response.text}")
 
-def process_device(info,IFlogin):
-    """处理单个设备的函数"""
-    try:
-        _phone, _index, _sendCodeUrl, _verifyCodeUrl = info
-        print("===============================================================")
-        print(f"phone:{_phone},index:{_index}")
-
-        for attempt in range(3):  # Try up to 3 times
-            create_result = create_docker(_phone, _index, _sendCodeUrl, _verifyCodeUrl)
-            
-            if random_device(_index, _phone):
-                # Success, break out of loop
-                print(f"\033[92mSuccessfully created android docker: T100{_index}-{_phone}\033[0m")
-                break
-            else:                    
-                # Failed, delete docker and retry
-                delete_docker(_index, _phone)
-                if attempt < 2:  # Don't print on last attempt
-                    print(f"Attempt {attempt + 1} failed, retrying...")
-                time.sleep(2)
-        else:
-            # Loop completed without break - all retries failed
-            print(f"\033[91mFailed to create android docker after 3 attempts: T100{_index}-{_phone}\033[0m")
-            return False
-
-        """设置锁屏和指纹"""
-        phone = AutoPhone(
-            ip=ip, 
-            port=f"500{_index}",
-            host=host_local, 
-            name=f"T100{_index}-{_phone}",
-            auto_connect=False
-        )
-        phone.set_screenlock("1234")
-        phone.set_fingerprint()
-        
-        # """sid登录"""    
-        # if IFlogin:
-        #     phone.Agree_GoHome()
-        #     sid_login(index=_index, phone=_phone)
-        
-        # """phoneNumber登录"""
-        # if IFlogin:
-        #     phone.Agree_GoHome()
-        #     sid_login(index=_index, phone=_phone)
-        
-        print("===============================================================")
-    except Exception as e:
-        print(e)
-        """http://36.133.80.179:8890/static/?wework_cfm_code=OKWADzu9TeaQeTN%2FFPtcxbhoGb4%2FvzQFGazBzl6W6ugKLUHLDErCphQPvV3mI%2FomqshQZUKMAlqRVQe7XjQj2LtiYqyTZ763YOZQjgOOV2Ho#/proxies/tcp"""
+def _stage_create(item):
+    _phone, _index, _sendCodeUrl, _verifyCodeUrl = item["info"]
+    result = create_docker(_phone, _index, _sendCodeUrl, _verifyCodeUrl)
+    if not create_succeeded(result):
+        print(f"create_docker failed for {machine_name(_index, _phone)}: {result.get('msg', result)}")
+        return False
+    return True
+
+def _stage_randomize(item):
+    _phone, _index = item["info"][0], item["info"][1]
+    result = refresh_device(_index, _phone)
+    msg = result.get("msg", "")
+    if "随机设备信息失败" in msg or "设置代理失败" in msg:
+        return False
+    item["cert_ok"] = result.get("data", {}).get("upload_cert_success", False)
+    return True
+
+def _stage_cert(item):
+    if item.get("cert_ok"):
+        return True
+    item["cert_ok"] = reupload_cert(item["info"][1], item["info"][0])
+    return item["cert_ok"]
+
+def _stage_setup(item):
+    """设置锁屏和指纹"""
+    _phone, _index = item["info"][0], item["info"][1]
+    phone = AutoPhone(
+        ip=ip, 
+        port=machine_port(_index),
+        host=host_local, 
+        name=machine_name(_index, _phone),
+        auto_connect=False
+    )
+    phone.set_screenlock("1234")
+    phone.set_fingerprint()
+    return True
+
+def _cleanup_docker(item):
+    delete_docker(item["info"][1], item["info"][0])
+
+def provision_devices(device_list, create_workers=2, randomize_workers=4, setup_workers=4,
+                      queue_size=8, max_restarts=2):
+    """
+    Provision many devices through a staged pipeline instead of one process per device.
+
+    Stages: create -> randomize -> cert -> setup. Each stage has its own
+    concurrency limit, so slow backend calls (create) are throttled while the
+    cheaper steps keep flowing. Failed randomize/cert steps delete the
+    container and restart the device from create with backoff.
+
+    Args:
+        device_list: List of [phone, index, sendCodeUrl, verifyCodeUrl]; use
+            SlotAllocator.assign to fill in missing indices
+        create_workers: Concurrent create_docker calls (backend capacity)
+        randomize_workers: Concurrent refreshDevice calls
+        setup_workers: Concurrent screen-lock/fingerprint setups
+        queue_size: Capacity of the queue in front of each stage
+        max_restarts: How many times a device may be recreated
+
+    Returns:
+        dict: {"success": [...], "failure": [...]} pipeline item dicts
+    """
+    pipeline = StagedPipeline([
+        Stage("create", _stage_create, workers=create_workers, retries=1, backoff=2),
+        Stage("randomize", _stage_randomize, workers=randomize_workers, retries=1, backoff=2,
+              cleanup=_cleanup_docker, restart_from="create"),
+        Stage("cert", _stage_cert, workers=randomize_workers, retries=3, backoff=1,
+              cleanup=_cleanup_docker, restart_from="create"),
+        Stage("setup", _stage_setup, workers=setup_workers, retries=1, backoff=2),
+    ], queue_size=queue_size, max_restarts=max_restarts)
+
+    results = pipeline.run(device_list)
+
+    for item in results["success"]:
+        print(f"\033[92mSuccessfully created android docker: {machine_name(item['info'][1], item['info'][0])}\033[0m")
+    for item in results["failure"]:
+        print(f"\033[91mFailed to create android docker {machine_name(item['info'][1], item['info'][0])} "
+              f"at {item['stage']}: {item['error']}\033[0m")
+    return results
 
 
 if __name__ == '__main__':
 
-    with Pool(processes=2) as pool:
-        pool.map(partial(process_device, IFlogin=False), info_list)
+    # Phones without an index get the lowest free slot on the host
+    provision_devices(SlotAllocator(ip, host_local).assign(info_list))
 
 
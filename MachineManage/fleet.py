@@ -0,0 +1,126 @@
+"""
+Fleet Execution Module
+
+Runs one operation against many devices across many hosts concurrently while
+limiting how many devices of the same host are touched at once, so a fleet
+job is bounded by total worker count instead of being fully serial, and a
+single host is never flooded.
+"""
+
+import sys
+import os
+import time
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from MachineManage.tools import get_ip_devices
+
+
+def list_running_devices(ips: list) -> list:
+    """
+    Collect running containers for a set of IPs
+
+    Args:
+        ips: IP addresses to query
+
+    Returns:
+        list: (ip, name) tuples of containers whose state is 'running'
+    """
+    targets = []
+    for ip in ips:
+        try:
+            for device in get_ip_devices(ip):
+                if device.get('state') == 'running':
+                    targets.append((ip, device['name']))
+        except Exception as e:
+            logger.error(f"Failed to list devices for {ip}: {e}")
+    return targets
+
+
+def _interleave_by_host(targets: list) -> list:
+    """Order targets round-robin across hosts so workers spread over hosts"""
+    by_host = defaultdict(list)
+    for target in targets:
+        by_host[target[0]].append(target)
+    ordered = []
+    while any(by_host.values()):
+        for ip in list(by_host):
+            if by_host[ip]:
+                ordered.append(by_host[ip].pop(0))
+    return ordered
+
+
+def run_per_host(targets: list, func, per_host_limit: int = 2, max_workers: int = 16,
+                 on_result=None) -> dict:
+    """
+    Run func(ip, name) for every target with a per-host concurrency limit
+
+    Args:
+        targets: (ip, name) tuples
+        func: Callable taking (ip, name); its return value is stored as "result"
+        per_host_limit: Maximum concurrent calls against the same host
+        max_workers: Maximum concurrent calls overall
+        on_result: Optional callback (target, outcome) called as each target finishes
+
+    Returns:
+        dict: {(ip, name): {"ok": bool, "result": ..., "error": str, "elapsed": float}}
+              where "ok" is False when func raised or returned a falsy value
+    """
+    semaphores = defaultdict(lambda: threading.Semaphore(max(1, per_host_limit)))
+    lock = threading.Lock()
+    outcomes = {}
+
+    for ip, _ in targets:
+        semaphores[ip]
+
+    def run_one(target):
+        ip, name = target
+        with semaphores[ip]:
+            started = time.time()
+            try:
+                result = func(ip, name)
+                outcome = {"ok": bool(result), "result": result, "error": None}
+            except Exception as e:
+                logger.error(f"{ip}-{name}: {e}")
+                outcome = {"ok": False, "result": None, "error": str(e)}
+            outcome["elapsed"] = time.time() - started
+        with lock:
+            outcomes[target] = outcome
+        if on_result:
+            on_result(target, outcome)
+        return outcome
+
+    ordered = _interleave_by_host(list(targets))
+    if not ordered:
+        return outcomes
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ordered)))) as executor:
+        list(executor.map(run_one, ordered))
+    return outcomes
+
+
+def summarize(outcomes: dict) -> dict:
+    """
+    Aggregate per-device outcomes into counts and latency figures
+
+    Args:
+        outcomes: Result of run_per_host
+
+    Returns:
+        dict: total, succeeded, failed, failed_targets and latency min/avg/max in seconds
+    """
+    elapsed = [outcome["elapsed"] for outcome in outcomes.values()]
+    failed = [f"{ip}/{name}" for (ip, name), outcome in outcomes.items() if not outcome["ok"]]
+    return {
+        "total": len(outcomes),
+        "succeeded": len(outcomes) - len(failed),
+        "failed": len(failed),
+        "failed_targets": failed,
+        "latency_min": min(elapsed) if elapsed else 0.0,
+        "latency_avg": sum(elapsed) / len(elapsed) if elapsed else 0.0,
+        "latency_max": max(elapsed) if elapsed else 0.0,
+    }
@@ -0,0 +1,82 @@
+"""
+Lamda Fleet Module
+
+Starts, kills or reinstalls lamda on many devices concurrently, with a
+per-host limit, and reports per-device latency. Each device operation waits
+on lamda_status probes (pid alive, port listening) rather than fixed sleeps,
+so a healthy device finishes in seconds.
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from MachineManage.tools import restart_lamda, kill_lamda, reinstall_lamda, config
+from MachineManage.fleet import list_running_devices, run_per_host, summarize
+
+LAMDA_ACTIONS = {
+    "restart": restart_lamda,
+    "kill": kill_lamda,
+    "reinstall": reinstall_lamda,
+}
+
+
+def fleet_lamda(action: str, ips: list = None, targets: list = None,
+                per_host_limit: int = 4, max_workers: int = 32) -> dict:
+    """
+    Run a lamda action on every running device of the given IPs
+
+    Args:
+        action: "restart", "kill" or "reinstall"
+        ips: IP addresses to cover (defaults to every IP in ip_dict)
+        targets: Explicit (ip, name) tuples; overrides ips
+        per_host_limit: Maximum concurrent devices per host
+        max_workers: Maximum concurrent devices overall
+
+    Returns:
+        dict: Summary from fleet.summarize plus "devices": {"ip/name": {"ok", "elapsed"}}
+
+    Raises:
+        ValueError: If action is unknown
+    """
+    if action not in LAMDA_ACTIONS:
+        raise ValueError(f"Invalid action: {action}. Must be one of {sorted(LAMDA_ACTIONS)}")
+
+    if targets is None:
+        if ips is None:
+            ips = list(config.get("global", {}).get("ip_dict", {}).keys())
+        targets = list_running_devices(ips)
+
+    logger.info(f"lamda {action} on {len(targets)} devices (per host: {per_host_limit})")
+
+    def on_result(target, outcome):
+        ip, name = target
+        if outcome["ok"]:
+            logger.success(f"lamda {action} {ip} {name} in {outcome['elapsed']:.1f}s")
+        else:
+            logger.error(f"lamda {action} {ip} {name} failed after {outcome['elapsed']:.1f}s: {outcome['error']}")
+
+    outcomes = run_per_host(targets, LAMDA_ACTIONS[action], per_host_limit, max_workers, on_result=on_result)
+    summary = summarize(outcomes)
+    summary["devices"] = {
+        f"{ip}/{name}": {"ok": outcome["ok"], "elapsed": round(outcome["elapsed"], 2)}
+        for (ip, name), outcome in outcomes.items()
+    }
+    logger.info(f"lamda {action}: {summary['succeeded']}/{summary['total']} ok, "
+                f"latency avg {summary['latency_avg']:.1f}s max {summary['latency_max']:.1f}s")
+    return summary
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a lamda action across the fleet')
+    parser.add_argument('action', choices=sorted(LAMDA_ACTIONS))
+    parser.add_argument('--ips', type=str, nargs='+', help='IP addresses to cover (default: all in ip_dict)')
+    parser.add_argument('--per-host', type=int, default=4, help='Concurrent devices per host (default: 4)')
+    args = parser.parse_args()
+
+    fleet_lamda(args.action, ips=args.ips, per_host_limit=args.per_host)
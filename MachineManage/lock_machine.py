@@ -1,4 +1,17 @@
+"""
+Lock Machine Module
+
+Redis locks that keep two workers from processing the same IP. Locks are
+held with a short TTL that a background heartbeat keeps renewing, so a
+crashed worker frees its IP within seconds. Each lock is owned by a random
+token and released with an atomic compare-and-delete, and every successful
+acquire hands out a monotonically increasing fencing token that writers can
+check before touching shared state.
+"""
+
 import os
+import uuid
+import threading
 import redis
 import json
 
@@ -13,79 +26,528 @@ with open(config_path, 'r', encoding='utf-8') as f:
 redis_url = config["global"]["redis_url"]
 ip = config.get("ip")
 
+LOCK_PREFIX = "xhs_device_login"
+LOCK_TTL = 30  # seconds; renewed every LOCK_TTL / 3 while held
+
+# SET NX PX and bump the fence counter in one round trip. An optional third
+# key names a shared-holder set that must be empty (no live readers).
+ACQUIRE_SCRIPT = """
+if KEYS[3] then
+    local now = redis.call('time')
+    redis.call('zremrangebyscore', KEYS[3], '-inf', now[1] * 1000 + math.floor(now[2] / 1000))
+    if redis.call('zcard', KEYS[3]) > 0 then
+        return 0
+    end
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('incr', KEYS[2])
+end
+return 0
+"""
+
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Shared (read) holders live in a sorted set scored by their expiry in ms.
+# Taking a shared lock fails while the exclusive key exists, and vice versa.
+SHARED_ACQUIRE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return 0
+end
+local now = redis.call('time')
+local now_ms = now[1] * 1000 + math.floor(now[2] / 1000)
+redis.call('zremrangebyscore', KEYS[2], '-inf', now_ms)
+redis.call('zadd', KEYS[2], now_ms + tonumber(ARGV[2]), ARGV[1])
+redis.call('pexpire', KEYS[2], ARGV[2])
+return 1
+"""
+
+SHARED_RENEW_SCRIPT = """
+local now = redis.call('time')
+local now_ms = now[1] * 1000 + math.floor(now[2] / 1000)
+redis.call('zremrangebyscore', KEYS[1], '-inf', now_ms)
+if not redis.call('zscore', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('zadd', KEYS[1], now_ms + tonumber(ARGV[2]), ARGV[1])
+redis.call('pexpire', KEYS[1], ARGV[2])
+return 1
+"""
+
+# Bulk acquire: KEYS are (lock, fence, readers) triplets, ARGV is
+# ttl_ms, all_or_nothing flag, then one owner token per lock. Returns one
+# fence per lock, 0 where it was not granted.
+ACQUIRE_MANY_SCRIPT = """
+local now = redis.call('time')
+local now_ms = now[1] * 1000 + math.floor(now[2] / 1000)
+local count = #KEYS / 3
+local free = {}
+local all_free = true
+for i = 1, count do
+    redis.call('zremrangebyscore', KEYS[3 * i], '-inf', now_ms)
+    free[i] = redis.call('exists', KEYS[3 * i - 2]) == 0 and redis.call('zcard', KEYS[3 * i]) == 0
+    all_free = all_free and free[i]
+end
+local fences = {}
+for i = 1, count do
+    fences[i] = 0
+    if free[i] and (all_free or ARGV[2] ~= '1') then
+        redis.call('set', KEYS[3 * i - 2], ARGV[i + 2], 'PX', ARGV[1])
+        fences[i] = redis.call('incr', KEYS[3 * i - 1])
+    end
+end
+return fences
+"""
+
+RELEASE_MANY_SCRIPT = """
+local released = {}
+for i = 1, #KEYS do
+    released[i] = 0
+    if redis.call('get', KEYS[i]) == ARGV[i] then
+        released[i] = redis.call('del', KEYS[i])
+    end
+end
+return released
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_redis():
+    """Redis client backed by a process-wide connection pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = redis.ConnectionPool.from_url(
+                redis_url,
+                encoding="utf-8",
+                decode_responses=True,
+                max_connections=30
+            )
+    return redis.Redis(connection_pool=_pool)
+
+
+def fence_key(lock_key: str) -> str:
+    return f"{lock_key}:fence"
+
+
+class LockLease:
+    """A held lock: owner token, fencing token and the heartbeat that keeps it alive"""
+
+    def __init__(self, manager, key: str, token: str, fence: int, ttl: float, renew_interval: float,
+                 shared: bool = False):
+        self.manager = manager
+        self.key = key
+        self.shared = shared
+        self.token = token
+        self.fence = fence
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{key}", daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        failures = 0
+        max_failures = max(1, int(self.ttl / self.renew_interval))
+        while not self._stop.wait(self.renew_interval):
+            try:
+                renewed = self.manager.renew(self)
+                failures = 0
+            except Exception as e:
+                # Redis unreachable: keep trying until the TTL has surely run out
+                failures += 1
+                print(f"Error renewing lock {self.key}: {e}")
+                if failures < max_failures:
+                    continue
+                renewed = False
+            if not renewed:
+                print(f"Lost lock {self.key} (fence {self.fence})")
+                self.lost.set()
+                return
+
+    @property
+    def held(self) -> bool:
+        return not self.lost.is_set() and not self._stop.is_set()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.renew_interval + 1)
+
+    def release(self) -> bool:
+        return self.manager.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class LockManager:
+    """Acquire, renew and release owner-token locks over a shared connection pool"""
+
+    def __init__(self, client=None, ttl: float = LOCK_TTL, renew_interval: float = None):
+        self.client = client if client is not None else get_redis()
+        self.ttl = ttl
+        self.renew_interval = renew_interval or ttl / 3
+        self._acquire = self.client.register_script(ACQUIRE_SCRIPT)
+        self._renew = self.client.register_script(RENEW_SCRIPT)
+        self._release = self.client.register_script(RELEASE_SCRIPT)
+        self._shared_acquire = self.client.register_script(SHARED_ACQUIRE_SCRIPT)
+        self._shared_renew = self.client.register_script(SHARED_RENEW_SCRIPT)
+        self._acquire_many = self.client.register_script(ACQUIRE_MANY_SCRIPT)
+        self._release_many = self.client.register_script(RELEASE_MANY_SCRIPT)
+
+    def acquire(self, key: str, readers_key: str = None):
+        """
+        Try to take an exclusive lock once
+
+        Args:
+            key: Lock key
+            readers_key: Shared-holder set that must have no live members
+
+        Returns:
+            LockLease or None if another owner holds the key
+        """
+        token = uuid.uuid4().hex
+        keys = [key, fence_key(key)] + ([readers_key] if readers_key else [])
+        fence = int(self._acquire(keys=keys, args=[token, int(self.ttl * 1000)]))
+        if not fence:
+            return None
+        return LockLease(self, key, token, fence, self.ttl, self.renew_interval)
+
+    def acquire_many(self, keys: list, readers_keys: list, all_or_nothing: bool = False) -> dict:
+        """
+        Take several exclusive locks in one round trip
+
+        Args:
+            keys: Lock keys
+            readers_keys: Shared-holder set for each lock key
+            all_or_nothing: Grant nothing unless every key is free
+
+        Returns:
+            dict: {key: LockLease} for the keys that were granted
+        """
+        if not keys:
+            return {}
+        tokens = [uuid.uuid4().hex for _ in keys]
+        script_keys = []
+        for key, readers_key in zip(keys, readers_keys):
+            script_keys.extend([key, fence_key(key), readers_key])
+        fences = self._acquire_many(keys=script_keys,
+                                    args=[int(self.ttl * 1000), 1 if all_or_nothing else 0] + tokens)
+        return {key: LockLease(self, key, token, int(fence), self.ttl, self.renew_interval)
+                for key, token, fence in zip(keys, tokens, fences) if int(fence)}
+
+    def release_many(self, leases: list) -> list:
+        """Release several leases in one round trip; returns True/False per lease"""
+        if not leases:
+            return []
+        for lease in leases:
+            lease.stop()
+        released = self._release_many(keys=[lease.key for lease in leases],
+                                      args=[lease.token for lease in leases])
+        return [bool(value) for value in released]
+
+    def acquire_shared(self, exclusive_key: str, readers_key: str):
+        """
+        Join the shared holders of readers_key unless exclusive_key is held
+
+        Returns:
+            LockLease (fence 0) or None if the exclusive lock is held
+        """
+        token = uuid.uuid4().hex
+        if not self._shared_acquire(keys=[exclusive_key, readers_key], args=[token, int(self.ttl * 1000)]):
+            return None
+        return LockLease(self, readers_key, token, 0, self.ttl, self.renew_interval, shared=True)
+
+    def renew(self, lease: LockLease) -> bool:
+        script = self._shared_renew if lease.shared else self._renew
+        return bool(script(keys=[lease.key], args=[lease.token, int(lease.ttl * 1000)]))
+
+    def release(self, lease: LockLease) -> bool:
+        """Stop the heartbeat and delete the key only if this lease still owns it"""
+        lease.stop()
+        if lease.shared:
+            return bool(self.client.zrem(lease.key, lease.token))
+        return bool(self._release(keys=[lease.key], args=[lease.token]))
+
+    def is_current(self, key: str, fence: int) -> bool:
+        """True if fence is the newest token issued for key and the lock is still held"""
+        current, exists = self.client.pipeline().get(fence_key(key)).exists(key).execute()
+        return bool(exists) and current is not None and int(current) == int(fence)
+
+
+_manager = None
+_leases = {}
+_leases_lock = threading.Lock()
+
+
+def get_manager() -> LockManager:
+    global _manager
+    with _leases_lock:
+        if _manager is None:
+            _manager = LockManager()
+    return _manager
+
+
+def ip_lock_key(target_ip: str) -> str:
+    return f"{LOCK_PREFIX}:{target_ip}"
+
+
+def ip_readers_key(target_ip: str) -> str:
+    return f"{LOCK_PREFIX}:{target_ip}:readers"
+
+
+def slot_lock_key(target_ip: str, index) -> str:
+    return f"{LOCK_PREFIX}:{target_ip}:slot:{index}"
+
+
+def _hold(key: str, lease: LockLease):
+    with _leases_lock:
+        _leases[key] = lease
+
+
+def _drop(key: str):
+    with _leases_lock:
+        return _leases.pop(key, None)
+
 
 def lock_machine(target_ip=None):
-    """Acquire Redis lock for a specific IP or current IP"""
-    myredis = redis.Redis.from_url(
-        redis_url, 
-        encoding="utf-8", 
-        decode_responses=True,
-        max_connections=30
-    )
-    
+    """
+    Acquire Redis lock for a specific IP or current IP
+
+    Returns:
+        LockLease (truthy, carries the fencing token) or False if the IP is locked
+    """
     # Use provided IP or default to config IP
     lock_ip = target_ip if target_ip else ip
-    lock_key = f"xhs_device_login:{lock_ip}"
-    
+    lock_key = ip_lock_key(lock_ip)
+
     try:
-        result = myredis.set(lock_key, "running", nx=True, ex=60 * 60 * 2)
-        if not result:
+        lease = get_manager().acquire(lock_key, readers_key=ip_readers_key(lock_ip))
+        if not lease:
             print(f"IP already locked: {lock_ip}")
             return False
-        print(f"Successfully locked IP: {lock_ip}")
-        return True
+        _hold(lock_key, lease)
+        print(f"Successfully locked IP: {lock_ip} (fence {lease.fence})")
+        return lease
     except Exception as e:
         print(f"Error acquiring lock: {e}")
         return False
-    finally:
-        myredis.close()
-
-
-def release_machine_lock(target_ip=None):
-    """Release the Redis lock for a specific IP or current IP"""
-    myredis = redis.Redis.from_url(
-        redis_url, 
-        encoding="utf-8", 
-        decode_responses=True,
-        max_connections=30
-    )
-    
+
+
+def release_machine_lock(target_ip=None, force=False):
+    """
+    Release the Redis lock for a specific IP or current IP
+
+    Only a lock held by this process is released, atomically and only if it
+    is still ours. force=True deletes the key regardless of owner, for
+    clearing locks by hand.
+    """
     # Use provided IP or default to config IP
     release_ip = target_ip if target_ip else ip
-    lock_key = f"xhs_device_login:{release_ip}"
-    
+    lock_key = ip_lock_key(release_ip)
+
+    lease = _drop(lock_key)
+
     try:
-        # Check if lock exists
-        if myredis.exists(lock_key):
-            result = myredis.delete(lock_key)
-            if result:
+        if lease:
+            if lease.release():
                 print(f"Successfully released lock for IP: {release_ip}")
                 return True
-            else:
-                print(f"Failed to release lock for IP: {release_ip}")
-                return False
-        else:
-            print(f"No lock found for IP: {release_ip}")
+            print(f"Lock for IP {release_ip} had already expired or changed owner")
+            return False
+        if force:
+            get_redis().delete(lock_key)
+            print(f"Force released lock for IP: {release_ip}")
             return True
+        print(f"No lock held for IP: {release_ip}")
+        return True
     except Exception as e:
         print(f"Error releasing lock: {e}")
         return False
-    finally:
-        myredis.close()
+
+
+def acquire_many(ips: list, all_or_nothing: bool = False) -> dict:
+    """
+    Lock several IPs exclusively with a single Redis round trip
+
+    Args:
+        ips: IP addresses to lock
+        all_or_nothing: Lock none of them unless all are free
+
+    Returns:
+        dict: {"granted": {ip: LockLease}, "denied": [ips]}
+    """
+    ips = list(dict.fromkeys(ips))
+    try:
+        by_key = get_manager().acquire_many([ip_lock_key(lock_ip) for lock_ip in ips],
+                                            [ip_readers_key(lock_ip) for lock_ip in ips],
+                                            all_or_nothing)
+    except Exception as e:
+        print(f"Error acquiring locks: {e}")
+        by_key = {}
+
+    granted = {}
+    for lock_ip in ips:
+        lease = by_key.get(ip_lock_key(lock_ip))
+        if lease:
+            _hold(lease.key, lease)
+            granted[lock_ip] = lease
+    denied = [lock_ip for lock_ip in ips if lock_ip not in granted]
+    print(f"Locked {len(granted)}/{len(ips)} IPs" + (f", already locked: {denied}" if denied else ""))
+    return {"granted": granted, "denied": denied}
+
+
+def release_many(ips: list, force: bool = False) -> dict:
+    """
+    Release several IP locks with a single Redis round trip
+
+    Locks held by this process are released with compare-and-delete;
+    force=True also deletes locks held elsewhere, for clearing them by hand.
+
+    Returns:
+        dict: {"released": [ips], "failed": [ips], "not_owned": [ips]}; not_owned
+            lists locks this process does not hold, left untouched unless force
+    """
+    ips = list(dict.fromkeys(ips))
+    owned = {}
+    for release_ip in ips:
+        lease = _drop(ip_lock_key(release_ip))
+        if lease:
+            owned[release_ip] = lease
+
+    result = {"released": [], "failed": [], "not_owned": []}
+    try:
+        outcomes = get_manager().release_many(list(owned.values()))
+        for release_ip, released in zip(owned, outcomes):
+            result["released" if released else "failed"].append(release_ip)
+        others = [release_ip for release_ip in ips if release_ip not in owned]
+        if others and force:
+            get_redis().delete(*[ip_lock_key(release_ip) for release_ip in others])
+            result["released"].extend(others)
+        else:
+            result["not_owned"].extend(others)
+    except Exception as e:
+        print(f"Error releasing locks: {e}")
+        result["failed"] = [release_ip for release_ip in ips
+                            if release_ip not in result["released"] and release_ip not in result["not_owned"]]
+    print(f"Released {len(result['released'])}/{len(ips)} IP locks")
+    return result
+
+
+def lock_ip_shared(target_ip):
+    """
+    Take the IP-level shared lock, so several workers can work different
+    slots of the same host while whole-host operations (lock_machine) wait
+
+    Returns:
+        LockLease or False if the IP is locked exclusively
+    """
+    try:
+        lease = get_manager().acquire_shared(ip_lock_key(target_ip), ip_readers_key(target_ip))
+        if not lease:
+            print(f"IP locked exclusively: {target_ip}")
+            return False
+        _hold(f"{ip_readers_key(target_ip)}:{lease.token}", lease)
+        print(f"Joined shared lock for IP: {target_ip}")
+        return lease
+    except Exception as e:
+        print(f"Error acquiring shared lock: {e}")
+        return False
+
+
+def release_ip_shared(lease: LockLease) -> bool:
+    """Leave the shared holders of an IP"""
+    _drop(f"{lease.key}:{lease.token}")
+    try:
+        return lease.release()
+    except Exception as e:
+        print(f"Error releasing shared lock: {e}")
+        return False
+
+
+def lock_slots(target_ip, indexes: list):
+    """
+    Take the per-slot write locks for a set of container indices, all or nothing
+
+    The caller should hold the IP shared lock (lock_ip_shared) first.
+
+    Returns:
+        dict: {index: LockLease}, or None if any slot is held by another worker
+    """
+    manager = get_manager()
+    leases = {}
+    try:
+        for index in sorted(set(indexes), key=str):
+            lease = manager.acquire(slot_lock_key(target_ip, index))
+            if not lease:
+                print(f"Slot {index} on IP {target_ip} is locked by another worker")
+                for held in leases.values():
+                    held.release()
+                return None
+            leases[index] = lease
+    except Exception as e:
+        print(f"Error acquiring slot locks: {e}")
+        for held in leases.values():
+            held.release()
+        return None
+    for index, lease in leases.items():
+        _hold(lease.key, lease)
+    return leases
+
+
+def release_slots(target_ip, leases: dict) -> bool:
+    """Release slot locks taken with lock_slots"""
+    released = True
+    for index, lease in leases.items():
+        _drop(slot_lock_key(target_ip, index))
+        try:
+            released = lease.release() and released
+        except Exception as e:
+            print(f"Error releasing slot {index} on IP {target_ip}: {e}")
+            released = False
+    return released
+
+
+def validate_fence(target_ip, fence) -> bool:
+    """Check before a write that fence is still the current token for the IP lock"""
+    try:
+        return get_manager().is_current(ip_lock_key(target_ip), fence)
+    except Exception as e:
+        print(f"Error validating fence for IP {target_ip}: {e}")
+        return False
 
 
 if __name__ == '__main__':
-    release_machine_lock("192.168.124.17")
-    release_machine_lock("192.168.124.18")
-    release_machine_lock("192.168.124.19")
-    release_machine_lock("192.168.124.60")
-    release_machine_lock("192.168.124.23")
-    release_machine_lock("192.168.124.26")
-    release_machine_lock("192.168.124.68")
-    release_machine_lock("192.168.124.50")
-    release_machine_lock("172.16.227.32")
-    release_machine_lock("172.16.212.171")
-    #release_machine_lock("172.16.209.72")
-    release_machine_lock("172.16.42.55")
-    release_machine_lock("172.16.204.10")
-    #release_machine_lock("192.168.124.17")
\ No newline at end of file
+    release_many([
+        "192.168.124.17",
+        "192.168.124.18",
+        "192.168.124.19",
+        "192.168.124.60",
+        "192.168.124.23",
+        "192.168.124.26",
+        "192.168.124.68",
+        "192.168.124.50",
+        "172.16.227.32",
+        "172.16.212.171",
+        #"172.16.209.72",
+        "172.16.42.55",
+        "172.16.204.10",
+    ], force=True)
@@ -0,0 +1,197 @@
+"""
+Staged Pipeline Module
+
+A small thread-based pipeline for provisioning work that is bound by backend
+calls rather than CPU. Items flow through named stages connected by bounded
+queues; each stage has its own worker count (its concurrency limit) and its
+own retry policy with exponential backoff.
+
+When a stage exhausts its retries it can run a cleanup callback (e.g. delete
+the half-created container) and send the item back to an earlier stage, so
+"delete and recreate" is expressed as a restart instead of a nested loop.
+"""
+
+import time
+import queue
+import random
+import threading
+
+
+class Stage:
+    """A pipeline step with its own concurrency limit and retry policy"""
+
+    def __init__(self, name: str, func, workers: int = 1, retries: int = 0,
+                 backoff: float = 1.0, max_backoff: float = 30.0,
+                 cleanup=None, restart_from: str = None):
+        """
+        Initialize Stage
+
+        Args:
+            name: Stage name used in logs and results
+            func: Callable taking the item dict; falsy return or exception means failure
+            workers: Number of items processed concurrently by this stage
+            retries: Extra attempts after the first failure
+            backoff: Base delay in seconds, doubled after each failed attempt
+            max_backoff: Upper bound for a single backoff delay
+            cleanup: Optional callable run with the item once retries are exhausted
+            restart_from: Optional stage name the item is sent back to after cleanup
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cleanup = cleanup
+        self.restart_from = restart_from
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before retry number `attempt` (1-based), with a little jitter"""
+        base = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        return base * random.uniform(0.8, 1.2)
+
+
+class StagedPipeline:
+    """Run items through stages connected by bounded queues"""
+
+    def __init__(self, stages: list, queue_size: int = 8, max_restarts: int = 2):
+        """
+        Initialize StagedPipeline
+
+        Args:
+            stages: Ordered list of Stage objects
+            queue_size: Capacity of the queue in front of each stage
+            max_restarts: How many times an item may be sent back to an earlier stage
+        """
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names: {names}")
+        for stage in stages:
+            if stage.restart_from and stage.restart_from not in names:
+                raise ValueError(f"Stage '{stage.name}' restarts from unknown stage '{stage.restart_from}'")
+
+        self.stages = stages
+        self.queue_size = queue_size
+        self.max_restarts = max_restarts
+        self._positions = {name: i for i, name in enumerate(names)}
+
+    def run(self, items: list) -> dict:
+        """
+        Push every item through the pipeline and wait for all of them
+
+        Each item is wrapped in a dict {"info": item, "restarts": 0, ...} that
+        stage functions may read and extend.
+
+        Args:
+            items: Work items (e.g. device info lists)
+
+        Returns:
+            dict: {"success": [...], "failure": [...]} lists of item dicts;
+                  failed items carry "stage" and "error" keys
+        """
+        # Bounded inbox per stage for forward flow, unbounded retry inbox for
+        # restarts so a later stage never blocks on a full earlier queue
+        inboxes = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        retry_inboxes = [queue.Queue() for _ in self.stages]
+        results = {"success": [], "failure": []}
+        lock = threading.Lock()
+        all_done = threading.Event()
+        stop = threading.Event()
+        pending = [len(items)]
+
+        if not items:
+            return results
+
+        def finish(item, outcome):
+            with lock:
+                results[outcome].append(item)
+                pending[0] -= 1
+                if pending[0] == 0:
+                    all_done.set()
+
+        def next_item(position):
+            try:
+                return retry_inboxes[position].get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                return inboxes[position].get(timeout=0.1)
+            except queue.Empty:
+                return None
+
+        def forward(position, item):
+            while not stop.is_set():
+                try:
+                    inboxes[position].put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def run_stage(position, item):
+            stage = self.stages[position]
+            error = None
+            for attempt in range(stage.retries + 1):
+                if attempt:
+                    time.sleep(stage.delay(attempt))
+                try:
+                    if stage.func(item):
+                        return True, None
+                    error = f"{stage.name} returned failure"
+                except Exception as e:
+                    error = f"{stage.name}: {e}"
+                print(f"[pipeline] {stage.name} attempt {attempt + 1}/{stage.retries + 1} failed for {item['info']}: {error}")
+            return False, error
+
+        def worker(position):
+            stage = self.stages[position]
+            while not stop.is_set():
+                item = next_item(position)
+                if item is None:
+                    continue
+                started = time.time()
+                ok, error = run_stage(position, item)
+                item["timings"][stage.name] = item["timings"].get(stage.name, 0) + time.time() - started
+
+                if ok:
+                    if position + 1 < len(self.stages):
+                        forward(position + 1, item)
+                    else:
+                        finish(item, "success")
+                    continue
+
+                if stage.cleanup:
+                    try:
+                        stage.cleanup(item)
+                    except Exception as e:
+                        print(f"[pipeline] {stage.name} cleanup failed for {item['info']}: {e}")
+
+                if stage.restart_from and item["restarts"] < self.max_restarts:
+                    item["restarts"] += 1
+                    print(f"[pipeline] Restarting {item['info']} from {stage.restart_from} "
+                          f"({item['restarts']}/{self.max_restarts})")
+                    retry_inboxes[self._positions[stage.restart_from]].put(item)
+                else:
+                    item["stage"] = stage.name
+                    item["error"] = error
+                    finish(item, "failure")
+
+        threads = []
+        for position, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(target=worker, args=(position,),
+                                          name=f"pipeline-{stage.name}-{n}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for info in items:
+                forward(0, {"info": info, "restarts": 0, "timings": {}})
+            all_done.wait()
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=1)
+
+        return results
@@ -0,0 +1,186 @@
+"""
+Slot Queue Module
+
+Shared work queue for "lock_mode": "slot", where several workers process the
+same host. The logout accounts of an IP are seeded once into one Redis set
+per index slot. A worker then locks a free slot and pops only that slot's
+accounts, so no account is handed to two workers and no worker slices the
+whole pool on its own. The account a slot is working on is kept in a Redis
+hash keyed by index (the slot-mode info_list) instead of the IP-wide
+info_pool/info_list in config.json.
+"""
+
+import sys
+import os
+import json
+import time
+import random
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MachineManage.lock_machine import (LOCK_PREFIX, get_redis, get_manager, slot_lock_key,
+                                        lock_slots, release_slots)
+
+QUEUE_TTL = 6 * 3600  # seconds; leftovers of a crashed run expire instead of leaking into the next
+
+# KEYS: pending-slots set, then (slot lock, slot pending set) pairs.
+# ARGV: ttl_ms, then (index, account) pairs. Accounts of a slot that is
+# locked right now are skipped: they may be in progress on another worker.
+SEED_SCRIPT = """
+local seeded = 0
+for i = 1, (#KEYS - 1) / 2 do
+    if redis.call('exists', KEYS[2 * i]) == 0 then
+        seeded = seeded + redis.call('sadd', KEYS[2 * i + 1], ARGV[2 * i + 1])
+        redis.call('pexpire', KEYS[2 * i + 1], ARGV[1])
+        redis.call('sadd', KEYS[1], ARGV[2 * i])
+    end
+end
+if seeded > 0 then
+    redis.call('pexpire', KEYS[1], ARGV[1])
+end
+return seeded
+"""
+
+# Pop one account of a slot, drop the slot from the pending set once it is
+# empty and record the account as the slot's current info_list entry.
+CLAIM_SCRIPT = """
+local account = redis.call('spop', KEYS[1])
+if redis.call('scard', KEYS[1]) == 0 then
+    redis.call('srem', KEYS[2], ARGV[1])
+end
+if account then
+    redis.call('hset', KEYS[3], ARGV[1], account)
+    redis.call('pexpire', KEYS[3], ARGV[2])
+end
+return account
+"""
+
+
+def pending_slots_key(target_ip: str) -> str:
+    return f"{LOCK_PREFIX}:{target_ip}:pending_slots"
+
+
+def pending_key(target_ip: str, index) -> str:
+    return f"{LOCK_PREFIX}:{target_ip}:pending:{index}"
+
+
+def info_list_key(target_ip: str) -> str:
+    return f"{LOCK_PREFIX}:{target_ip}:info_list"
+
+
+def seed_key(target_ip: str) -> str:
+    return f"{LOCK_PREFIX}:{target_ip}:seed"
+
+
+def pending_slots(target_ip: str) -> list:
+    """Indexes that still have unclaimed accounts"""
+    return list(get_redis().smembers(pending_slots_key(target_ip)))
+
+
+def seed_accounts(target_ip: str, accounts: list, ttl: float = QUEUE_TTL) -> int:
+    """
+    Add accounts to their slots' pending sets in one atomic call
+
+    Args:
+        target_ip: IP address of the host
+        accounts: Device info entries [phone, index, "", ""]
+        ttl: Seconds the queue survives without new seeds
+
+    Returns:
+        int: Number of accounts added
+    """
+    if not accounts:
+        return 0
+    keys = [pending_slots_key(target_ip)]
+    args = [int(ttl * 1000)]
+    for account in accounts:
+        keys.extend([slot_lock_key(target_ip, account[1]), pending_key(target_ip, account[1])])
+        args.extend([str(account[1]), json.dumps(account, ensure_ascii=False)])
+    script = get_redis().register_script(SEED_SCRIPT)
+    return int(script(keys=keys, args=args))
+
+
+def seed_slot_work(target_ip: str, fetch_accounts, ttl: float = QUEUE_TTL,
+                   wait_timeout: float = 120, poll_interval: float = 1) -> int:
+    """
+    Fill the queue of an IP unless work is already pending; only one worker
+    fetches accounts, the others wait for it to finish seeding
+
+    Args:
+        target_ip: IP address of the host
+        fetch_accounts: Callable returning the logout accounts of the IP
+        ttl: Seconds the queue survives without new seeds
+        wait_timeout: Maximum wait for another worker's seeding
+        poll_interval: Seconds between checks while waiting
+
+    Returns:
+        int: Number of accounts this worker seeded
+    """
+    if pending_slots(target_ip):
+        return 0
+    lease = get_manager().acquire(seed_key(target_ip))
+    if not lease:
+        print(f"Another worker is seeding the slot queue of IP {target_ip}, waiting...")
+        deadline = time.time() + wait_timeout
+        while get_redis().exists(seed_key(target_ip)) and time.time() < deadline:
+            time.sleep(poll_interval)
+        return 0
+    try:
+        if pending_slots(target_ip):
+            return 0
+        seeded = seed_accounts(target_ip, fetch_accounts() or [], ttl)
+        print(f"Seeded {seeded} accounts into the slot queue of IP {target_ip}")
+        return seeded
+    finally:
+        lease.release()
+
+
+def claim_account(target_ip: str, index, ttl: float = QUEUE_TTL):
+    """
+    Pop one pending account of a slot; the caller must hold the slot lock
+
+    Returns:
+        list: Device info, or None if the slot has nothing pending
+    """
+    script = get_redis().register_script(CLAIM_SCRIPT)
+    account = script(keys=[pending_key(target_ip, index), pending_slots_key(target_ip), info_list_key(target_ip)],
+                     args=[str(index), int(ttl * 1000)])
+    return json.loads(account) if account else None
+
+
+def claim_batch(target_ip: str, batch_size: int = 4):
+    """
+    Lock up to batch_size free slots that have pending accounts and take one
+    account from each (accounts sharing an index never run together)
+
+    Returns:
+        tuple: (batch, slot_leases); batch is empty if nothing can be claimed
+    """
+    indexes = pending_slots(target_ip)
+    random.shuffle(indexes)
+    batch = []
+    slot_leases = {}
+    for index in indexes:
+        if len(batch) >= batch_size:
+            break
+        held = lock_slots(target_ip, [index])
+        if not held:
+            continue
+        account = claim_account(target_ip, index)
+        if account is None:
+            release_slots(target_ip, held)
+            continue
+        slot_leases.update(held)
+        batch.append(account)
+    return batch, slot_leases
+
+
+def release_slot_work(target_ip: str, slot_leases: dict) -> bool:
+    """Clear the slots' info_list entries and release their locks"""
+    if slot_leases:
+        try:
+            get_redis().hdel(info_list_key(target_ip), *[str(index) for index in slot_leases])
+        except Exception as e:
+            print(f"Error clearing slot info_list on IP {target_ip}: {e}")
+    return release_slots(target_ip, slot_leases)
@@ -0,0 +1,188 @@
+"""
+Slot Allocation Module
+
+Every container on a host occupies an index slot. The slot determines both
+the container name and the ADB port, and this module is the single place
+where that mapping lives:
+
+    index 1   -> name "T1001-{phone}", port "5001"
+    index 9   -> name "T1009-{phone}", port "5009"
+    index 10  -> name "T1010-{phone}", port "5010"
+    index 250 -> name "T1250-{phone}", port "5250"
+
+For indices 1-9 this is identical to the historical f"T100{index}" /
+f"500{index}" scheme, so existing containers keep their names. Past index 9
+the old string concatenation produced ambiguous names and ports (and ports
+above 65535 from index 100 on); the arithmetic mapping stays unambiguous up
+to MAX_INDEX.
+"""
+
+import re
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NAME_BASE = 1000
+PORT_BASE = 5000
+MAX_INDEX = 999
+
+_NAME_PATTERN = re.compile(r"^T(\d{4})-(.+)$")
+
+
+class SlotExhaustedError(Exception):
+    """Raised when a host has no free index slot left."""
+    def __init__(self, ip: str, max_slots: int):
+        self.ip = ip
+        self.max_slots = max_slots
+        super().__init__(f"No free slot on IP {ip} (max {max_slots} slots)")
+
+
+def _check_index(index) -> int:
+    value = int(index)
+    if not 0 <= value <= MAX_INDEX:
+        raise ValueError(f"Slot index {index} out of range 0-{MAX_INDEX}")
+    return value
+
+
+def slot_label(index) -> str:
+    """
+    Container label for a slot, also used in gateway routes
+
+    Args:
+        index: Slot index (int or numeric string)
+
+    Returns:
+        str: Label such as "T1001"
+    """
+    return f"T{NAME_BASE + _check_index(index)}"
+
+
+def machine_name(index, phone) -> str:
+    """
+    Container name for a device
+
+    Args:
+        index: Slot index (int or numeric string)
+        phone: Phone number
+
+    Returns:
+        str: Name such as "T1001-4385542539"
+    """
+    return f"{slot_label(index)}-{phone}"
+
+
+def machine_port(index) -> str:
+    """
+    ADB port for a slot
+
+    Args:
+        index: Slot index (int or numeric string)
+
+    Returns:
+        str: Port such as "5001"
+    """
+    return str(PORT_BASE + _check_index(index))
+
+
+def parse_machine_name(name: str):
+    """
+    Split a container name back into (index, phone)
+
+    Args:
+        name: Container name such as "T1012-4385542539"
+
+    Returns:
+        tuple: (index as string, phone) or None if the name is not a slot name
+    """
+    match = _NAME_PATTERN.match(name or "")
+    if not match:
+        return None
+    index = int(match.group(1)) - NAME_BASE
+    if not 0 <= index <= MAX_INDEX:
+        return None
+    return str(index), match.group(2)
+
+
+class SlotAllocator:
+    """Assign free index slots on one IP from the live container inventory"""
+
+    def __init__(self, ip: str, host_local: str, max_slots: int = MAX_INDEX, first_index: int = 1):
+        """
+        Initialize SlotAllocator
+
+        Args:
+            ip: IP address of the host
+            host_local: Local host address for API calls
+            max_slots: Highest index that may be handed out
+            first_index: Lowest index that may be handed out
+        """
+        self.ip = ip
+        self.host_local = host_local
+        self.max_slots = min(max_slots, MAX_INDEX)
+        self.first_index = first_index
+        self.used = set()
+
+    def refresh(self) -> set:
+        """
+        Reload used slots from the containers that exist on the host
+
+        Returns:
+            set: Indices (as strings) currently taken
+        """
+        from MachineManage.stop_machine import get_machine_namelist
+
+        used = set()
+        for name in get_machine_namelist(self.ip, self.host_local):
+            parsed = parse_machine_name(name)
+            if parsed:
+                used.add(parsed[0])
+        self.used = used
+        return set(used)
+
+    def allocate(self) -> str:
+        """
+        Reserve the lowest free slot, packing containers densely
+
+        Returns:
+            str: Allocated index
+
+        Raises:
+            SlotExhaustedError: If every slot up to max_slots is taken
+        """
+        for index in range(self.first_index, self.max_slots + 1):
+            if str(index) not in self.used:
+                self.used.add(str(index))
+                return str(index)
+        raise SlotExhaustedError(self.ip, self.max_slots)
+
+    def release(self, index) -> None:
+        """Return a slot to the free set"""
+        self.used.discard(str(index))
+
+    def assign(self, device_info_list: list) -> list:
+        """
+        Fill in the index of devices that do not have one yet
+
+        Devices that already carry an index keep it and mark it as used.
+
+        Args:
+            device_info_list: List of device info [phone, index, ...]
+
+        Returns:
+            list: New list of device info with every index filled in
+        """
+        self.refresh()
+        for device_info in device_info_list:
+            if str(device_info[1]).strip():
+                self.used.add(str(int(device_info[1])))
+
+        assigned = []
+        for device_info in device_info_list:
+            device_info = list(device_info)
+            if not str(device_info[1]).strip():
+                device_info[1] = self.allocate()
+                print(f"Allocated slot {device_info[1]} on {self.ip} for {device_info[0]}")
+            assigned.append(device_info)
+        return assigned
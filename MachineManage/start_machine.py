@@ -1,7 +1,12 @@
 import json
 import os
+import sys
 import requests
 
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from MachineManage.slots import machine_name
+
 def load_config():
     script_dir = os.path.dirname(os.path.abspath(__file__))
     config_path = os.path.join(script_dir, "..", "config.json")
@@ -17,10 +22,10 @@ def start_docker(ip: str, host_local: str, index: int, phone: str):
         index: Device index
         phone: Phone number
     """
-    name = f"T100{index}-{phone}"
+    name = machine_name(index, phone)
     url = f"http://{host_local}/dc_api/v1/run/{ip}/{name}"
     response = requests.get(url)
-    print(f"run_docker T100{index}-{phone} >>>>{response.text}")
+    print(f"run_docker {machine_name(index, phone)} >>>>{response.text}")
 
 def start_batch(ip: str, host_local: str, device_info_list: list):
     """Start all machines in a batch
@@ -64,7 +69,7 @@ def wait_machines_ready(ip: str, host_local: str, device_info_list: list, max_wa
         all_ready = True
         for device_info in device_info_list:
             phone, index = device_info[0], device_info[1]
-            name = f"T100{index}-{phone}"
+            name = machine_name(index, phone)
             if not check_machinestate(ip, host_local, name):
                 all_ready = False
                 break
@@ -1,7 +1,12 @@
 import json
 import os
+import sys
 import requests
 
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from MachineManage.slots import machine_name
+
 def load_config():
     script_dir = os.path.dirname(os.path.abspath(__file__))
     config_path = os.path.join(script_dir, "..", "config.json")
@@ -53,10 +58,10 @@ def stop_docker(ip: str, host_local: str, index: int, phone: str):
         index: Device index
         phone: Phone number
     """
-    name = f"T100{index}-{phone}"
+    name = machine_name(index, phone)
     url = f"http://{host_local}/dc_api/v1/stop/{ip}/{name}"
     response = requests.get(url)
-    print(f"stop_docker T100{index}-{phone} >>>>{response.text}")
+    print(f"stop_docker {machine_name(index, phone)} >>>>{response.text}")
 
 def stop_batch(ip: str, host_local: str, device_info_list: list):
     """Stop all machines in a batch
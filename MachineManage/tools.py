@@ -2,10 +2,14 @@ import json
 import time
 from urllib.parse import urlparse
 import os
+import sys
 
 import requests
 from loguru import logger
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from MachineManage.slots import machine_name
+
 # Load config
 config_path = os.path.join(os.path.dirname(__file__), '..', 'config.json')
 with open(config_path, 'r') as f:
@@ -61,10 +65,10 @@ def change_login_state(data):
     print(response.text)
 
 def delete_docker(ip, index: int, phone: str):
-    name = f"T100{index}-{phone}"
+    name = machine_name(index, phone)
     url = f"http://{host_local}/dc_api/v1/remove/{ip}/{name}"
     response=requests.get(url)
-    print(f"delete_docker T100{index}-{phone} >>>>{response.text}")
+    print(f"delete_docker {machine_name(index, phone)} >>>>{response.text}")
 
 def updateAccountHeaders(ip):
     # check: 检查账号状态
@@ -112,9 +116,10 @@ def start_lamda(dip,dname):
     try:
         response = requests.post(url, json=data, timeout=60 * 3)
         print(response.text)
+        return response.ok
     except Exception as e:
         logger.error(f"{dip}-{dname}:{e}")
-        time.sleep(60)
+        return False
 
 
 def api_adb_shell(dip, dname, cmd_str: str, timeout=0):
@@ -134,6 +139,27 @@ def api_adb_shell(dip, dname, cmd_str: str, timeout=0):
         logger.error(e)
         return {"code": -1, "msg": str(e)}
 
+class ShellOutputError(Exception):
+    """Raised when an api_adb_shell response carries no command output."""
+    def __init__(self, response):
+        self.response = response
+        super().__init__(f"Unparseable shell response: {str(response)[:200]}")
+
+
+def shell_output(response) -> str:
+    """
+    Extract the command output from an api_adb_shell response; the /shell
+    endpoint returns it in "msg"
+
+    Raises:
+        ShellOutputError: If the request failed or the response has no string "msg",
+            so callers never mistake a failed call for empty output
+    """
+    if not isinstance(response, dict) or response.get("code") == -1 or not isinstance(response.get("msg"), str):
+        logger.error(f"Unparseable shell response: {response}")
+        raise ShellOutputError(response)
+    return response["msg"]
+
 def get_ip_devices(dip):
     url=f"http://{host_rpc}/dc_api/v1/list/{dip}"
     response = requests.get(url)
@@ -149,42 +175,114 @@ def TransName(info_list):
     result = []
     for item in info_list:
         phone, index = item[0], item[1]
-        device_name = f"T100{index}-{phone}"
+        device_name = machine_name(index, phone)
         result.append(device_name)
     return result
-def kill_lamda(dip,dname):
-    api_adb_shell(dip, dname, "kill -SIGUSR2 $(cat /data/usr/lamda.pid)", timeout=10)
-    time.sleep(30)
+LAMDA_PID_FILE = "/data/usr/lamda.pid"
+SPAWN_YAML_NAME = "xhs.9.15.0.spawn.yaml"  # hook script for the installed app version (update_app.APK_NAME)
+LAMDA_PORT = 65000
+
+def lamda_status(dip, dname):
+    """
+    Probe lamda with one shell call: is the pid in lamda.pid alive and is the port listening
+
+    Returns:
+        dict: {"pid": int or None, "alive": bool, "listening": bool}
+
+    Raises:
+        ShellOutputError: If the probe got no answer from the device
+    """
+    cmd = (
+        f"pid=$(cat {LAMDA_PID_FILE} 2>/dev/null); "
+        f"if [ -n \"$pid\" ] && kill -0 $pid 2>/dev/null; then echo alive:$pid; else echo dead; fi; "
+        f"(netstat -tln 2>/dev/null || cat /proc/net/tcp /proc/net/tcp6 2>/dev/null) "
+        f"| grep -qi -e ':{LAMDA_PORT} ' -e ':{LAMDA_PORT:04X} ' && echo listening"
+    )
+    output = shell_output(api_adb_shell(dip, dname, cmd, timeout=10))
+    pid = None
+    for line in output.splitlines():
+        if line.startswith("alive:") and line[6:].strip().isdigit():
+            pid = int(line[6:].strip())
+    return {"pid": pid, "alive": pid is not None, "listening": "listening" in output}
+
+def wait_lamda(dip, dname, running=True, timeout=30, interval=1):
+    """
+    Poll lamda_status until lamda is up (alive and listening) or fully down
+
+    Returns:
+        bool: True if the wanted state was reached within timeout
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            status = lamda_status(dip, dname)
+        except ShellOutputError:
+            # Unknown state is neither up nor down; keep polling
+            status = None
+        if status is not None:
+            up = status["alive"] and status["listening"]
+            down = not status["alive"] and not status["listening"]
+            if (running and up) or (not running and down):
+                return True
+        if time.time() >= deadline:
+            return False
+        time.sleep(interval)
+
+def kill_lamda(dip,dname, grace_timeout=30):
+    """Ask lamda to exit with SIGUSR2, and only kill -9 if it is still alive after the grace period"""
+    api_adb_shell(dip, dname, f"kill -SIGUSR2 $(cat {LAMDA_PID_FILE})", timeout=10)
+    if wait_lamda(dip, dname, running=False, timeout=grace_timeout):
+        return True
     api_adb_shell(dip, dname, "ps -ef |grep lamda|grep -v grep| awk '{print $2}' | xargs kill -9", timeout=10)
+    return wait_lamda(dip, dname, running=False, timeout=5)
+
+def restart_lamda(dip, dname, start_timeout=60):
+    """Start lamda through the backend and wait until its pid is alive and the port listens"""
+    if not start_lamda(dip, dname):
+        return False
+    return wait_lamda(dip, dname, running=True, timeout=start_timeout)
+
+def reinstall_lamda(dip, dname, start_timeout=60):
+    """
+    Kill, remove, push and unpack lamda again, then start it and wait for it to come up
+
+    Stops before touching the install if lamda cannot be killed, and before
+    unpacking if the assets could not be synced (the staged tarball would be
+    stale or missing).
+
+    Returns:
+        bool: True if lamda is running again
+    """
+    if not kill_lamda(dip, dname):
+        logger.error(f"{dip}-{dname}: lamda still running, not reinstalling")
+        return False
+    uninstall_lamda(dip, dname)
+    if not update_new_wenjian(dip, dname):
+        logger.error(f"{dip}-{dname}: asset sync failed, not unpacking lamda")
+        return False
+    run_install(dip, dname)
+    copy_yaml(dip, dname)
+    return restart_lamda(dip, dname, start_timeout)
 
 def uninstall_lamda(dip, dname,):
+    # The staged tarball in /data/local/tmp is kept; asset sync re-pushes it only if its hash changed
     api_adb_shell(dip, dname, "rm -rf /data/server /data/usr", timeout=10)
-    api_adb_shell(dip, dname, "rm -rf /data/local/tmp/lamda-server-arm64-v8a.tar.gz", timeout=10)
-def update_new_wenjian(dip,android_data):
-    file_name_list = ["xhs.9.7.0.spawn.yaml", "lamda-server-arm64-v8a.tar.gz"]
-    #push_file_to_android(dip, android_data=android_data, file_name_list=file_name_list)
+def update_new_wenjian(dip, dname, manifest=None):
+    """Push lamda/busybox/yaml assets that are missing or changed on the device; True if all are in place"""
+    from MachineManage.asset_sync import sync_device
+    return sync_device(dip, dname, manifest)["ok"]
 
 def run_install(dip,dname):
     shell_command = 'chmod 755 /data/local/tmp/busybox-arm64-v8a&&cd /data&&/data/local/tmp/busybox-arm64-v8a tar -xzf /data/local/tmp/lamda-server-arm64-v8a.tar.gz'
     api_adb_shell(dip,dname, shell_command, 60)
 def copy_yaml(dip,dname):
-    api_adb_shell(dip,dname,"cp /data/local/tmp/xhs.9.7.0.spawn.yaml /data/usr/modules/script/xhs.9.7.0.spawn.yaml", timeout=10)
+    api_adb_shell(dip,dname,f"cp /data/local/tmp/{SPAWN_YAML_NAME} /data/usr/modules/script/{SPAWN_YAML_NAME}", timeout=10)
 
 
-def update_lamda_and_yaml(ip):
-    devices = get_ip_devices(ip)
-    for device in devices:
-        try:
-            if device['state'] !='running':
-                logger.info(f"设备没开机:{ip} {device['name']}")
-                continue
-            one_device_name = device["name"]
-            logger.info(f"设备开始切换:{ip} {one_device_name}")
-            start_lamda(ip, one_device_name)
-            logger.success("启动lamda完成")
-            logger.info(f"设备切换完成:{ip} {one_device_name}")
-        except Exception as e:
-            logger.error(e)
+def update_lamda_and_yaml(ip, per_host_limit=4):
+    """Restart lamda on every running device of an IP concurrently"""
+    from MachineManage.lamda_fleet import fleet_lamda
+    return fleet_lamda("restart", ips=[ip], per_host_limit=per_host_limit)
 
 
 
@@ -197,7 +295,7 @@ if __name__ == '__main__':
         info_list = config["ips"][first_ip].get("info_pool", [])
     
     # Generate device names from config info_list
-    device_names = [f"T100{item[1]}-{item[0]}" for item in info_list]
+    device_names = [machine_name(item[1], item[0]) for item in info_list]
     
     # Use TransName function to convert info_list to device names
     push_device_names = TransName(info_list)
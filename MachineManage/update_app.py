@@ -1,13 +1,17 @@
 import json
+import re
 import requests
 import time
 import logging
+import threading
 import sys
 import os
 
 # Add parent directory to path to import setting module
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from setting import load_config
+from MachineManage.tools import api_adb_shell, shell_output
+from MachineManage.fleet import list_running_devices, run_per_host, summarize
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +20,15 @@ config = load_config()
 domain = config["global"]["domain"]
 host_rpc = config["global"]["host_rpc"]
 
+APK_NAME = "xhs9.15.0.apk"
+APP_PACKAGE = "com.xingin.xhs"
+PROGRESS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "resources", "rollout_progress.json")
 
-def updateApp(dip, dname):
-    url = f"{domain}/android/upload_xhs_app/?apk_name=xhs9.15.0.apk"
+
+def updateApp(dip, dname, apk_name=APK_NAME):
+    """Upload and install the app apk on one device; returns True if the request succeeded"""
+    url = f"{domain}/android/upload_xhs_app/?apk_name={apk_name}"
     data = {
         "host": host_rpc,
         "ip": dip,
@@ -27,11 +37,152 @@ def updateApp(dip, dname):
     try:
         response = requests.post(url, json=data, timeout=60 * 3)
         print(response.text)
+        return response.ok
     except Exception as e:
         logger.error(f"{dip}-{dname}:{e}")
-        time.sleep(60)
+        return False
 
-if __name__ == "__main__":
-    # Loop through info_list
 
-        updateApp("192.168.124.68","T1002-4385542539")
\ No newline at end of file
+def get_app_version(dip, dname, package=APP_PACKAGE):
+    """
+    Read the installed versionName of a package via shell, None if not installed
+
+    Raises:
+        ShellOutputError: If the shell call failed, so a dead device is not mistaken for a missing app
+    """
+    response = api_adb_shell(dip, dname, f"dumpsys package {package} | grep versionName", timeout=15)
+    match = re.search(r"versionName=([\w.\-]+)", shell_output(response))
+    return match.group(1) if match else None
+
+
+def update_and_verify(dip, dname, expected_version, apk_name=APK_NAME, verify_attempts=6, verify_interval=10):
+    """
+    Update one device unless it already runs the expected version, then
+    poll the installed version instead of sleeping blindly
+
+    Returns:
+        bool: True if the device ends up on expected_version
+    """
+    if get_app_version(dip, dname) == expected_version:
+        print(f"{dip}-{dname} already on {expected_version}")
+        return True
+
+    if not updateApp(dip, dname, apk_name):
+        return False
+
+    version = None
+    for attempt in range(verify_attempts):
+        version = get_app_version(dip, dname)
+        if version == expected_version:
+            print(f"{dip}-{dname} updated to {expected_version}")
+            return True
+        if attempt < verify_attempts - 1:
+            time.sleep(verify_interval)
+
+    logger.error(f"{dip}-{dname}: version is {version}, expected {expected_version}")
+    return False
+
+
+def _load_progress(progress_file, expected_version):
+    if os.path.exists(progress_file):
+        try:
+            with open(progress_file, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+            if progress.get("version") == expected_version:
+                return progress
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Ignoring unreadable progress file {progress_file}: {e}")
+    return {"version": expected_version, "done": [], "failed": {}}
+
+
+def _save_progress(progress_file, progress):
+    tmp_path = f"{progress_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(progress, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, progress_file)
+
+
+def _pick_canaries(targets, canary_size):
+    """Prefer canaries on different hosts so one bad host does not hide a bad build"""
+    canaries = []
+    seen_hosts = set()
+    for target in targets:
+        if len(canaries) < canary_size and target[0] not in seen_hosts:
+            canaries.append(target)
+            seen_hosts.add(target[0])
+    for target in targets:
+        if len(canaries) < canary_size and target not in canaries:
+            canaries.append(target)
+    return canaries
+
+
+def rollout(expected_version, targets=None, apk_name=APK_NAME, canary_size=2, per_host_limit=2,
+            max_workers=16, progress_file=PROGRESS_FILE, verify_attempts=6, verify_interval=10):
+    """
+    Roll an apk out to a fleet: canary group first, then every other device
+
+    Progress is written to progress_file after every device, so an
+    interrupted rollout resumes where it stopped. Devices already recorded
+    as done for the same version are skipped.
+
+    Args:
+        expected_version: versionName the devices must report after the update
+        targets: (ip, name) tuples; defaults to all running containers in ip_dict
+        apk_name: Apk file name known to the upload service
+        canary_size: Number of devices updated and verified before the fleet
+        per_host_limit: Maximum concurrent updates on the same host
+        max_workers: Maximum concurrent updates overall
+        progress_file: JSON file used to resume a rollout
+        verify_attempts: Version checks per device after upload
+        verify_interval: Seconds between version checks
+
+    Returns:
+        dict: {"aborted": bool, "canary": summary, "fleet": summary or None}
+    """
+    if targets is None:
+        targets = list_running_devices(list(config["global"]["ip_dict"].keys()))
+    targets = [tuple(target) for target in targets]
+
+    progress = _load_progress(progress_file, expected_version)
+    progress_lock = threading.Lock()
+    done = set(progress["done"])
+    pending = [target for target in targets if f"{target[0]}/{target[1]}" not in done]
+    print(f"Rollout {apk_name} -> {expected_version}: {len(targets)} targets, {len(pending)} pending")
+
+    def record(target, outcome):
+        key = f"{target[0]}/{target[1]}"
+        with progress_lock:
+            if outcome["ok"]:
+                if key not in progress["done"]:
+                    progress["done"].append(key)
+                progress["failed"].pop(key, None)
+            else:
+                progress["failed"][key] = outcome["error"] or "version check failed"
+            _save_progress(progress_file, progress)
+
+    def update(ip, name):
+        return update_and_verify(ip, name, expected_version, apk_name, verify_attempts, verify_interval)
+
+    canaries = _pick_canaries(pending, canary_size) if not progress.get("canary_passed") else []
+    canary_summary = None
+    if canaries:
+        print(f"Updating canaries: {canaries}")
+        canary_outcomes = run_per_host(canaries, update, per_host_limit, max_workers, on_result=record)
+        canary_summary = summarize(canary_outcomes)
+        if canary_summary["failed"]:
+            print(f"Canary failed on {canary_summary['failed_targets']}, aborting rollout")
+            return {"aborted": True, "canary": canary_summary, "fleet": None}
+        with progress_lock:
+            progress["canary_passed"] = True
+            _save_progress(progress_file, progress)
+
+    fleet = [target for target in pending if target not in canaries]
+    print(f"Updating fleet: {len(fleet)} devices")
+    fleet_summary = summarize(run_per_host(fleet, update, per_host_limit, max_workers, on_result=record))
+    print(f"Rollout finished: {fleet_summary['succeeded']} succeeded, {fleet_summary['failed']} failed")
+    return {"aborted": False, "canary": canary_summary, "fleet": fleet_summary}
+
+
+if __name__ == "__main__":
+    # Canary first, then every running container across ip_dict
+    rollout("9.15.0")
@@ -0,0 +1,448 @@
+"""
+Warm Pool Module
+
+Keeps the next queued containers of a host booted ahead of demand, so that
+relogin workers receive a device whose boot status is already 200 instead of
+paying the start_docker -> get_android_boot_status wait on the critical path.
+
+The pool respects two limits:
+- a per-host budget of concurrently running containers (derived from the
+  configured container count, memory budget and/or CPU budget)
+- index exclusivity: two containers with the same index share the same ADB
+  port, so a queued device is never booted while its index is in use
+
+The number of devices kept warm adapts from the measured boot time versus the
+measured relogin (lease) time.
+"""
+
+import sys
+import os
+import math
+import time
+import threading
+from collections import deque, OrderedDict, Counter
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MachineManage.start_machine import start_docker, check_machinestate
+from MachineManage.stop_machine import stop_docker
+from MachineManage.slots import machine_name
+
+
+def _device_key(device_info: list) -> tuple:
+    """Identify a device by (phone, index) regardless of the index type"""
+    return (str(device_info[0]), str(device_info[1]))
+
+
+class WarmPool:
+    """Boot queued containers of one IP ahead of demand within a host budget"""
+
+    def __init__(self, ip: str, host_local: str, max_booted: int = None,
+                 memory_budget_mb: int = None, container_memory_mb: int = 2048,
+                 cpu_budget: float = None, container_cpus: float = 1.0, workers: int = 4, min_size: int = 1, poll_interval: float = 5,
+                 boot_timeout: float = 300, smoothing: float = 0.3, batch_size: int = 4):
+        """
+        Initialize WarmPool
+
+        Args:
+            ip: IP address of the host
+            host_local: Local host address for API calls
+            max_booted: Maximum number of containers running at once on the host;
+                defaults to batch_size plus the initial warm target, so a
+                leased batch still leaves room to boot the next devices
+            memory_budget_mb: Optional host memory budget in MB for containers
+            container_memory_mb: Estimated memory used by one booted container
+            cpu_budget: Optional number of host CPU cores for containers
+            container_cpus: Estimated cores used by one running container
+            workers: Number of relogin workers consuming devices concurrently
+            min_size: Minimum number of devices kept warm
+            poll_interval: Seconds between boot status checks
+            boot_timeout: Seconds before a booting container is given up on
+            smoothing: Weight of the newest sample in the moving averages
+            batch_size: Devices leased at once by acquire_batch
+        """
+        self.ip = ip
+        self.host_local = host_local
+        self.workers = max(1, workers)
+        self.min_size = max(0, min_size)
+        self.poll_interval = poll_interval
+        self.boot_timeout = boot_timeout
+        self.smoothing = smoothing
+        self.batch_size = max(1, batch_size)
+
+        if max_booted is None:
+            max_booted = self.batch_size + max(self.min_size, self.workers)
+        budget = max(1, max_booted)
+        if memory_budget_mb:
+            budget = min(budget, max(1, memory_budget_mb // container_memory_mb))
+        if cpu_budget:
+            budget = min(budget, max(1, int(cpu_budget // container_cpus)))
+        self.budget = budget
+        if self.budget <= self.batch_size:
+            print(f"[warm_pool {ip}] Budget {self.budget} leaves no room to warm devices "
+                  f"beyond a batch of {self.batch_size}")
+
+        self.queue = deque()
+        self.booting = OrderedDict()  # key -> (device_info, started_at)
+        self.ready = OrderedDict()    # key -> device_info
+        self.leased = {}              # key -> (device_info, leased_at)
+        self.failed = OrderedDict()   # key -> device_info
+
+        self.avg_boot_time = None
+        self.avg_relogin_time = None
+
+        self._protected = Counter()   # key -> batches acquiring it; these are never evicted
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Sizing
+    # ------------------------------------------------------------------
+    def _update_average(self, current, sample):
+        if current is None:
+            return sample
+        return self.smoothing * sample + (1 - self.smoothing) * current
+
+    def target_size(self) -> int:
+        """
+        Number of devices that should be booting or ready right now.
+
+        Each worker consumes one device per relogin, so keeping
+        workers * boot_time / relogin_time devices in flight hides the boot
+        time entirely. Before any measurement exists, one device per worker
+        is kept warm.
+
+        Returns:
+            int: Desired warm size, clamped to the remaining host budget
+        """
+        with self._lock:
+            if self.avg_boot_time is None or not self.avg_relogin_time:
+                desired = self.workers
+            else:
+                desired = math.ceil(self.workers * self.avg_boot_time / self.avg_relogin_time)
+            desired = max(self.min_size, desired)
+            return max(0, min(desired, self.budget - len(self.leased)))
+
+    def _active_indices(self) -> set:
+        indices = {key[1] for key in self.booting}
+        indices.update(key[1] for key in self.ready)
+        indices.update(key[1] for key in self.leased)
+        return indices
+
+    def _running_count(self) -> int:
+        return len(self.booting) + len(self.ready) + len(self.leased)
+
+    # ------------------------------------------------------------------
+    # Queue management
+    # ------------------------------------------------------------------
+    def enqueue(self, device_info_list: list) -> None:
+        """
+        Append devices to the demand queue in the order they will be used
+
+        Args:
+            device_info_list: List of device info [phone, index, "", ""]
+        """
+        with self._lock:
+            for device_info in device_info_list:
+                if not self._is_known(_device_key(device_info)):
+                    self.queue.append(device_info)
+
+    def _is_known(self, key: tuple) -> bool:
+        return (key in self.booting or key in self.ready or key in self.leased
+                or any(_device_key(item) == key for item in self.queue))
+
+    def _prioritize(self, device_info: list) -> None:
+        """Move a device to the head of the queue, queuing it if unknown"""
+        key = _device_key(device_info)
+        for item in list(self.queue):
+            if _device_key(item) == key:
+                self.queue.remove(item)
+                break
+        self.queue.appendleft(device_info)
+
+    # ------------------------------------------------------------------
+    # Boot tracking
+    # ------------------------------------------------------------------
+    def _poll_booting(self) -> list:
+        """
+        Check booting containers; the status requests run without holding the lock
+
+        Returns:
+            list: Devices that timed out and must be stopped
+        """
+        with self._lock:
+            booting = list(self.booting.items())
+        booted = {key: check_machinestate(self.ip, self.host_local, machine_name(info[1], info[0]))
+                  for key, (info, _) in booting}
+
+        stops = []
+        now = time.time()
+        with self._lock:
+            for key, (device_info, started_at) in booting:
+                if self.booting.get(key) != (device_info, started_at):
+                    # Evicted or rebooted while we were polling
+                    continue
+                name = machine_name(device_info[1], device_info[0])
+                if booted[key]:
+                    del self.booting[key]
+                    self.ready[key] = device_info
+                    self.avg_boot_time = self._update_average(self.avg_boot_time, now - started_at)
+                    print(f"[warm_pool {self.ip}] {name} ready after {now - started_at:.1f}s")
+                elif now - started_at > self.boot_timeout:
+                    del self.booting[key]
+                    self.failed[key] = device_info
+                    print(f"[warm_pool {self.ip}] {name} did not boot within {self.boot_timeout}s")
+                    stops.append(device_info)
+        return stops
+
+    def _boot(self, device_info: list, starts: list) -> None:
+        """Mark a device booting (under the lock); the start request is sent by _run_actions"""
+        self.booting[_device_key(device_info)] = (device_info, time.time())
+        starts.append(device_info)
+
+    def _run_actions(self, starts=(), stops=()) -> None:
+        """Send container stop/start requests, always outside the lock"""
+        for device_info in stops:
+            stop_docker(self.ip, self.host_local, device_info[1], device_info[0])
+        for device_info in starts:
+            start_docker(self.ip, self.host_local, device_info[1], device_info[0])
+
+    def _refill(self, starts: list) -> None:
+        target = self.target_size()
+        while (self.queue
+               and len(self.booting) + len(self.ready) < target
+               and self._running_count() < self.budget):
+            active = self._active_indices()
+            candidate = next((item for item in self.queue if str(item[1]) not in active), None)
+            if candidate is None:
+                break
+            self.queue.remove(candidate)
+            self._boot(candidate, starts)
+
+    def tick(self) -> None:
+        """Poll booting containers once and boot more if below target"""
+        stops = self._poll_booting()
+        starts = []
+        with self._lock:
+            self._refill(starts)
+        self._run_actions(starts, stops)
+
+    # ------------------------------------------------------------------
+    # Leasing
+    # ------------------------------------------------------------------
+    def acquire(self, device_info: list, timeout: float = None) -> bool:
+        """
+        Block until the given device is booted and lease it to the caller
+
+        A device that is not booting yet is moved to the head of the queue,
+        so demand always wins over speculative warming.
+
+        Args:
+            device_info: Device info [phone, index, "", ""]
+            timeout: Maximum wait in seconds (defaults to boot_timeout plus one poll)
+
+        Returns:
+            bool: True if the device is booted and leased, False otherwise
+        """
+        key = _device_key(device_info)
+        deadline = time.time() + (timeout if timeout is not None else self.boot_timeout + self.poll_interval)
+
+        with self._lock:
+            if key in self.leased:
+                return True
+            if key in self.failed:
+                del self.failed[key]
+            if key not in self.booting and key not in self.ready:
+                self._prioritize(device_info)
+
+        while True:
+            starts, stops = [], []
+            with self._lock:
+                if key not in self.booting and key not in self.ready:
+                    # Demand wins over speculative warming: make room, then boot directly
+                    self._evict_for(device_info, stops)
+                    if str(device_info[1]) not in self._active_indices() and self._running_count() < self.budget:
+                        self.queue = deque(item for item in self.queue if _device_key(item) != key)
+                        self._boot(device_info, starts)
+            self._run_actions(starts, stops)
+            self.tick()
+            with self._lock:
+                if key in self.ready:
+                    del self.ready[key]
+                    self.leased[key] = (device_info, time.time())
+                    return True
+                if key in self.failed:
+                    return False
+            if time.time() >= deadline:
+                print(f"[warm_pool {self.ip}] Timeout acquiring {machine_name(device_info[1], device_info[0])}")
+                return False
+            time.sleep(self.poll_interval)
+
+    def _evict(self, key: tuple, stops: list) -> None:
+        """Put an unleased warm device back in the queue; its container is stopped via stops"""
+        if key in self.ready:
+            device_info = self.ready.pop(key)
+        else:
+            device_info = self.booting.pop(key)[0]
+        self.queue.appendleft(device_info)
+        print(f"[warm_pool {self.ip}] Evicting warm {machine_name(device_info[1], device_info[0])}")
+        stops.append(device_info)
+
+    def _evict_for(self, device_info: list, stops: list) -> None:
+        """Free the index and budget a demanded device needs from unleased warm containers"""
+        index = str(device_info[1])
+        for key in [k for k in list(self.ready) + list(self.booting)
+                    if k[1] == index and k not in self._protected]:
+            self._evict(key, stops)
+        while self._running_count() >= self.budget:
+            # Most recently warmed devices are needed last
+            unleased = [k for k in list(self.booting) + list(self.ready) if k not in self._protected]
+            if not unleased:
+                break
+            self._evict(unleased[-1], stops)
+
+    def release(self, device_info: list, stop: bool = True) -> None:
+        """
+        Return a leased device, record its relogin time and free its slot
+
+        Args:
+            device_info: Device info [phone, index, "", ""]
+            stop: Whether to stop the container (default: True)
+        """
+        key = _device_key(device_info)
+        with self._lock:
+            leased = self.leased.pop(key, None)
+            if leased is not None:
+                self.avg_relogin_time = self._update_average(self.avg_relogin_time, time.time() - leased[1])
+        if stop:
+            stop_docker(self.ip, self.host_local, device_info[1], device_info[0])
+        self.tick()
+
+    def acquire_batch(self, device_info_list: list, timeout: float = None) -> list:
+        """
+        Acquire every device of a batch
+
+        Args:
+            device_info_list: List of device info [phone, index, "", ""]
+            timeout: Maximum wait in seconds per device
+
+        Returns:
+            list: Device info entries that could not be acquired
+
+        Raises:
+            ValueError: If the batch needs more containers than the host budget allows
+        """
+        if len(device_info_list) > self.budget:
+            raise ValueError(f"Batch of {len(device_info_list)} devices exceeds the warm pool budget "
+                             f"of {self.budget} on {self.ip}")
+        keys = Counter({_device_key(device_info) for device_info in device_info_list})
+        with self._lock:
+            # Concurrent batches each add their own keys, so one finishing never unprotects another
+            self._protected.update(keys)
+            for device_info in reversed(device_info_list):
+                key = _device_key(device_info)
+                if key not in self.booting and key not in self.ready and key not in self.leased:
+                    self._prioritize(device_info)
+        try:
+            return [device_info for device_info in device_info_list
+                    if not self.acquire(device_info, timeout)]
+        finally:
+            with self._lock:
+                self._protected -= keys
+
+    def release_batch(self, device_info_list: list, stop: bool = True) -> None:
+        """Release every device of a batch"""
+        for device_info in device_info_list:
+            self.release(device_info, stop)
+
+    # ------------------------------------------------------------------
+    # Background warming
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[warm_pool {self.ip}] Error while warming: {e}")
+
+    def start(self) -> None:
+        """Start warming devices in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.tick()
+        self._thread = threading.Thread(target=self._run, name=f"warm-pool-{self.ip}", daemon=True)
+        self._thread.start()
+
+    def close(self, stop_unused: bool = True) -> None:
+        """
+        Stop the background thread and optionally stop unused warm containers
+
+        Args:
+            stop_unused: Stop containers that are booting or ready but not leased
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+        if not stop_unused:
+            return
+        with self._lock:
+            unused = [info for info, _ in self.booting.values()] + list(self.ready.values())
+            self.booting.clear()
+            self.ready.clear()
+        for device_info in unused:
+            stop_docker(self.ip, self.host_local, device_info[1], device_info[0])
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the pool state
+
+        Returns:
+            dict: Counts per state, budget, target size and measured averages
+        """
+        with self._lock:
+            return {
+                "queued": len(self.queue),
+                "booting": len(self.booting),
+                "ready": len(self.ready),
+                "leased": len(self.leased),
+                "failed": len(self.failed),
+                "budget": self.budget,
+                "target_size": self.target_size(),
+                "avg_boot_time": self.avg_boot_time,
+                "avg_relogin_time": self.avg_relogin_time,
+            }
+
+
+def create_warm_pool(ip: str, global_config: dict, batch_size: int = 4):
+    """
+    Build a WarmPool from the optional "warm_pool" section of the global config
+
+    Example section:
+        "warm_pool": {"enabled": true, "max_booted": 8, "memory_budget_mb": 16384,
+                      "container_memory_mb": 2048, "cpu_budget": 8, "container_cpus": 1.5,
+                      "workers": 4}
+
+    Args:
+        ip: IP address of the host
+        global_config: Global configuration dict
+        batch_size: Devices per batch, so the default budget fits a batch plus warm devices
+
+    Returns:
+        WarmPool if enabled, None otherwise (also when its budget cannot hold one batch)
+    """
+    pool_config = global_config.get("warm_pool") or {}
+    if not pool_config.get("enabled"):
+        return None
+
+    options = {key: value for key, value in pool_config.items() if key != "enabled"}
+    options.setdefault("batch_size", batch_size)
+    pool = WarmPool(ip, global_config["host_local"], **options)
+    if pool.budget < pool.batch_size:
+        print(f"[warm_pool {ip}] Budget {pool.budget} is smaller than a batch of {pool.batch_size}; "
+              f"booting batches directly instead")
+        return None
+    return pool
@@ -19,6 +19,7 @@ from Autolization.AutoOperate import AutoPhone
 from Autolization.SovleCaptch import *
 from Autolization.AutoXhs import XhsAutomation
 from MachineManage.start_machine import start_batch, wait_machines_ready
+from MachineManage.slots import machine_name, machine_port
 
 # Load config
 config_path = os.path.join(os.path.dirname(__file__), '..', 'config.json')
@@ -78,15 +79,16 @@ def check_loginstate_batch(ip: str, host_local: str, device_info_list: list):
     """
     results = {}
     for device_info in device_info_list:
+        phone = None
         try:
             phone_number, index = device_info[0], device_info[1]
             print(f"[{phone_number}] Checking login state...")
             
             phone = AutoPhone(
                 ip=ip, 
-                port=f"500{index}",
+                port=machine_port(index),
                 host=host_local,
-                name=f"T100{index}-{phone_number}",
+                name=machine_name(index, phone_number),
                 auto_connect=False
             )
             
@@ -99,11 +101,14 @@ def check_loginstate_batch(ip: str, host_local: str, device_info_list: list):
             results[phone_number] = is_logged_in
             
             if not is_logged_in:
+                phone.dump_forensics("logged_out")
                 append_ip_config(ip, "failure_list", device_info)
                 
         except Exception as e:
             print(f"Error checking login state for {device_info[0]}: {e}")
             results[device_info[0]] = False
+            if phone:
+                phone.dump_forensics("check_login_error")
             append_ip_config(ip, "failure_list", device_info)
             
     return results
@@ -197,6 +202,7 @@ def login_process(ip: str, host_local: str, device_info: list):
     Returns:
         bool: True if login successful, False otherwise
     """
+    phone = None
     try:
         phone_number, index = device_info[0], device_info[1]
         sms_url = get_SmsUrl(phone_number)
@@ -204,9 +210,9 @@ def login_process(ip: str, host_local: str, device_info: list):
 
         phone = AutoPhone(
             ip=ip, 
-            port=f"500{index}",
+            port=machine_port(index),
             host=host_local,
-            name=f"T100{index}-{phone_number}",
+            name=machine_name(index, phone_number),
             auto_connect=False
         )
         
@@ -235,6 +241,8 @@ def login_process(ip: str, host_local: str, device_info: list):
         return True
 
     except Exception as e:
+        if phone:
+            phone.dump_forensics(type(e).__name__)
         append_ip_config(ip, "failure_list", device_info)
         return False
         print(f"Error in login_process for {device_info[0]}: {e}")
@@ -0,0 +1,214 @@
+# -*- encoding=utf8 -*-
+"""
+Offline benchmark of the vision hot path: screenshot decode, per-template
+matching, the exception sweep and memory per device
+
+Frames are built from the screenshots and captcha crops in Autolization/img
+and capcha_collection, so no device or screenshot API is needed. Results are
+printed (or written) as JSON for comparing matcher changes:
+
+    python Test/bench_vision.py --output bench.json
+"""
+
+import os
+import sys
+import gc
+import glob
+import json
+import time
+import base64
+import platform
+import statistics
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Autolization.ImgHandle import (ImgHandle, MatchExecutor, SCREEN_WIDTH, SCREENSHOT_TIERS,
+                                    decode_base64_image, match_executor)
+from Autolization.capture import LatestFrame
+from Autolization.registry import get_registry
+from Autolization.templates import IMG_DIR, get_template, template_cache
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCREEN_SIZE = (SCREEN_WIDTH, 1280)
+FRAME_SOURCES = [
+    os.path.join(IMG_DIR, "Mwindow_EndCaptch.png"),
+    os.path.join(IMG_DIR, "captchtest_1.png"),
+    os.path.join(IMG_DIR, "capchatest_2.png"),
+] + sorted(glob.glob(os.path.join(ROOT_DIR, "capcha_collection", "*.png")))
+
+
+def build_frames(limit=None):
+    """
+    Screen-sized frames: each source image fitted onto a 720x1280 canvas,
+    plus one frame with an exception popup pasted in so sweeps have a hit
+
+    Returns:
+        list: (name, BGR frame) pairs
+    """
+    width, height = SCREEN_SIZE
+    frames = []
+    for path in FRAME_SOURCES:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        scale = min(width / image.shape[1], height / image.shape[0])
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        frame = np.full((height, width, 3), 245, dtype=np.uint8)
+        top = (height - image.shape[0]) // 2
+        frame[top:top + image.shape[0], :image.shape[1]] = image
+        frames.append((os.path.basename(path), frame))
+
+    popup = get_template(os.path.join(IMG_DIR, "waitapp.png"))
+    if frames and popup is not None:
+        frame = frames[0][1].copy()
+        frame[900:900 + popup.image.shape[0], 100:100 + popup.image.shape[1]] = popup.image
+        frames.append(("with_popup", frame))
+    return frames[:limit] if limit else frames
+
+
+def timed(func, repeat):
+    """Median and min wall time of func in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(samples), 3), "min_ms": round(min(samples), 3)}
+
+
+def bench_decode(frames, repeat):
+    """Base64 PNG screenshot decode per tier"""
+    results = {}
+    encoded = [base64.b64encode(cv2.imencode(".png", frame)[1].tobytes()).decode() for _, frame in frames]
+    for tier, config in SCREENSHOT_TIERS.items():
+        reduce = config.get("reduce", 1)
+        results[tier] = timed(lambda: [decode_base64_image(data, reduce) for data in encoded], repeat)
+        results[tier]["per_frame_ms"] = round(results[tier]["median_ms"] / len(encoded), 3)
+    results["png_kb"] = round(statistics.mean(len(data) * 3 / 4 for data in encoded) / 1024, 1)
+    return results
+
+
+def bench_templates(frames, names, repeat):
+    """
+    Per-template cost on a frame: a plain full-frame match_image, and
+    find_template with region hints and the match cache off (cold)
+    """
+    handler = ImgHandle(match_cache_size=0, executor=MatchExecutor(1))
+    frame = frames[0][1]
+    results = {}
+    for name in names:
+        template = get_template(handler.template_path(name))
+        if template is None:
+            continue
+
+        def cold():
+            template_cache().forget_region(template.path)
+            handler.find_template(frame, template)
+
+        results[name] = {
+            "size": list(template.size),
+            "match_image": timed(lambda: handler.match_image(frame, template.image), repeat),
+            "find_template": timed(cold, repeat),
+        }
+    return results
+
+
+def bench_sweep(frames, names, repeat):
+    """Full exception sweep over every frame: serial, threaded, and repeated on unchanged screens"""
+    results = {}
+    executors = {"serial": MatchExecutor(1), "threaded": match_executor()}
+    for label, executor in executors.items():
+        handler = ImgHandle(match_cache_size=0, executor=executor)
+        results[label] = timed(lambda: [handler.match_frame(frame, names) for _, frame in frames], repeat)
+
+    cached = ImgHandle(executor=MatchExecutor(1))
+    for _, frame in frames:
+        cached.match_frame(frame, names)
+    results["unchanged_screen"] = timed(lambda: [cached.match_frame(frame, names) for _, frame in frames], repeat)
+
+    hits = ImgHandle(match_cache_size=0).match_frame(frames[-1][1], names)
+    results["templates"] = len(names)
+    results["frames"] = len(frames)
+    results["workers"] = executors["threaded"].max_workers
+    results["hits_last_frame"] = [name for name, _ in hits]
+    return results
+
+
+def bench_memory(frames, names, devices):
+    """
+    Python-visible memory (tracemalloc, includes numpy buffers) held per
+    device: an ImgHandle with a filled match cache and a LatestFrame
+    """
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    held = []
+    for index in range(devices):
+        handler = ImgHandle(name=f"bench-{index}", executor=MatchExecutor(1))
+        latest = LatestFrame()
+        frame = frames[index % len(frames)][1]
+        latest.publish_png(cv2.imencode(".png", frame)[1].tobytes())
+        handler.attach_source(latest, max_age=None)
+        handler.match_frame(handler.get_screenshot(), names)
+        held.append(handler)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "devices": devices,
+        "per_device_kb": round((current - baseline) / devices / 1024, 1),
+        "peak_kb": round((peak - baseline) / 1024, 1),
+    }
+
+
+def run_benchmarks(repeat=5, devices=4, frame_limit=None, names=None):
+    """
+    Run every benchmark
+
+    Args:
+        repeat: Timed repetitions per measurement
+        devices: Simulated devices for the memory benchmark
+        frame_limit: Use only the first N frames
+        names: Template files to benchmark; defaults to the registry's exception popups
+
+    Returns:
+        dict: JSON-serializable results
+    """
+    frames = build_frames(frame_limit)
+    if names is None:
+        names = [element.file for element in get_registry().exceptions()]
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "decode": bench_decode(frames, repeat),
+        "templates": bench_templates(frames, names, repeat),
+        "exception_sweep": bench_sweep(frames, names, repeat),
+        "memory": bench_memory(frames, names, devices),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark screenshot decoding and template matching offline')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions per measurement (default: 5)')
+    parser.add_argument('--devices', type=int, default=4, help='Simulated devices for memory (default: 4)')
+    parser.add_argument('--frames', type=int, default=None, help='Use only the first N frames')
+    parser.add_argument('--output', type=str, default=None, help='Write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.devices, args.frames)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Wrote {args.output}")
+    else:
+        print(text)
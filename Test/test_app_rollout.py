@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import patch
+import tempfile
+import threading
+import time
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from MachineManage.fleet import run_per_host, summarize
+from MachineManage import update_app
+
+
+class TestRunPerHost(unittest.TestCase):
+
+    def test_per_host_limit_respected(self):
+        active = {}
+        peak = {}
+        lock = threading.Lock()
+
+        def work(ip, name):
+            with lock:
+                active[ip] = active.get(ip, 0) + 1
+                peak[ip] = max(peak.get(ip, 0), active[ip])
+            time.sleep(0.02)
+            with lock:
+                active[ip] -= 1
+            return True
+
+        targets = [(ip, f"T100{i}-1") for ip in ("10.0.0.1", "10.0.0.2") for i in range(1, 7)]
+        outcomes = run_per_host(targets, work, per_host_limit=2, max_workers=8)
+
+        self.assertEqual(len(outcomes), 12)
+        self.assertTrue(all(outcome["ok"] for outcome in outcomes.values()))
+        self.assertLessEqual(max(peak.values()), 2)
+
+    def test_failures_are_reported_not_raised(self):
+        def work(ip, name):
+            if name == "bad":
+                raise RuntimeError("boom")
+            return True
+
+        outcomes = run_per_host([("10.0.0.1", "good"), ("10.0.0.1", "bad")], work)
+        summary = summarize(outcomes)
+
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(summary["failed_targets"], ["10.0.0.1/bad"])
+        self.assertEqual(outcomes[("10.0.0.1", "bad")]["error"], "boom")
+
+
+@patch('MachineManage.update_app.time.sleep')
+class TestRollout(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.progress_file = os.path.join(self.temp_dir, "progress.json")
+        self.targets = [("10.0.0.1", "T1001-a"), ("10.0.0.1", "T1002-b"),
+                        ("10.0.0.2", "T1001-c"), ("10.0.0.2", "T1002-d")]
+
+    def run_rollout(self):
+        return update_app.rollout("9.15.0", targets=self.targets, canary_size=2,
+                                  progress_file=self.progress_file, verify_interval=0)
+
+    def test_canary_failure_aborts_fleet(self, mock_sleep):
+        with patch('MachineManage.update_app.update_and_verify', return_value=False) as mock_update:
+            result = self.run_rollout()
+
+        self.assertTrue(result["aborted"])
+        self.assertEqual(mock_update.call_count, 2)
+        # Canaries are spread across hosts
+        canary_hosts = {call.args[0] for call in mock_update.call_args_list}
+        self.assertEqual(canary_hosts, {"10.0.0.1", "10.0.0.2"})
+
+    def test_rollout_updates_every_target(self, mock_sleep):
+        with patch('MachineManage.update_app.update_and_verify', return_value=True) as mock_update:
+            result = self.run_rollout()
+
+        self.assertFalse(result["aborted"])
+        self.assertEqual(result["fleet"]["succeeded"], 2)
+        self.assertEqual(mock_update.call_count, 4)
+        with open(self.progress_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)["done"]), 4)
+
+    def test_rollout_resumes_from_progress_file(self, mock_sleep):
+        with open(self.progress_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": "9.15.0", "done": ["10.0.0.1/T1001-a", "10.0.0.2/T1001-c"],
+                       "failed": {}, "canary_passed": True}, f)
+
+        with patch('MachineManage.update_app.update_and_verify', return_value=True) as mock_update:
+            self.run_rollout()
+
+        updated = sorted(call.args[1] for call in mock_update.call_args_list)
+        self.assertEqual(updated, ["T1002-b", "T1002-d"])
+
+    def test_update_and_verify_polls_version(self, mock_sleep):
+        versions = iter(["9.7.0", "9.7.0", "9.15.0"])
+        with patch('MachineManage.update_app.get_app_version', side_effect=lambda ip, name: next(versions)), \
+             patch('MachineManage.update_app.updateApp', return_value=True) as mock_upload:
+            self.assertTrue(update_app.update_and_verify("10.0.0.1", "T1001-a", "9.15.0", verify_interval=0))
+        mock_upload.assert_called_once()
+
+    def test_get_app_version_parses_dumpsys(self, mock_sleep):
+        response = {"code": 200, "msg": "    versionName=9.15.0\n"}
+        with patch('MachineManage.update_app.api_adb_shell', return_value=response):
+            self.assertEqual(update_app.get_app_version("10.0.0.1", "T1001-a"), "9.15.0")
+
+
+if __name__ == '__main__':
+    unittest.main()
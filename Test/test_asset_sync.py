@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import patch
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from MachineManage import asset_sync
+from MachineManage.tools import ShellOutputError
+
+
+class TestAssetSync(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name, content in (("a.bin", b"alpha"), ("b.bin", b"beta")):
+            with open(os.path.join(self.temp_dir, name), 'wb') as f:
+                f.write(content)
+        self.manifest = asset_sync.build_manifest(
+            [("a.bin", "/data/local/tmp/a.bin", "755"),
+             ("b.bin", "/data/local/tmp/b.bin", None)],
+            resources_dir=self.temp_dir)
+
+    def test_manifest_hashes_local_files(self):
+        self.assertEqual([entry["remote"] for entry in self.manifest],
+                         ["/data/local/tmp/a.bin", "/data/local/tmp/b.bin"])
+        self.assertEqual(self.manifest[0]["md5"], "2c1743a391305fbf367df8e4f069f9f9")
+
+    @patch('MachineManage.asset_sync.push_file', return_value=True)
+    @patch('MachineManage.asset_sync.api_adb_shell')
+    def test_missing_local_file_fails_sync(self, mock_shell, mock_push):
+        manifest = asset_sync.build_manifest(
+            [("a.bin", "/data/local/tmp/a.bin", None),
+             ("missing.bin", "/data/local/tmp/missing.bin", None)],
+            resources_dir=self.temp_dir)
+        mock_shell.return_value = {"code": 200, "msg": ""}
+
+        report = asset_sync.sync_device("10.0.0.1", "T1001-a", manifest)
+
+        self.assertFalse(report["ok"])
+        self.assertEqual(report["failed"], ["/data/local/tmp/missing.bin"])
+        self.assertEqual(report["pushed"], ["/data/local/tmp/a.bin"])
+        self.assertNotIn("missing.bin", mock_shell.call_args_list[0].args[2])
+
+    def test_default_assets_point_at_checked_in_files(self):
+        """Everything but the lamda release tarball ships in resources/"""
+        for local_name, _, _ in asset_sync.DEFAULT_ASSETS:
+            if local_name.startswith("lamda-server"):
+                continue
+            self.assertTrue(os.path.exists(os.path.join(asset_sync.RESOURCES_DIR, local_name)), local_name)
+
+    @patch('MachineManage.asset_sync.push_file', return_value=True)
+    @patch('MachineManage.asset_sync.api_adb_shell')
+    def test_pushes_only_changed_files(self, mock_shell, mock_push):
+        a_md5 = self.manifest[0]["md5"]
+        mock_shell.return_value = {"code": 200, "msg": f"{a_md5}  /data/local/tmp/a.bin\n"
+                                                        f"{'0' * 32}  /data/local/tmp/b.bin\n"}
+
+        report = asset_sync.sync_device("10.0.0.1", "T1001-a", self.manifest)
+
+        self.assertEqual(report["unchanged"], ["/data/local/tmp/a.bin"])
+        self.assertEqual(report["pushed"], ["/data/local/tmp/b.bin"])
+        mock_push.assert_called_once()
+        # One batched hash call, no chmod since a.bin was not pushed
+        self.assertEqual(mock_shell.call_count, 1)
+        self.assertIn("/data/local/tmp/a.bin", mock_shell.call_args.args[2])
+        self.assertIn("/data/local/tmp/b.bin", mock_shell.call_args.args[2])
+
+    @patch('MachineManage.asset_sync.push_file', return_value=True)
+    @patch('MachineManage.asset_sync.api_adb_shell')
+    def test_missing_remote_files_are_pushed_and_chmodded(self, mock_shell, mock_push):
+        mock_shell.return_value = {"code": 200, "msg": ""}
+
+        report = asset_sync.sync_device("10.0.0.1", "T1001-a", self.manifest)
+
+        self.assertEqual(len(report["pushed"]), 2)
+        self.assertIn("chmod 755 '/data/local/tmp/a.bin'", mock_shell.call_args.args[2])
+
+    @patch('MachineManage.asset_sync.push_file', return_value=True)
+    @patch('MachineManage.asset_sync.api_adb_shell')
+    def test_failed_hash_call_pushes_nothing(self, mock_shell, mock_push):
+        mock_shell.return_value = {"code": -1, "msg": "timeout"}
+
+        with self.assertRaises(ShellOutputError):
+            asset_sync.sync_device("10.0.0.1", "T1001-a", self.manifest)
+        mock_push.assert_not_called()
+
+    def test_device_addr_uses_slot_port(self):
+        self.assertEqual(asset_sync.device_addr("10.0.0.1", "T1003-13800000000"), "10.0.0.1:5003")
+        with self.assertRaises(ValueError):
+            asset_sync.device_addr("10.0.0.1", "bogus")
+
+    @patch('MachineManage.asset_sync.sync_device')
+    def test_sync_fleet_counts_pushed_files(self, mock_sync):
+        mock_sync.side_effect = lambda ip, name, manifest: {
+            "ok": name != "T1002-b", "pushed": ["/x"], "unchanged": [], "failed": []}
+
+        summary = asset_sync.sync_fleet(targets=[("10.0.0.1", "T1001-a"), ("10.0.0.1", "T1002-b")],
+                                        manifest=self.manifest)
+
+        self.assertEqual(summary["failed_targets"], ["10.0.0.1/T1002-b"])
+        self.assertEqual(summary["pushed_files"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
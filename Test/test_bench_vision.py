@@ -0,0 +1,29 @@
+import unittest
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_vision import build_frames, run_benchmarks
+
+
+class TestBenchVision(unittest.TestCase):
+
+    def test_frames_are_screen_sized(self):
+        frames = build_frames()
+        self.assertGreater(len(frames), 1)
+        self.assertEqual(frames[-1][0], "with_popup")
+        self.assertTrue(all(frame.shape == (1280, 720, 3) for _, frame in frames))
+
+    def test_results_are_json(self):
+        results = run_benchmarks(repeat=1, devices=1, frame_limit=1, names=["X.png", "missing.png"])
+
+        self.assertEqual(json.loads(json.dumps(results)), results)
+        self.assertEqual(set(results), {"environment", "decode", "templates", "exception_sweep", "memory"})
+        self.assertEqual(list(results["templates"]), ["X.png"])
+        self.assertIn("per_frame_ms", results["decode"]["full"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import patch
+import io
+import threading
+import time
+import sys
+import os
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.capture import FramePrefetcher, LatestFrame, PngStreamParser, ScreenStream
+from Autolization.ImgHandle import ImgHandle
+from test_img_handle import frame_base64, make_frame
+
+
+def png_bytes(frame):
+    ok, png = cv2.imencode(".png", frame)
+    return png.tobytes()
+
+
+class TestPngStreamParser(unittest.TestCase):
+
+    def test_splits_back_to_back_pngs_across_reads(self):
+        first, second = png_bytes(make_frame(seed=1)), png_bytes(make_frame(seed=2))
+        stream = b"garbage" + first + second + second[:100]
+        parser = PngStreamParser()
+
+        pngs = []
+        for i in range(0, len(stream), 4096):
+            pngs.extend(parser.feed(stream[i:i + 4096]))
+
+        self.assertEqual(pngs, [first, second])
+        # The trailing partial PNG completes with the next read
+        self.assertEqual(parser.feed(second[100:]), [second])
+
+
+class TestLatestFrame(unittest.TestCase):
+
+    def test_max_age_and_decode_once(self):
+        frames = LatestFrame()
+        self.assertIsNone(frames.get())
+
+        frames.publish_png(png_bytes(make_frame()), timestamp=time.time() - 5)
+        self.assertIsNone(frames.get(max_age=1))
+        first = frames.get(max_age=10)
+        self.assertIs(frames.get(), first)
+        self.assertEqual(frames.get(reduce=2).shape[:2], (640, 360))
+
+    def test_waits_for_fresh_frame(self):
+        frames = LatestFrame()
+        threading.Timer(0.05, frames.publish_frame, args=(make_frame(),)).start()
+        self.assertIsNotNone(frames.get(max_age=1, timeout=2))
+
+
+class TestScreenStream(unittest.TestCase):
+
+    def test_consume_keeps_newest_frame(self):
+        first, second = make_frame(seed=1), make_frame(seed=2)
+        stream = ScreenStream("10.0.0.1:5001")
+        stream.consume(io.BytesIO(png_bytes(first) + png_bytes(second)))
+
+        self.assertTrue(np.array_equal(stream.get(), second))
+        self.assertIn("screencap -p", stream.command()[-1])
+
+    def test_img_handle_prefers_attached_source(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+        frames = LatestFrame()
+        frames.publish_frame(make_frame("X.png", top_left=(300, 600)))
+        handler.attach_source(frames)
+
+        with patch.object(handler, 'get_screenshot_base64') as mock_capture:
+            result = handler.element_exists("X.png")
+        mock_capture.assert_not_called()
+        self.assertEqual(result["rectangle"][0], (300, 600))
+
+        # A stale source frame falls back to the HTTP screenshot
+        with patch.object(handler, 'get_screenshot_base64', return_value=None) as mock_capture:
+            handler.get_screenshot(max_age=-1)
+        mock_capture.assert_called_once()
+
+
+class TestFramePrefetcher(unittest.TestCase):
+
+    def test_checks_share_prefetched_frame(self):
+        png = png_bytes(make_frame("X.png", top_left=(300, 600)))
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+        prefetcher = FramePrefetcher(lambda: png, interval=10).start()
+        try:
+            handler.attach_source(prefetcher, max_age=5, wait=2)
+            first = handler.get_screenshot()
+            self.assertIs(handler.get_screenshot(), first)
+            self.assertEqual(prefetcher.frame_count, 1)
+
+            # After an action the next read waits for a newer capture
+            handler.mark_action()
+            self.assertIsNot(handler.get_screenshot(), first)
+            self.assertEqual(prefetcher.frame_count, 2)
+        finally:
+            prefetcher.stop()
+
+    def test_capture_encoded_decodes_base64(self):
+        png = png_bytes(make_frame())
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+        with patch.object(handler, 'get_screenshot_base64', return_value=frame_base64(make_frame())):
+            self.assertEqual(handler.capture_encoded(), png)
+
+
+if __name__ == '__main__':
+    unittest.main()
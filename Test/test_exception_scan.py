@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.ImgHandle import ImgHandle
+from Autolization.xhs_exceptEvents import ExceptionHandler
+from test_img_handle import make_frame, frame_base64
+
+
+class TestExceptionScan(unittest.TestCase):
+
+    def test_scan_screen_uses_one_capture(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+        frame = make_frame("waitapp.png", top_left=(100, 200))
+        with patch.object(handler, 'get_screenshot_base64', return_value=frame_base64(frame)) as mock_capture:
+            hits = handler.scan_screen(["X.png", "waitapp.png", "missing.png"])
+
+        mock_capture.assert_called_once()
+        self.assertEqual([name for name, _ in hits], ["waitapp.png"])
+        self.assertGreaterEqual(hits[0][1]["confidence"], 0.7)
+
+    def test_handle_exceptions_dispatches_first_hit(self):
+        auto_phone = MagicMock()
+        exceptions = ExceptionHandler(auto_phone)
+        first = {"result": (10, 20), "confidence": 0.9}
+        second = {"result": (30, 40), "confidence": 0.8}
+        auto_phone.scan_screen.return_value = [("waitapp.png", first), ("SmsLogin.png", second)]
+
+        self.assertTrue(exceptions.handle_exceptions())
+
+        auto_phone.scan_screen.assert_called_once()
+        self.assertIn("myt_arrow.png", auto_phone.scan_screen.call_args.args[0])
+        auto_phone.pos_click.assert_called_once_with(10, 20)
+        self.assertEqual(len(exceptions.last_hits), 2)
+
+    def test_handle_exceptions_without_hits(self):
+        auto_phone = MagicMock()
+        auto_phone.scan_screen.return_value = []
+
+        self.assertFalse(ExceptionHandler(auto_phone).handle_exceptions())
+        auto_phone.pos_click.assert_not_called()
+
+
+class TestWaitForAny(unittest.TestCase):
+
+    def test_returns_first_hit_in_priority_order(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+        blank = make_frame("SmsLogin.png")
+        frame = make_frame("waitapp.png", top_left=(100, 200))
+        screens = [frame_base64(blank), frame_base64(frame)]
+        with patch.object(handler, 'get_screenshot_base64', side_effect=screens), \
+                patch('Autolization.ImgHandle.time.sleep') as mock_sleep:
+            hit = handler.wait_for_any(["X.png", "waitapp.png"], timeout=10)
+
+        self.assertEqual(hit[0], "waitapp.png")
+        mock_sleep.assert_called_once_with(0.2)
+
+    def test_backs_off_while_idle_and_resets_after_action(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+        clock = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(round(seconds, 3))
+            clock[0] += seconds
+            if len(sleeps) == 3:
+                handler.mark_action()
+
+        with patch.object(handler, 'get_screenshot', return_value=None), \
+                patch('Autolization.ImgHandle.time.sleep', side_effect=sleep), \
+                patch('Autolization.ImgHandle.time.time', side_effect=lambda: clock[0]):
+            self.assertIsNone(handler.wait_for_any(["X.png"], timeout=10))
+
+        self.assertEqual(sleeps[:5], [0.2, 0.3, 0.45, 0.2, 0.3])
+        self.assertEqual(max(sleeps), 2.0)
+        self.assertAlmostEqual(sum(sleeps), 10, places=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import json
+import shutil
+import tempfile
+import sys
+import os
+
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.forensics import FrameRecorder
+from Autolization.ImgHandle import ImgHandle
+from Autolization.AutoXhs import XhsAutomation
+from Autolization.AutoOperate import AutoPhone
+from test_img_handle import make_frame, frame_base64
+
+
+class TestFrameRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.out_dir)
+
+    def test_ring_is_bounded_by_frames_and_bytes(self):
+        recorder = FrameRecorder(max_frames=3)
+        frames = [make_frame(seed=i) for i in range(5)]
+        for frame in frames:
+            recorder.record(frame)
+        self.assertEqual(len(recorder), 3)
+
+        capped = FrameRecorder(max_frames=10, max_bytes=recorder.size_bytes // 2)
+        for frame in frames:
+            capped.record(frame)
+        self.assertLessEqual(capped.size_bytes, recorder.size_bytes // 2)
+        self.assertGreaterEqual(len(capped), 1)
+
+    def test_recording_is_opt_in(self):
+        phone = AutoPhone("10.0.0.1", "5001", host="h", name="T1001-a", auto_connect=False)
+        self.assertIsNone(phone.img_handler.recorder)
+        self.assertIsNone(phone.dump_forensics())
+
+        recording = AutoPhone("10.0.0.1", "5001", host="h", name="T1001-a", auto_connect=False,
+                              forensics_frames=5)
+        self.assertEqual(recording.img_handler.recorder.max_frames, 5)
+
+    def test_same_frame_is_stored_once(self):
+        recorder = FrameRecorder()
+        frame = make_frame()
+        recorder.record(frame, [("X.png", None)])
+        recorder.record(frame, [("waitapp.png", None)])
+        self.assertEqual(len(recorder), 1)
+
+    def test_element_checks_are_recorded_and_flushed(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a", match_cache_size=0)
+        handler.attach_recorder(FrameRecorder())
+        frame = make_frame("X.png", top_left=(300, 600))
+        with patch.object(handler, 'get_screenshot_base64', return_value=frame_base64(frame)):
+            handler.element_exists("X.png")
+            handler.element_exists("waitapp.png")
+
+        folder = handler.dump_frames("touch_failed", out_dir=self.out_dir)
+
+        with open(os.path.join(folder, "decisions.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertEqual(len(summary["frames"]), 2)
+        self.assertEqual(summary["frames"][0]["decisions"][0]["template"], "X.png")
+        self.assertIsNone(summary["frames"][1]["decisions"][0]["confidence"])
+        image = cv2.imread(os.path.join(folder, summary["frames"][0]["file"]))
+        self.assertEqual(image.shape[1], 720)
+        # draw_match_result outlines the hit in red
+        self.assertGreater(image[600, 300:330, 2].min(), 200)
+        self.assertEqual(len(handler.recorder), 0)
+        self.assertIsNone(handler.dump_frames(out_dir=self.out_dir))
+
+    def test_safe_touch_failure_dumps_frames(self):
+        auto_phone = MagicMock()
+        auto_phone.wait_and_click.return_value = False
+        xhs = XhsAutomation(auto_phone)
+        with patch.object(xhs, 'exceptions_click', return_value=False), \
+                patch('Autolization.AutoXhs.time.sleep'):
+            with self.assertRaises(RuntimeError):
+                xhs._safe_touch("EnterCode.png", looptime=1)
+
+        auto_phone.dump_forensics.assert_called_once_with("touch_EnterCode.png")
+
+
+if __name__ == '__main__':
+    unittest.main()
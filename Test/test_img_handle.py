@@ -0,0 +1,198 @@
+import unittest
+from unittest.mock import patch
+import base64
+import tempfile
+import sys
+import os
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.ImgHandle import ImgHandle, decode_base64_image
+from Autolization.templates import template_cache, template_region, get_template
+
+IMG_DIR = os.path.join(os.path.dirname(__file__), '..', 'Autolization', 'img')
+
+
+def make_frame(template_name="X.png", top_left=(300, 600), seed=0):
+    """720x1280 noise frame with a template pasted at top_left (x, y)"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 255, size=(1280, 720, 3), dtype=np.uint8)
+    template = cv2.imread(os.path.join(IMG_DIR, template_name))
+    x, y = top_left
+    frame[y:y + template.shape[0], x:x + template.shape[1]] = template
+    return frame
+
+
+def frame_base64(frame):
+    ok, png = cv2.imencode(".png", frame)
+    return base64.b64encode(png.tobytes()).decode()
+
+
+class TestInMemoryDecoding(unittest.TestCase):
+
+    def test_decode_matches_file_read(self):
+        path = os.path.join(IMG_DIR, "X.png")
+        with open(path, 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode()
+
+        decoded = decode_base64_image("data:image/png;base64," + encoded)
+
+        self.assertTrue(np.array_equal(decoded, cv2.imread(path)))
+        self.assertIsNone(decode_base64_image("not an image"))
+
+    def test_element_exists_writes_no_files(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+        frame = make_frame()
+        with patch.object(handler, 'get_screenshot_base64', return_value=frame_base64(frame)), \
+             patch.object(handler, 'save_base64_as_image') as mock_save:
+            result = handler.element_exists("X.png")
+
+        self.assertIsNotNone(result)
+        self.assertEqual(result["rectangle"][0], (300, 600))
+        mock_save.assert_not_called()
+
+    def test_debug_dir_keeps_screenshots(self):
+        debug_dir = tempfile.mkdtemp()
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a", debug_dir=debug_dir)
+        with patch.object(handler, 'get_screenshot_base64', return_value=frame_base64(make_frame())):
+            self.assertIsNotNone(handler.get_screenshot())
+
+        self.assertEqual(len(os.listdir(debug_dir)), 1)
+
+
+class TestRegionHints(unittest.TestCase):
+
+    def setUp(self):
+        template_cache().clear()
+        self.handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a", match_cache_size=0)
+        self.path = self.handler.template_path("LoveIcon.png")
+
+    def tearDown(self):
+        template_cache().clear()
+
+    def test_hit_learns_region_and_next_match_uses_it(self):
+        frame = make_frame("LoveIcon.png", top_left=(500, 900))
+        with patch.object(self.handler, 'get_screenshot', return_value=frame):
+            first = self.handler.element_exists("LoveIcon.png")
+            region = template_region(self.path)
+            self.assertIsNotNone(region)
+
+            with patch.object(self.handler, 'match_image', wraps=self.handler.match_image) as mock_match:
+                second = self.handler.element_exists("LoveIcon.png")
+
+        self.assertEqual(second["rectangle"], first["rectangle"])
+        # Only the region crop was searched
+        searched = mock_match.call_args.args[0]
+        self.assertLess(searched.shape[0] * searched.shape[1], frame.shape[0] * frame.shape[1] // 10)
+
+    def test_region_miss_falls_back_to_full_frame(self):
+        self.handler.hint_region("LoveIcon.png", (100, 100))
+        frame = make_frame("LoveIcon.png", top_left=(500, 900))
+        with patch.object(self.handler, 'get_screenshot', return_value=frame):
+            result = self.handler.element_exists("LoveIcon.png")
+
+        self.assertEqual(result["rectangle"][0], (500, 900))
+        x, y, w, h = template_region(self.path)
+        self.assertTrue(x <= 500 and y <= 900 and x + w >= 537 and y + h >= 937)
+
+
+class TestPyramidMatching(unittest.TestCase):
+
+    def setUp(self):
+        template_cache().clear()
+        self.handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+
+    def tearDown(self):
+        template_cache().clear()
+
+    def test_pyramid_agrees_with_full_resolution(self):
+        names = ["X.png", "LoveIcon.png", "SmsLogin.png", "waitapp.png", "agreeCountinue.png", "myt_arrow.png"]
+        for seed, name in enumerate(names):
+            frame = make_frame(name, top_left=(120 + seed * 40, 300 + seed * 90), seed=seed)
+            template = get_template(self.handler.template_path(name))
+
+            full = self.handler.match_image(frame, template.image, 0.7)
+            coarse = self.handler.match_pyramid(frame, template, 0.7)
+
+            self.assertIsNotNone(coarse, name)
+            self.assertEqual(coarse["rectangle"], full["rectangle"], name)
+            self.assertGreaterEqual(coarse["confidence"], 0.7, name)
+
+    def test_opt_in_and_no_false_positive(self):
+        self.handler.use_pyramid("X.png")
+        template = get_template(self.handler.template_path("X.png"))
+        frame = make_frame("LoveIcon.png", top_left=(300, 600))
+
+        with patch.object(self.handler, 'match_pyramid', wraps=self.handler.match_pyramid) as mock_pyramid:
+            self.assertIsNone(self.handler.find_template(frame, template, 0.7))
+        mock_pyramid.assert_called_once()
+
+
+class TestMatchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+
+    def test_unchanged_screen_skips_matching(self):
+        frame = make_frame("X.png", top_left=(300, 600))
+        with patch.object(self.handler, '_search_template', wraps=self.handler._search_template) as mock_search:
+            for _ in range(3):
+                # A fresh decode of the same screen is a different array with equal content
+                with patch.object(self.handler, 'get_screenshot', return_value=frame.copy()):
+                    result = self.handler.element_exists("X.png")
+                    self.assertEqual(result["rectangle"][0], (300, 600))
+                    self.assertIsNone(self.handler.element_exists("LoveIcon.png"))
+
+        self.assertEqual(mock_search.call_count, 2)
+        self.assertEqual(self.handler.match_cache.hits, 4)
+
+    def test_changed_screen_is_matched_again(self):
+        frames = [make_frame("X.png", top_left=(300, 600), seed=1), make_frame("X.png", top_left=(100, 200), seed=2)]
+        with patch.object(self.handler, 'get_screenshot', side_effect=frames):
+            first = self.handler.element_exists("X.png")
+            second = self.handler.element_exists("X.png")
+
+        self.assertEqual(first["rectangle"][0], (300, 600))
+        self.assertEqual(second["rectangle"][0], (100, 200))
+
+
+class TestScreenshotTiers(unittest.TestCase):
+
+    def setUp(self):
+        template_cache().clear()
+
+    def tearDown(self):
+        template_cache().clear()
+
+    def test_poll_tier_decodes_reduced_and_maps_back(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a", poll_tier="poll",
+                            tiers={"poll": {"level": 3, "reduce": 2}})
+        frame = make_frame("agreeCountinue.png", top_left=(200, 500))
+        with patch.object(handler, 'get_screenshot_base64', return_value=frame_base64(frame)) as mock_capture:
+            self.assertEqual(handler.get_screenshot("poll").shape[:2], (640, 360))
+            result = handler.element_exists("agreeCountinue.png")
+
+        mock_capture.assert_called_with(3)
+        full = handler.match_image(frame, handler.template_path("agreeCountinue.png"))
+        self.assertAlmostEqual(result["result"][0], full["result"][0], delta=2)
+        self.assertAlmostEqual(result["result"][1], full["result"][1], delta=2)
+
+    def test_tier_level_is_sent_to_endpoint(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a",
+                            tiers={"poll": {"level": 1, "reduce": 4}})
+        with patch.object(handler, 'get_screenshot_base64',
+                          return_value=frame_base64(make_frame())) as mock_capture:
+            self.assertEqual(handler.get_screenshot("poll").shape[:2], (320, 180))
+        mock_capture.assert_called_once_with(1)
+
+    def test_only_full_tier_is_built_in(self):
+        handler = ImgHandle(host="h", ip="10.0.0.1", name="T1001-a")
+        self.assertEqual(list(handler.tiers), ["full"])
+        self.assertEqual(handler.poll_tier, "full")
+
+
+if __name__ == '__main__':
+    unittest.main()
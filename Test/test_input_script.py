@@ -0,0 +1,73 @@
+import unittest
+from unittest.mock import patch
+import re
+import itertools
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.input_script import InputScript, quote_text
+from Autolization.AutoOperate import AutoPhone
+
+
+class TestInputScript(unittest.TestCase):
+
+    def test_compile(self):
+        script = InputScript().tap(10.6, 20).sleep(0.5).swipe(1, 2, 3, 4, 250).key("KEYCODE_HOME").text("a b")
+        self.assertEqual(script.compile(), "input tap 10 20; sleep 0.500; input swipe 1 2 3 4 250; "
+                                           "input keyevent KEYCODE_HOME; input text a%sb")
+        self.assertEqual(quote_text("it's"), "'it'\"'\"'s'")
+        self.assertAlmostEqual(script.expected_duration(), 0.5 + 4 * 0.5)
+        # Pauses are fixed; only the steps get the safety factor
+        self.assertAlmostEqual(script.timeout(), 0.5 + 4 * 0.5 * 4 + 10)
+
+    def test_timeout_scales_with_steps(self):
+        script = InputScript().type_text("13800138000", 0.1, 0.3)
+        # 11 inputs at a 4x slow-down still fit in the timeout
+        self.assertGreater(script.timeout(), script.sleep_seconds + 11 * 0.5 * 4)
+        self.assertGreater(script.timeout(), script.expected_duration() + 10)
+
+    def test_timeout_mid_script_is_flagged(self):
+        phone = AutoPhone("10.0.0.1", "5001", host="h", name="T1001-a", auto_connect=False)
+        script = InputScript().tap(1, 2).text("1234")
+        with patch('Autolization.AutoOperate.requests.post') as mock_post, \
+                patch('Autolization.input_script.time.time', side_effect=itertools.count(0, 100)):
+            mock_post.side_effect = TimeoutError("Read timed out")
+            response = script.run(phone)
+
+        self.assertTrue(response["timed_out"])
+        # The script is never resent
+        mock_post.assert_called_once()
+
+    def test_type_text_keeps_jitter(self):
+        script = InputScript().type_text("13800", 0.1, 0.3)
+        delays = [float(d) for d in re.findall(r"sleep (\d+\.\d+)", script.compile())]
+
+        self.assertEqual(script.compile().count("input text"), 5)
+        self.assertEqual(len(delays), 5)
+        self.assertTrue(all(0.1 <= d <= 0.3 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_phone_input_uses_one_request(self):
+        phone = AutoPhone("10.0.0.1", "5001", host="h", name="T1001-a", auto_connect=False)
+        with patch('Autolization.AutoOperate.requests.post') as mock_post, \
+                patch('Autolization.AutoOperate.time.sleep') as mock_sleep:
+            mock_post.return_value.json.return_value = {"code": 0}
+            phone.human_type_text("13800138000")
+            phone.set_fingerprint()
+
+        self.assertEqual(mock_post.call_count, 2)
+        mock_sleep.assert_not_called()
+        typed = mock_post.call_args_list[0].kwargs["json"]["cmd"]
+        self.assertEqual(typed.count("input text"), 11)
+        self.assertGreater(mock_post.call_args_list[0].kwargs["timeout"], 10)
+        fingerprint = mock_post.call_args_list[1].kwargs["json"]["cmd"]
+        self.assertTrue(fingerprint.startswith("am start -a android.settings.SECURITY_SETTINGS; sleep 1.500"))
+        self.assertTrue(fingerprint.endswith("input keyevent KEYCODE_HOME"))
+        # A script containing input counts as an action for screenshot freshness
+        self.assertGreater(phone.img_handler.last_action, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
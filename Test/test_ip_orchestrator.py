@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from AutoTasks import ip_orchestrator
+
+
+def batch_result(ip, **extra):
+    return dict({"ip": ip, "success_count": 1, "failure_count": 0, "processed_batches": 1, "failures": []},
+                **extra)
+
+
+@patch('AutoTasks.ip_orchestrator.release_many')
+@patch('AutoTasks.ip_orchestrator.acquire_many')
+@patch('AutoTasks.ip_orchestrator.get_ip_config', return_value={})
+@patch('AutoTasks.ip_orchestrator.get_all_ips', return_value=["10.0.0.1", "10.0.0.2"])
+@patch('AutoTasks.ip_orchestrator.load_config', return_value={"global": {}})
+class TestProcessAllIps(unittest.TestCase):
+
+    @patch('AutoTasks.ip_orchestrator.process_ip_batches')
+    def test_sequential_locks_each_ip_only_while_processing(self, mock_process, mock_config, mock_ips,
+                                                              mock_ip_config, mock_acquire, mock_release):
+        mock_process.side_effect = lambda ip, ip_config, global_config: batch_result(ip)
+
+        results = ip_orchestrator.process_all_ips(mode="sequential")
+
+        # No bulk lock: process_ip_batches takes and releases each IP's lock itself
+        mock_acquire.assert_not_called()
+        mock_release.assert_not_called()
+        for call in mock_process.call_args_list:
+            self.assertNotIn("fence", call.kwargs)
+        self.assertEqual(results["completed_ips"], 2)
+
+    @patch('AutoTasks.ip_orchestrator.process_ip_batches')
+    def test_sequential_counts_locked_ip_as_failed(self, mock_process, mock_config, mock_ips,
+                                                     mock_ip_config, mock_acquire, mock_release):
+        mock_process.side_effect = lambda ip, ip_config, global_config: (
+            batch_result(ip, success_count=0, error="Failed to acquire IP lock") if ip == "10.0.0.2"
+            else batch_result(ip))
+
+        results = ip_orchestrator.process_all_ips(mode="sequential")
+
+        self.assertEqual(results["completed_ips"], 1)
+        self.assertEqual(results["failed_ips"], 1)
+        self.assertEqual(results["results"]["10.0.0.2"]["error"], "Failed to acquire IP lock")
+
+    @patch('AutoTasks.ip_orchestrator.ProcessPoolExecutor', ThreadPoolExecutor)
+    @patch('AutoTasks.ip_orchestrator.process_ip_batches')
+    def test_parallel_counts_error_result_as_failed(self, mock_process, mock_config, mock_ips,
+                                                    mock_ip_config, mock_acquire, mock_release):
+        mock_acquire.return_value = {"granted": {ip: SimpleNamespace(fence=1) for ip in ["10.0.0.1", "10.0.0.2"]},
+                                     "denied": []}
+        mock_process.side_effect = lambda ip, ip_config, global_config, fence: (
+            batch_result(ip, error="IP lock lost") if ip == "10.0.0.2" else batch_result(ip))
+
+        results = ip_orchestrator.process_all_ips(mode="parallel", max_parallel=2)
+
+        self.assertEqual(results["completed_ips"], 1)
+        self.assertEqual(results["failed_ips"], 1)
+        mock_release.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from MachineManage import tools
+from MachineManage.lamda_fleet import fleet_lamda
+
+
+class TestLamdaProbe(unittest.TestCase):
+
+    @patch('MachineManage.tools.api_adb_shell')
+    def test_status_parses_pid_and_port(self, mock_shell):
+        mock_shell.return_value = {"code": 200, "msg": "alive:1234\nlistening\n"}
+        self.assertEqual(tools.lamda_status("10.0.0.1", "T1001-a"),
+                         {"pid": 1234, "alive": True, "listening": True})
+
+        mock_shell.return_value = {"code": 200, "msg": "dead\n"}
+        self.assertEqual(tools.lamda_status("10.0.0.1", "T1001-a"),
+                         {"pid": None, "alive": False, "listening": False})
+
+    @patch('MachineManage.tools.time.time')
+    @patch('MachineManage.tools.time.sleep')
+    @patch('MachineManage.tools.api_adb_shell')
+    def test_failed_probe_is_not_read_as_down(self, mock_shell, mock_sleep, mock_time):
+        """A failed shell call must not make kill_lamda report success"""
+        clock = iter(range(0, 1000, 10))
+        mock_time.side_effect = lambda: next(clock)
+        mock_shell.return_value = {"code": -1, "msg": "connection refused"}
+
+        with self.assertRaises(tools.ShellOutputError):
+            tools.lamda_status("10.0.0.1", "T1001-a")
+        with self.assertRaises(tools.ShellOutputError):
+            tools.shell_output({"code": 200, "data": "alive:1"})
+        self.assertFalse(tools.kill_lamda("10.0.0.1", "T1001-a", grace_timeout=30))
+
+    @patch('MachineManage.tools.time.sleep')
+    @patch('MachineManage.tools.lamda_status')
+    @patch('MachineManage.tools.api_adb_shell')
+    def test_kill_skips_kill9_when_lamda_exits(self, mock_shell, mock_status, mock_sleep):
+        mock_status.side_effect = [
+            {"pid": 1, "alive": True, "listening": True},
+            {"pid": None, "alive": False, "listening": False},
+        ]
+
+        self.assertTrue(tools.kill_lamda("10.0.0.1", "T1001-a"))
+
+        commands = [call.args[2] for call in mock_shell.call_args_list]
+        self.assertEqual(len(commands), 1)
+        self.assertIn("SIGUSR2", commands[0])
+        mock_sleep.assert_called_once()
+
+    @patch('MachineManage.tools.time.time')
+    @patch('MachineManage.tools.time.sleep')
+    @patch('MachineManage.tools.lamda_status')
+    @patch('MachineManage.tools.api_adb_shell')
+    def test_kill_escalates_when_lamda_hangs(self, mock_shell, mock_status, mock_sleep, mock_time):
+        clock = iter(range(0, 1000, 10))
+        mock_time.side_effect = lambda: next(clock)
+        mock_status.return_value = {"pid": 1, "alive": True, "listening": True}
+
+        tools.kill_lamda("10.0.0.1", "T1001-a", grace_timeout=30)
+
+        commands = [call.args[2] for call in mock_shell.call_args_list]
+        self.assertIn("kill -9", commands[-1])
+
+    @patch('MachineManage.tools.wait_lamda', return_value=True)
+    @patch('MachineManage.tools.start_lamda', return_value=True)
+    def test_restart_waits_for_health(self, mock_start, mock_wait):
+        self.assertTrue(tools.restart_lamda("10.0.0.1", "T1001-a"))
+        mock_wait.assert_called_once_with("10.0.0.1", "T1001-a", running=True, timeout=60)
+
+    @patch('MachineManage.tools.restart_lamda', return_value=True)
+    @patch('MachineManage.tools.run_install')
+    @patch('MachineManage.tools.update_new_wenjian', return_value=False)
+    @patch('MachineManage.tools.uninstall_lamda')
+    @patch('MachineManage.tools.kill_lamda', return_value=True)
+    def test_reinstall_stops_when_sync_fails(self, mock_kill, mock_uninstall, mock_sync, mock_install,
+                                             mock_restart):
+        self.assertFalse(tools.reinstall_lamda("10.0.0.1", "T1001-a"))
+        mock_install.assert_not_called()
+        mock_restart.assert_not_called()
+
+    @patch('MachineManage.tools.update_new_wenjian')
+    @patch('MachineManage.tools.uninstall_lamda')
+    @patch('MachineManage.tools.kill_lamda', return_value=False)
+    def test_reinstall_keeps_install_when_kill_fails(self, mock_kill, mock_uninstall, mock_sync):
+        self.assertFalse(tools.reinstall_lamda("10.0.0.1", "T1001-a"))
+        mock_uninstall.assert_not_called()
+        mock_sync.assert_not_called()
+
+
+class TestFleetLamda(unittest.TestCase):
+
+    def test_invalid_action(self):
+        with self.assertRaises(ValueError):
+            fleet_lamda("explode", targets=[])
+
+    def test_reports_per_device_latency(self):
+        targets = [("10.0.0.1", "T1001-a"), ("10.0.0.2", "T1001-b")]
+        with patch.dict('MachineManage.lamda_fleet.LAMDA_ACTIONS',
+                        {"restart": lambda ip, name: name != "T1001-b"}):
+            summary = fleet_lamda("restart", targets=targets)
+
+        self.assertEqual(summary["total"], 2)
+        self.assertEqual(summary["failed_targets"], ["10.0.0.2/T1001-b"])
+        self.assertIn("elapsed", summary["devices"]["10.0.0.1/T1001-a"])
+
+
+if __name__ == '__main__':
+    unittest.main()
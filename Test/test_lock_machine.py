@@ -0,0 +1,200 @@
+import unittest
+from unittest.mock import patch
+import time
+import sys
+import os
+from collections import Counter
+
+import fakeredis
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from MachineManage import lock_machine
+from MachineManage.lock_machine import (LockManager, ACQUIRE_SCRIPT, RENEW_SCRIPT, RELEASE_SCRIPT,
+                                        SHARED_ACQUIRE_SCRIPT, SHARED_RENEW_SCRIPT,
+                                        ACQUIRE_MANY_SCRIPT, RELEASE_MANY_SCRIPT)
+
+
+class FakeRedis(fakeredis.FakeRedis):
+    """
+    In-memory Redis that runs the real Lua lock scripts (fakeredis with lupa),
+    counting how often each script is called
+    """
+
+    SCRIPT_NAMES = {ACQUIRE_SCRIPT: "acquire", RENEW_SCRIPT: "renew", RELEASE_SCRIPT: "release",
+                    SHARED_ACQUIRE_SCRIPT: "shared_acquire", SHARED_RENEW_SCRIPT: "shared_renew",
+                    ACQUIRE_MANY_SCRIPT: "acquire_many", RELEASE_MANY_SCRIPT: "release_many"}
+
+    def __init__(self):
+        super().__init__(server=fakeredis.FakeServer(), decode_responses=True)
+        self.script_calls = Counter()
+        # Preloaded so each script call is one evalsha, as on a warm server
+        self._names = {self.script_load(script): name for script, name in self.SCRIPT_NAMES.items()}
+
+    def evalsha(self, sha, numkeys, *keys_and_args):
+        self.script_calls[self._names.get(sha, sha)] += 1
+        return super().evalsha(sha, numkeys, *keys_and_args)
+
+    @property
+    def renewals(self):
+        return self.script_calls["renew"]
+
+    @property
+    def calls(self):
+        return self.script_calls["acquire_many"] + self.script_calls["release_many"]
+
+
+class TestLockManager(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.manager = LockManager(client=self.redis, ttl=30)
+
+    def test_second_acquire_fails_while_held(self):
+        lease = self.manager.acquire("lock:a")
+        self.assertIsNotNone(lease)
+        self.assertIsNone(self.manager.acquire("lock:a"))
+        lease.release()
+
+    def test_fence_increases_per_acquire(self):
+        first = self.manager.acquire("lock:a")
+        first.release()
+        second = self.manager.acquire("lock:a")
+
+        self.assertGreater(second.fence, first.fence)
+        self.assertFalse(self.manager.is_current("lock:a", first.fence))
+        self.assertTrue(self.manager.is_current("lock:a", second.fence))
+        second.release()
+
+    def test_release_does_not_drop_other_owner(self):
+        lease = self.manager.acquire("lock:a")
+        # Lease expired and someone else took the key
+        self.redis.set("lock:a", "other-owner")
+
+        self.assertFalse(lease.release())
+        self.assertEqual(self.redis.get("lock:a"), "other-owner")
+
+    def test_heartbeat_renews_and_detects_loss(self):
+        manager = LockManager(client=self.redis, ttl=0.3, renew_interval=0.05)
+        lease = manager.acquire("lock:a")
+        time.sleep(0.2)
+        self.assertGreater(self.redis.renewals, 0)
+        self.assertTrue(lease.held)
+
+        self.redis.set("lock:a", "other-owner")
+        self.assertTrue(lease.lost.wait(1))
+        self.assertFalse(lease.held)
+        lease.stop()
+
+
+    def test_expired_reader_cannot_renew(self):
+        manager = LockManager(client=self.redis, ttl=0.05, renew_interval=10)
+        stale = manager.acquire_shared("lock:a", "lock:a:readers")
+        live = LockManager(client=self.redis, ttl=30).acquire_shared("lock:a", "lock:a:readers")
+        time.sleep(0.1)
+
+        # The set still exists because of the live reader, but the stale one expired
+        self.assertFalse(manager.renew(stale))
+        self.assertIsNone(self.redis.zscore("lock:a:readers", stale.token))
+        self.assertTrue(live.manager.renew(live))
+        stale.stop()
+        live.stop()
+
+    def test_expired_readers_do_not_block_exclusive(self):
+        manager = LockManager(client=self.redis, ttl=0.05, renew_interval=10)
+        reader = manager.acquire_shared("lock:a", "lock:a:readers")
+        self.assertIsNone(self.manager.acquire("lock:a", "lock:a:readers"))
+        time.sleep(0.1)
+
+        self.assertIsNotNone(self.manager.acquire("lock:a", "lock:a:readers"))
+        reader.stop()
+
+
+class TestIpLock(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = patch('MachineManage.lock_machine.get_manager',
+                        return_value=LockManager(client=self.redis, ttl=30))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lock_and_release_ip(self):
+        lease = lock_machine.lock_machine("10.0.0.1")
+        self.assertTrue(lease)
+        self.assertFalse(lock_machine.lock_machine("10.0.0.1"))
+        self.assertTrue(lock_machine.validate_fence("10.0.0.1", lease.fence))
+
+        self.assertTrue(lock_machine.release_machine_lock("10.0.0.1"))
+        self.assertFalse(self.redis.exists("xhs_device_login:10.0.0.1"))
+        self.assertFalse(lock_machine.validate_fence("10.0.0.1", lease.fence))
+
+
+    def test_shared_ip_lock_excludes_exclusive(self):
+        first = lock_machine.lock_ip_shared("10.0.0.1")
+        second = lock_machine.lock_ip_shared("10.0.0.1")
+        self.assertTrue(first and second)
+        self.assertFalse(lock_machine.lock_machine("10.0.0.1"))
+
+        lock_machine.release_ip_shared(first)
+        lock_machine.release_ip_shared(second)
+        self.assertTrue(lock_machine.lock_machine("10.0.0.1"))
+        self.assertFalse(lock_machine.lock_ip_shared("10.0.0.1"))
+        lock_machine.release_machine_lock("10.0.0.1")
+
+    def test_slot_locks_are_all_or_nothing(self):
+        held = lock_machine.lock_slots("10.0.0.1", ["2"])
+        self.assertIsNotNone(held)
+
+        self.assertIsNone(lock_machine.lock_slots("10.0.0.1", ["1", "2", "3"]))
+        # Slots taken before the conflict were given back
+        self.assertFalse(self.redis.exists("xhs_device_login:10.0.0.1:slot:1"))
+
+        other = lock_machine.lock_slots("10.0.0.1", ["1", "3"])
+        self.assertEqual(sorted(other), ["1", "3"])
+        self.assertTrue(lock_machine.release_slots("10.0.0.1", other))
+        self.assertTrue(lock_machine.release_slots("10.0.0.1", held))
+
+
+    def test_acquire_many_partial_grant(self):
+        lock_machine.lock_machine("10.0.0.2")
+
+        locks = lock_machine.acquire_many(["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+
+        self.assertEqual(sorted(locks["granted"]), ["10.0.0.1", "10.0.0.3"])
+        self.assertEqual(locks["denied"], ["10.0.0.2"])
+        self.assertEqual(self.redis.calls, 1)
+
+        released = lock_machine.release_many(["10.0.0.1", "10.0.0.3"])
+        self.assertEqual(released["released"], ["10.0.0.1", "10.0.0.3"])
+        self.assertEqual(self.redis.calls, 2)
+        self.assertFalse(self.redis.exists("xhs_device_login:10.0.0.1"))
+        lock_machine.release_machine_lock("10.0.0.2")
+
+    def test_release_many_leaves_other_owners_alone(self):
+        lease = LockManager(client=self.redis, ttl=30).acquire("xhs_device_login:10.0.0.9")
+
+        released = lock_machine.release_many(["10.0.0.9"])
+
+        self.assertEqual(released["released"], [])
+        self.assertEqual(released["not_owned"], ["10.0.0.9"])
+        self.assertTrue(self.redis.exists("xhs_device_login:10.0.0.9"))
+
+        with patch('MachineManage.lock_machine.get_redis', return_value=self.redis):
+            forced = lock_machine.release_many(["10.0.0.9"], force=True)
+        self.assertEqual(forced["released"], ["10.0.0.9"])
+        self.assertFalse(self.redis.exists("xhs_device_login:10.0.0.9"))
+        lease.stop()
+
+    def test_acquire_many_all_or_nothing(self):
+        lock_machine.lock_machine("10.0.0.2")
+
+        locks = lock_machine.acquire_many(["10.0.0.1", "10.0.0.2"], all_or_nothing=True)
+
+        self.assertEqual(locks["granted"], {})
+        self.assertFalse(self.redis.exists("xhs_device_login:10.0.0.1"))
+        lock_machine.release_machine_lock("10.0.0.2")
+
+
+if __name__ == '__main__':
+    unittest.main()
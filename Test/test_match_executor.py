@@ -0,0 +1,59 @@
+import unittest
+import threading
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.ImgHandle import ImgHandle, MatchExecutor, match_frames
+from test_img_handle import make_frame
+
+TEMPLATES = ["X.png", "waitapp.png", "SmsLogin.png", "downarrow.png", "missing.png"]
+
+
+class TestMatchExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = MatchExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_results_keep_input_order(self):
+        threads = set()
+
+        def square(n):
+            threads.add(threading.current_thread().name)
+            return n * n
+
+        self.assertEqual(self.executor.run(square, range(10)), [n * n for n in range(10)])
+        self.assertTrue(all(name.startswith("match") for name in threads))
+
+    def test_nested_run_does_not_deadlock(self):
+        executor = MatchExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        result = executor.run(lambda n: sum(executor.run(lambda m: m, range(n))), [3, 4, 5])
+        self.assertEqual(result, [3, 6, 10])
+
+    def test_parallel_matches_equal_serial(self):
+        parallel = ImgHandle(name="T1001-a", match_cache_size=0, executor=self.executor)
+        serial = ImgHandle(name="T1001-a", match_cache_size=0, executor=MatchExecutor(1))
+        frame = make_frame("waitapp.png", top_left=(100, 200))
+
+        hits = parallel.match_frame(frame, TEMPLATES)
+
+        self.assertEqual([name for name, _ in hits], [name for name, _ in serial.match_frame(frame, TEMPLATES)])
+        self.assertEqual(hits[0][0], "waitapp.png")
+        self.assertEqual(hits[0][1]["rectangle"][0], (100, 200))
+
+    def test_match_frames_across_devices(self):
+        first = ImgHandle(name="T1001-a", match_cache_size=0)
+        second = ImgHandle(name="T1001-b", match_cache_size=0)
+        jobs = [(first, make_frame("X.png", top_left=(50, 60)), ["X.png", "waitapp.png"], None),
+                (second, make_frame("waitapp.png", top_left=(300, 600)), ["X.png", "waitapp.png"], None)]
+
+        hits = match_frames(jobs, executor=self.executor)
+
+        self.assertEqual([[name for name, _ in device_hits] for device_hits in hits], [["X.png"], ["waitapp.png"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
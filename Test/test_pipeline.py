@@ -0,0 +1,109 @@
+import unittest
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from MachineManage.pipeline import Stage, StagedPipeline
+
+
+class TestStagedPipeline(unittest.TestCase):
+
+    def test_all_items_pass_through_every_stage(self):
+        seen = []
+        lock = threading.Lock()
+
+        def record(name):
+            def func(item):
+                with lock:
+                    seen.append((name, item["info"]))
+                return True
+            return func
+
+        pipeline = StagedPipeline([Stage("a", record("a"), workers=2), Stage("b", record("b"))])
+        results = pipeline.run(list(range(10)))
+
+        self.assertEqual(sorted(item["info"] for item in results["success"]), list(range(10)))
+        self.assertEqual(results["failure"], [])
+        self.assertEqual(len(seen), 20)
+
+    def test_stage_concurrency_limit(self):
+        active = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def slow(item):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return True
+
+        pipeline = StagedPipeline([Stage("slow", slow, workers=3)], queue_size=2)
+        results = pipeline.run(list(range(12)))
+
+        self.assertEqual(len(results["success"]), 12)
+        self.assertLessEqual(peak[0], 3)
+
+    def test_retry_then_success(self):
+        attempts = {}
+
+        def flaky(item):
+            attempts[item["info"]] = attempts.get(item["info"], 0) + 1
+            return attempts[item["info"]] >= 3
+
+        pipeline = StagedPipeline([Stage("flaky", flaky, retries=2, backoff=0.001)])
+        results = pipeline.run(["x"])
+
+        self.assertEqual(len(results["success"]), 1)
+        self.assertEqual(attempts["x"], 3)
+
+    def test_cleanup_and_restart_from_earlier_stage(self):
+        created = []
+        cleaned = []
+
+        def create(item):
+            created.append(item["info"])
+            return True
+
+        def check(item):
+            # Fail the first pass only
+            return item["restarts"] >= 1
+
+        pipeline = StagedPipeline([
+            Stage("create", create),
+            Stage("check", check, cleanup=lambda item: cleaned.append(item["info"]), restart_from="create"),
+        ])
+        results = pipeline.run(["dev"])
+
+        self.assertEqual(len(results["success"]), 1)
+        self.assertEqual(created, ["dev", "dev"])
+        self.assertEqual(cleaned, ["dev"])
+
+    def test_failure_after_max_restarts(self):
+        def always_fail(item):
+            raise RuntimeError("backend down")
+
+        pipeline = StagedPipeline([
+            Stage("create", lambda item: True),
+            Stage("check", always_fail, restart_from="create"),
+        ], max_restarts=1)
+        results = pipeline.run(["dev"])
+
+        self.assertEqual(results["success"], [])
+        failed = results["failure"][0]
+        self.assertEqual(failed["stage"], "check")
+        self.assertEqual(failed["restarts"], 1)
+        self.assertIn("backend down", failed["error"])
+
+    def test_unknown_restart_stage_rejected(self):
+        with self.assertRaises(ValueError):
+            StagedPipeline([Stage("a", lambda item: True, restart_from="missing")])
+
+
+if __name__ == '__main__':
+    unittest.main()
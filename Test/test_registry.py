@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import json
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.registry import load_registry, get_registry
+from Autolization.templates import IMG_DIR, template_region, template_cache
+from Autolization.xhs_exceptEvents import ExceptionHandler
+from Autolization.AutoXhs import XhsAutomation
+
+
+class TestTemplateRegistry(unittest.TestCase):
+
+    def tearDown(self):
+        template_cache().clear()
+
+    def write_registry(self, data):
+        handle = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        with handle:
+            json.dump(data, handle)
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def test_every_declared_template_exists(self):
+        for element in load_registry():
+            self.assertTrue(os.path.exists(element.path), element.name)
+
+    def test_unknown_field_is_rejected(self):
+        path = self.write_registry({"elements": {"x": {"file": "X.png", "treshold": 0.6}}})
+        with self.assertRaises(ValueError):
+            load_registry(path)
+
+    def test_compile_predecodes_and_prescales(self):
+        path = self.write_registry({
+            "defaults": {"threshold": 0.6},
+            "elements": {"login": {"file": "X.png", "record_pos": [0, 0]}},
+        })
+        registry = load_registry(path)
+
+        self.assertEqual(registry.compile(frame_widths=[720, 360]), 1)
+        element = registry["login"]
+        self.assertEqual(element.threshold, 0.6)
+        self.assertIn(("scale", 0.5), element.template._variants)
+        self.assertIsNotNone(template_region(os.path.join(IMG_DIR, "X.png")))
+
+    def test_exception_handler_follows_registry_order(self):
+        exceptions = ExceptionHandler(MagicMock())
+        registry = get_registry()
+
+        self.assertEqual(list(exceptions.exception_images), [e.file for e in registry.exceptions()])
+        self.assertEqual(exceptions.exception_images["myt_arrow.png"], exceptions.handle_captcha_arrow)
+
+    def test_touch_uses_declared_arguments(self):
+        auto_phone = MagicMock()
+        auto_phone.tap_view.return_value = False
+        xhs = XhsAutomation(auto_phone)
+        with patch.object(xhs, '_safe_touch', return_value=True) as mock_touch:
+            xhs.touch("first_login")
+            xhs.touch("agree_icon", looptime=2)
+
+        mock_touch.assert_any_call("FirstLogin.png", record_pos=(-0.019, -0.122), threshold=0.6,
+                                   clickpos=True, looptime=1)
+        mock_touch.assert_any_call("tpl1766629849292.png", record_pos=(0.018, 0.418), threshold=0.6,
+                                   clickpos=False, looptime=2)
+
+    def test_touch_prefers_declared_view(self):
+        path = self.write_registry({"elements": {
+            "phone_input": {"file": "PhoneInput.png", "view": {"resource_id": "phone_input"}}}})
+        auto_phone = MagicMock()
+        xhs = XhsAutomation(auto_phone)
+        xhs.registry = load_registry(path)
+        with patch.object(xhs, '_safe_touch') as mock_touch:
+            self.assertTrue(xhs.touch("phone_input"))
+            auto_phone.tap_view.return_value = False
+            xhs.touch("phone_input")
+
+        auto_phone.tap_view.assert_called_with(resource_id="phone_input")
+        mock_touch.assert_called_once()
+
+    def test_login_flow_elements_declare_views(self):
+        registry = get_registry()
+        for name in ("phone_input", "enter_code", "login_element", "agree_icon"):
+            # The view query comes first; the template stays as the fallback
+            self.assertTrue(registry[name].view, name)
+            self.assertTrue(os.path.exists(registry[name].path), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
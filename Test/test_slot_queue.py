@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import fakeredis
+
+from MachineManage import slot_queue
+from MachineManage.lock_machine import LockManager
+
+IP = "10.0.0.1"
+ACCOUNTS = [["111", 1, "", ""], ["112", 1, "", ""], ["221", 2, "", ""], ["331", 3, "", ""]]
+
+
+class TestSlotQueue(unittest.TestCase):
+
+    def setUp(self):
+        # Real Lua scripts on an in-memory Redis shared by the lock manager and the queue
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        manager = LockManager(client=self.redis, ttl=30)
+        for target, value in (('MachineManage.slot_queue.get_redis', self.redis),
+                              ('MachineManage.slot_queue.get_manager', manager),
+                              ('MachineManage.lock_machine.get_manager', manager)):
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_seed_once_per_round(self):
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            return ACCOUNTS
+
+        self.assertEqual(slot_queue.seed_slot_work(IP, fetch), 4)
+        # A second worker finds work pending and neither fetches nor re-seeds
+        self.assertEqual(slot_queue.seed_slot_work(IP, fetch), 0)
+        self.assertEqual(len(fetches), 1)
+        self.assertEqual(sorted(slot_queue.pending_slots(IP)), ["1", "2", "3"])
+
+    def test_workers_never_claim_the_same_account(self):
+        slot_queue.seed_accounts(IP, ACCOUNTS)
+
+        first, first_leases = slot_queue.claim_batch(IP, batch_size=2)
+        second, second_leases = slot_queue.claim_batch(IP, batch_size=4)
+
+        self.assertEqual(len(first), 2)
+        # Only the one slot the first worker did not lock is left for the second
+        self.assertEqual(len(second), 1)
+        self.assertFalse(set(first_leases) & set(second_leases))
+        claimed = [account[0] for account in first + second]
+        self.assertEqual(len(claimed), len(set(claimed)))
+        # Each claimed account is recorded as its slot's info_list entry
+        self.assertEqual(len(self.redis.hgetall(slot_queue.info_list_key(IP))), 3)
+
+        slot_queue.release_slot_work(IP, first_leases)
+        slot_queue.release_slot_work(IP, second_leases)
+        third, third_leases = slot_queue.claim_batch(IP)
+        slot_queue.release_slot_work(IP, third_leases)
+
+        # The second account of slot 1 comes out once its slot is free again
+        self.assertEqual(len(third), 1)
+        self.assertEqual(sorted(account[0] for account in first + second + third),
+                         sorted(account[0] for account in ACCOUNTS))
+        self.assertEqual(slot_queue.pending_slots(IP), [])
+        self.assertEqual(self.redis.hgetall(slot_queue.info_list_key(IP)), {})
+
+    def test_seed_skips_locked_slots(self):
+        slot_queue.seed_accounts(IP, [ACCOUNTS[2]])
+        batch, leases = slot_queue.claim_batch(IP)
+        self.assertEqual(batch, [ACCOUNTS[2]])
+
+        # Slot 2 is in progress: re-seeding must not queue its account again
+        self.assertEqual(slot_queue.seed_accounts(IP, ACCOUNTS), 3)
+        self.assertNotIn("2", slot_queue.pending_slots(IP))
+        slot_queue.release_slot_work(IP, leases)
+
+
+class TestProcessSlotQueue(unittest.TestCase):
+
+    @patch('AutoTasks.ip_processor.write_ip_config')
+    @patch('AutoTasks.ip_processor.release_slot_work')
+    @patch('AutoTasks.ip_processor.process_single_batch')
+    @patch('AutoTasks.ip_processor.claim_batch')
+    @patch('AutoTasks.ip_processor.pending_slots', return_value=["1", "2"])
+    @patch('AutoTasks.ip_processor.seed_slot_work')
+    def test_claims_until_nothing_left(self, mock_seed, mock_pending, mock_claim, mock_batch,
+                                       mock_release, mock_write):
+        from AutoTasks.ip_processor import process_slot_queue
+
+        mock_claim.side_effect = [([ACCOUNTS[0], ACCOUNTS[2]], {1: "lease1", 2: "lease2"}),
+                                  ([ACCOUNTS[1]], {1: "lease1"}),
+                                  ([], {})]
+        mock_batch.side_effect = lambda ip, ip_config, global_config, batch, slot_mode: {
+            "success_count": len(batch), "failure_count": 0, "failures": []}
+
+        lease = type("Lease", (), {"held": True})()
+        results = process_slot_queue(IP, {}, {}, lease)
+
+        self.assertEqual(results["processed_batches"], 2)
+        self.assertEqual(results["success_count"], 3)
+        self.assertEqual(mock_release.call_count, 2)
+        for call in mock_batch.call_args_list:
+            self.assertTrue(call.kwargs["slot_mode"])
+        # Nothing is written to the IP-wide config in slot mode
+        mock_write.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests for index slot allocation and the slot -> name/port mapping.
+
+The mapping must stay identical to the historical T100{index} / 500{index}
+scheme for indices 1-9 and remain unambiguous past index 9.
+"""
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from hypothesis import given, strategies as st
+from unittest.mock import patch
+from MachineManage.slots import (
+    machine_name, machine_port, slot_label, parse_machine_name,
+    SlotAllocator, SlotExhaustedError, MAX_INDEX
+)
+
+
+phone_number_strategy = st.text(
+    min_size=10,
+    max_size=10,
+    alphabet=st.characters(whitelist_categories=('Nd',))
+)
+
+
+@given(phone=phone_number_strategy, index=st.integers(min_value=1, max_value=9))
+def test_legacy_scheme_unchanged_for_single_digit_indices(phone, index):
+    assert machine_name(index, phone) == f"T100{index}-{phone}"
+    assert machine_name(str(index), phone) == f"T100{index}-{phone}"
+    assert machine_port(index) == f"500{index}"
+
+
+@given(phone=phone_number_strategy, index=st.integers(min_value=0, max_value=MAX_INDEX))
+def test_name_round_trip(phone, index):
+    assert parse_machine_name(machine_name(index, phone)) == (str(index), phone)
+
+
+def test_multi_digit_indices_are_unambiguous():
+    assert machine_name(10, "4385542539") == "T1010-4385542539"
+    assert machine_name(250, "4385542539") == "T1250-4385542539"
+    assert machine_port(10) == "5010"
+    assert machine_port(MAX_INDEX) == "5999"
+    assert slot_label(12) == "T1012"
+    assert len({machine_port(i) for i in range(MAX_INDEX + 1)}) == MAX_INDEX + 1
+
+
+def test_out_of_range_index_rejected():
+    with pytest.raises(ValueError):
+        machine_port(MAX_INDEX + 1)
+    with pytest.raises(ValueError):
+        machine_name(-1, "4385542539")
+
+
+def test_parse_rejects_foreign_names():
+    assert parse_machine_name("android-1") is None
+    assert parse_machine_name("") is None
+
+
+@patch('MachineManage.stop_machine.get_machine_namelist')
+def test_allocator_packs_lowest_free_slots(mock_names):
+    mock_names.return_value = ["T1001-111", "T1003-333", "other-container"]
+    allocator = SlotAllocator("192.168.1.100", "localhost:5000")
+
+    assigned = allocator.assign([["444", "", "", ""], ["555", "2", "", ""], ["666", "", "", ""]])
+
+    assert [item[1] for item in assigned] == ["4", "2", "5"]
+    mock_names.assert_called_once_with("192.168.1.100", "localhost:5000")
+
+
+@patch('MachineManage.stop_machine.get_machine_namelist')
+def test_allocator_exhausted(mock_names):
+    mock_names.return_value = ["T1001-111", "T1002-222"]
+    allocator = SlotAllocator("192.168.1.100", "localhost:5000", max_slots=2)
+    allocator.refresh()
+
+    with pytest.raises(SlotExhaustedError):
+        allocator.allocate()
+
+    allocator.release(2)
+    assert allocator.allocate() == "2"
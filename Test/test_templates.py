@@ -0,0 +1,75 @@
+import unittest
+import shutil
+import tempfile
+import sys
+import os
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.templates import TemplateCache, IMG_DIR
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name in ("X.png", "LoveIcon.png", "downarrow.png"):
+            shutil.copy(os.path.join(IMG_DIR, name), self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def test_second_get_is_a_hit(self):
+        cache = TemplateCache()
+        first = cache.get(self.path("X.png"))
+        second = cache.get(self.path("X.png"))
+
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertIsNone(cache.get(self.path("missing.png")))
+
+    def test_lru_bound(self):
+        cache = TemplateCache(max_size=2)
+        self.assertEqual(cache.preload(self.temp_dir), 2)
+        cache.get(self.path("X.png"))
+        cache.get(self.path("downarrow.png"))
+
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        # X.png was used more recently than LoveIcon.png, so it survived
+        hits = cache.stats()["hits"]
+        cache.get(self.path("X.png"))
+        self.assertEqual(cache.stats()["hits"], hits + 1)
+
+    def test_reload_when_file_changes(self):
+        cache = TemplateCache(check_interval=0)
+        original = cache.get(self.path("X.png"))
+
+        changed = np.zeros((10, 20, 3), dtype=np.uint8)
+        cv2.imwrite(self.path("X.png"), changed)
+        stat = os.stat(self.path("X.png"))
+        os.utime(self.path("X.png"), ns=(stat.st_atime_ns, original.mtime + 10 ** 9))
+
+        reloaded = cache.get(self.path("X.png"))
+        self.assertIsNot(reloaded, original)
+        self.assertEqual(reloaded.size, (20, 10))
+
+    def test_variant_built_once(self):
+        template = TemplateCache().get(self.path("X.png"))
+        calls = []
+
+        def build(image):
+            calls.append(1)
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        gray = template.variant(("gray",), build)
+        self.assertIs(template.variant(("gray",), build), gray)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
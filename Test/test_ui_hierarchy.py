@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Autolization.ui_hierarchy import UiLocator, parse_bounds, parse_hierarchy
+from Autolization.AutoOperate import AutoPhone
+
+DUMP = """UI hierchary dumped to: /sdcard/window_dump.xml
+<?xml version='1.0' encoding='UTF-8' standalone='yes' ?><hierarchy rotation="0">
+<node index="0" text="" resource-id="" class="android.widget.FrameLayout" package="com.xingin.xhs" content-desc="" clickable="false" enabled="true" bounds="[0,0][720,1280]">
+<node index="0" text="" resource-id="com.xingin.xhs:id/phone_input" class="android.widget.EditText" package="com.xingin.xhs" content-desc="" clickable="true" enabled="true" bounds="[100,300][620,360]" />
+<node index="1" text="获取验证码" resource-id="com.xingin.xhs:id/get_code" class="android.widget.TextView" package="com.xingin.xhs" content-desc="" clickable="true" enabled="true" bounds="[500,420][680,470]" />
+<node index="2" text="" resource-id="" class="android.widget.ImageView" package="com.xingin.xhs" content-desc="同意协议" clickable="true" enabled="true" bounds="[40,1000][80,1040]" />
+</node>
+</hierarchy>"""
+
+
+class TestUiHierarchy(unittest.TestCase):
+
+    def test_parse(self):
+        nodes = parse_hierarchy(DUMP)
+        self.assertEqual(len(nodes), 4)
+        self.assertEqual(nodes[1].center, (360, 330))
+        self.assertIsNone(parse_bounds("[0,0]"))
+        self.assertEqual(parse_hierarchy("ERROR: could not get idle state."), [])
+
+    def test_queries_share_one_dump(self):
+        shell = MagicMock(return_value={"code": 0, "msg": DUMP})
+        locator = UiLocator(shell)
+
+        self.assertEqual(locator.find(resource_id="phone_input").class_name, "android.widget.EditText")
+        self.assertEqual(locator.find(text="获取验证码").center, (590, 445))
+        self.assertEqual(locator.find(content_desc="同意", contains=True).bounds, (40, 1000, 80, 1040))
+        self.assertIsNone(locator.find(text="missing"))
+        shell.assert_called_once()
+        self.assertIn("uiautomator dump", shell.call_args.args[0])
+
+        locator.invalidate()
+        locator.find(text="获取验证码")
+        self.assertEqual(shell.call_count, 2)
+
+    def test_failed_dump_is_not_cached(self):
+        shell = MagicMock(side_effect=[{"code": -1, "msg": "timeout"}, {"code": 0, "msg": DUMP}])
+        locator = UiLocator(shell)
+
+        self.assertIsNone(locator.find(resource_id="phone_input"))
+        self.assertIsNotNone(locator.find(resource_id="phone_input"))
+        self.assertEqual(shell.call_count, 2)
+
+    def test_tap_view_invalidates_and_falls_back_to_image(self):
+        phone = AutoPhone("10.0.0.1", "5001", host="h", name="T1001-a", auto_connect=False)
+        responses = [{"code": 0, "msg": DUMP}, {"code": 0}, {"code": 0}]
+        with patch('Autolization.AutoOperate.requests.post') as mock_post:
+            mock_post.return_value.json.side_effect = responses
+            self.assertTrue(phone.tap_view(resource_id="phone_input"))
+            self.assertEqual(mock_post.call_args.kwargs["json"], {"cmd": "input tap 360 330"})
+            # The tap invalidated the dump
+            self.assertIsNone(phone.ui._nodes)
+
+        with patch.object(phone.ui, 'find', return_value=None), \
+                patch.object(phone, 'element_exists', return_value={"result": (12, 34), "confidence": 0.9}), \
+                patch.object(phone, 'pos_click') as mock_click:
+            self.assertTrue(phone.tap_view(text="登录", img_name="FirstLogin.png"))
+        mock_click.assert_called_once_with(12, 34)
+
+
+if __name__ == '__main__':
+    unittest.main()
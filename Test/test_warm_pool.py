@@ -0,0 +1,181 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from MachineManage.warm_pool import WarmPool, create_warm_pool
+
+
+@patch('MachineManage.warm_pool.stop_docker')
+@patch('MachineManage.warm_pool.check_machinestate')
+@patch('MachineManage.warm_pool.start_docker')
+class TestWarmPool(unittest.TestCase):
+
+    def make_pool(self, **kwargs):
+        options = dict(max_booted=3, workers=2, poll_interval=0, boot_timeout=60)
+        options.update(kwargs)
+        return WarmPool("192.168.1.100", "localhost:5000", **options)
+
+    def test_boots_ahead_up_to_target(self, mock_start, mock_check, mock_stop):
+        """Before any measurement, one device per worker is kept warm"""
+        mock_check.return_value = False
+        pool = self.make_pool()
+        pool.enqueue([["111", "1", "", ""], ["222", "2", "", ""], ["333", "3", "", ""]])
+
+        pool.tick()
+
+        self.assertEqual(mock_start.call_count, 2)
+        self.assertEqual(pool.stats()["booting"], 2)
+        self.assertEqual(pool.stats()["queued"], 1)
+
+    def test_never_boots_same_index_twice(self, mock_start, mock_check, mock_stop):
+        """Devices sharing an index share an ADB port and must not run together"""
+        mock_check.return_value = False
+        pool = self.make_pool()
+        pool.enqueue([["111", "1", "", ""], ["222", "1", "", ""], ["333", "2", "", ""]])
+
+        pool.tick()
+
+        booted = [call.args[3] for call in mock_start.call_args_list]
+        self.assertEqual(booted, ["111", "333"])
+
+    def test_memory_budget_limits_running_containers(self, mock_start, mock_check, mock_stop):
+        pool = self.make_pool(max_booted=8, memory_budget_mb=4096, container_memory_mb=2048)
+        self.assertEqual(pool.budget, 2)
+
+    def test_cpu_budget_limits_running_containers(self, mock_start, mock_check, mock_stop):
+        pool = self.make_pool(max_booted=8, memory_budget_mb=16384, cpu_budget=6, container_cpus=2)
+        self.assertEqual(pool.budget, 3)
+
+    def test_overlapping_batches_keep_each_other_protected(self, mock_start, mock_check, mock_stop):
+        mock_check.return_value = True
+        pool = self.make_pool(max_booted=4, batch_size=2)
+        first = [["111", "1", "", ""], ["222", "2", "", ""]]
+        second = [["333", "3", "", ""], ["444", "4", "", ""]]
+        entered, finish_first = threading.Event(), threading.Event()
+        acquire = pool.acquire
+
+        def slow_acquire(device_info, timeout=None):
+            if device_info is first[-1]:
+                entered.set()
+                finish_first.wait(5)
+            return acquire(device_info, timeout)
+
+        with patch.object(pool, 'acquire', side_effect=slow_acquire):
+            worker = threading.Thread(target=pool.acquire_batch, args=(first, 1))
+            worker.start()
+            self.assertTrue(entered.wait(5))
+            # A second batch finishing while the first is mid-acquire only drops its own keys
+            self.assertEqual(pool.acquire_batch(second, timeout=1), [])
+            self.assertIn(("222", "2"), pool._protected)
+            self.assertNotIn(("333", "3"), pool._protected)
+            finish_first.set()
+            worker.join(5)
+
+        self.assertEqual(pool.stats()["leased"], 4)
+        self.assertFalse(pool._protected)
+
+    def test_acquire_returns_booted_device(self, mock_start, mock_check, mock_stop):
+        mock_check.return_value = True
+        pool = self.make_pool()
+        device = ["111", "1", "", ""]
+        pool.enqueue([device])
+
+        self.assertTrue(pool.acquire(device, timeout=1))
+        self.assertEqual(pool.stats()["leased"], 1)
+        mock_start.assert_called_once()
+
+    def test_acquire_evicts_conflicting_warm_device(self, mock_start, mock_check, mock_stop):
+        mock_check.return_value = True
+        pool = self.make_pool()
+        pool.enqueue([["999", "1", "", ""]])
+        pool.tick()
+
+        demanded = ["111", "1", "", ""]
+        self.assertTrue(pool.acquire(demanded, timeout=1))
+
+        mock_stop.assert_called_once_with("192.168.1.100", "localhost:5000", "1", "999")
+        self.assertEqual(pool.stats()["queued"], 1)
+
+    def test_target_adapts_to_boot_and_relogin_time(self, mock_start, mock_check, mock_stop):
+        pool = self.make_pool(max_booted=10, workers=2)
+        pool.avg_boot_time = 120
+        pool.avg_relogin_time = 60
+        self.assertEqual(pool.target_size(), 4)
+
+        pool.avg_relogin_time = 600
+        self.assertEqual(pool.target_size(), 1)
+
+    def test_release_stops_container_and_records_relogin_time(self, mock_start, mock_check, mock_stop):
+        mock_check.return_value = True
+        pool = self.make_pool()
+        device = ["111", "1", "", ""]
+        pool.acquire(device, timeout=1)
+
+        pool.release(device)
+
+        mock_stop.assert_called_once_with("192.168.1.100", "localhost:5000", "1", "111")
+        self.assertIsNotNone(pool.avg_relogin_time)
+        self.assertEqual(pool.stats()["leased"], 0)
+
+    def test_create_warm_pool_disabled_by_default(self, mock_start, mock_check, mock_stop):
+        self.assertIsNone(create_warm_pool("192.168.1.100", {"host_local": "localhost:5000"}))
+        pool = create_warm_pool("192.168.1.100", {
+            "host_local": "localhost:5000",
+            "warm_pool": {"enabled": True, "max_booted": 6}
+        })
+        self.assertEqual(pool.budget, 6)
+
+    def test_default_budget_leaves_room_to_warm(self, mock_start, mock_check, mock_stop):
+        """With a whole batch leased, the default budget still boots the next devices"""
+        mock_check.return_value = True
+        pool = WarmPool("192.168.1.100", "localhost:5000", workers=2, poll_interval=0, batch_size=4)
+        self.assertEqual(pool.budget, 6)
+        batch = [[str(i), str(i), "", ""] for i in range(1, 5)]
+        pool.enqueue(batch + [["555", "5", "", ""], ["666", "6", "", ""]])
+
+        self.assertEqual(pool.acquire_batch(batch, timeout=1), [])
+        pool.tick()
+        pool.tick()
+
+        self.assertEqual(pool.stats()["leased"], 4)
+        self.assertEqual(pool.stats()["ready"], 2)
+
+    def test_oversized_batch_rejected(self, mock_start, mock_check, mock_stop):
+        pool = self.make_pool()
+        batch = [[str(i), str(i), "", ""] for i in range(1, 5)]
+
+        with self.assertRaises(ValueError):
+            pool.acquire_batch(batch)
+        mock_start.assert_not_called()
+        self.assertIsNone(create_warm_pool("192.168.1.100", {
+            "host_local": "localhost:5000",
+            "warm_pool": {"enabled": True, "max_booted": 2}
+        }, batch_size=4))
+
+    def test_stats_not_blocked_by_boot_request(self, mock_start, mock_check, mock_stop):
+        """Container requests are sent outside the pool lock"""
+        mock_check.return_value = False
+        pool = self.make_pool()
+        pool.enqueue([["111", "1", "", ""]])
+        seen = []
+
+        def start_docker(*args):
+            # stats() from another thread only returns if the tick is not holding the lock
+            result = []
+            thread = threading.Thread(target=lambda: result.append(pool.stats()))
+            thread.start()
+            thread.join(timeout=1)
+            seen.append(bool(result))
+
+        mock_start.side_effect = start_docker
+        pool.tick()
+
+        self.assertEqual(seen, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,16 @@
+import os
 import json
+from contextlib import contextmanager
 from typing import Any
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CONFIG_LOCK_FILE = 'config.json.lock'
+
 
 # Custom exception for missing IP addresses
 class IPNotFoundError(Exception):
@@ -164,6 +174,36 @@ def get_all_ips() -> list:
     return list(config["ips"].keys())
 
 
+@contextmanager
+def _config_lock():
+    """
+    Hold an exclusive lock on config.json.lock, so read-modify-write of
+    config.json from concurrent workers and relogin processes is serialized
+    """
+    with open(CONFIG_LOCK_FILE, 'a+') as lock_file:
+        lock_file.seek(0)
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            lock_file.seek(0)
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _save_multi_ip_config(config: dict) -> None:
+    """Write config.json through a temp file so readers never see it half-written"""
+    tmp_path = 'config.json.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        _write_formatted_json_multi_ip(config, f)
+    os.replace(tmp_path, 'config.json')
+
+
 def write_ip_config(ip: str, key: str, value: Any) -> bool:
     """
     Write value to a specific key for a specific IP.
@@ -180,17 +220,17 @@ def write_ip_config(ip: str, key: str, value: Any) -> bool:
         IPNotFoundError: If the IP address is not found in configuration
     """
     try:
-        config = load_config()
+        with _config_lock():
+            config = load_config()
         
-        if "ips" not in config or ip not in config["ips"]:
-            raise IPNotFoundError(ip)
+            if "ips" not in config or ip not in config["ips"]:
+                raise IPNotFoundError(ip)
         
-        config["ips"][ip][key] = value
+            config["ips"][ip][key] = value
         
-        with open('config.json', 'w', encoding='utf-8') as f:
-            _write_formatted_json_multi_ip(config, f)
+            _save_multi_ip_config(config)
         
-        return True
+            return True
     except IPNotFoundError:
         raise
     except Exception as e:
@@ -215,22 +255,22 @@ def append_ip_config(ip: str, key: str, value: Any) -> bool:
         IPNotFoundError: If the IP address is not found in configuration
     """
     try:
-        config = load_config()
+        with _config_lock():
+            config = load_config()
         
-        if "ips" not in config or ip not in config["ips"]:
-            raise IPNotFoundError(ip)
+            if "ips" not in config or ip not in config["ips"]:
+                raise IPNotFoundError(ip)
         
-        if key not in config["ips"][ip]:
-            config["ips"][ip][key] = []
+            if key not in config["ips"][ip]:
+                config["ips"][ip][key] = []
         
-        # Only append if value doesn't already exist
-        if value not in config["ips"][ip][key]:
-            config["ips"][ip][key].append(value)
+            # Only append if value doesn't already exist
+            if value not in config["ips"][ip][key]:
+                config["ips"][ip][key].append(value)
         
-        with open('config.json', 'w', encoding='utf-8') as f:
-            _write_formatted_json_multi_ip(config, f)
+            _save_multi_ip_config(config)
         
-        return True
+            return True
     except IPNotFoundError:
         raise
     except Exception as e:
@@ -253,23 +293,23 @@ def clear_ip_config(ip: str, key: str) -> bool:
         IPNotFoundError: If the IP address is not found in configuration
     """
     try:
-        config = load_config()
+        with _config_lock():
+            config = load_config()
         
-        if "ips" not in config or ip not in config["ips"]:
-            raise IPNotFoundError(ip)
+            if "ips" not in config or ip not in config["ips"]:
+                raise IPNotFoundError(ip)
         
-        if key in config["ips"][ip]:
-            if isinstance(config["ips"][ip][key], list):
-                config["ips"][ip][key] = []
-            elif isinstance(config["ips"][ip][key], dict):
-                config["ips"][ip][key] = {}
-            else:
-                config["ips"][ip][key] = ""
+            if key in config["ips"][ip]:
+                if isinstance(config["ips"][ip][key], list):
+                    config["ips"][ip][key] = []
+                elif isinstance(config["ips"][ip][key], dict):
+                    config["ips"][ip][key] = {}
+                else:
+                    config["ips"][ip][key] = ""
         
-        with open('config.json', 'w', encoding='utf-8') as f:
-            _write_formatted_json_multi_ip(config, f)
+            _save_multi_ip_config(config)
         
-        return True
+            return True
     except IPNotFoundError:
         raise
     except Exception as e: